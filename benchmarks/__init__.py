@@ -0,0 +1,2 @@
+# Benchmarks for NetSleuth
+# Synthetic traffic and pipeline timing, runnable offline
@@ -0,0 +1,103 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import contextlib
+import json
+import threading
+import time
+
+from src.core import device_tracker
+from src.core.alert_system import alert_system
+from src.core.device_tracker import device_log, update_device
+
+
+def writer(stop, hosts, counter):
+    """The capture path: update_device as fast as possible."""
+    i = 0
+    while not stop.is_set():
+        ip = f"10.1.{i % hosts // 250}.{i % hosts % 250 + 1}"
+        update_device(ip, None, "connections", f"93.184.{i // 250 % 250}.{i % 250}:443")
+        if i % 3 == 0:
+            update_device(ip, None, "dns_queries", f"host{i % 997}.example.com")
+        i += 1
+        counter[0] = i
+
+
+def reader(stop, direct, interval, results):
+    """A web/API thread: takes a view of every device, checking it stays put while read."""
+    while not stop.wait(interval):
+        try:
+            devices = device_log if direct else device_tracker.snapshot()
+            sizes = {}
+            for ip, data in devices.items():
+                sizes[ip] = (len(data["connections"]), len(data["dns_queries"]))
+                list(data["connections"])
+            # A point-in-time view must not have moved while it was being read
+            if len(devices) != len(sizes) or any(
+                    (len(devices[ip]["connections"]), len(devices[ip]["dns_queries"])) != size
+                    for ip, size in sizes.items()):
+                results["inconsistent"] += 1
+            results["reads"] += 1
+        except RuntimeError:
+            results["errors"] += 1
+
+
+def run(readers, hosts, duration, direct, interval):
+    device_tracker.clear_devices()
+    stop = threading.Event()
+    counter = [0]
+    results = {"reads": 0, "errors": 0, "inconsistent": 0}
+    threads = [threading.Thread(target=writer, args=(stop, hosts, counter))]
+    threads += [threading.Thread(target=reader, args=(stop, direct, interval, results)) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return {"readers": readers, "direct": direct, "updates_per_s": counter[0] / duration,
+            "reads_per_s": results["reads"] / duration,
+            "errors": results["errors"], "inconsistent": results["inconsistent"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Device store under one writer and concurrent readers")
+    parser.add_argument("--readers", type=int, nargs="+", default=[0, 1, 4, 16])
+    parser.add_argument("--hosts", type=int, default=2000, help="devices the writer cycles through")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per run")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="seconds each reader waits between reads (0 = back to back)")
+    parser.add_argument("--max-age", type=float, default=device_tracker.DEVICE_SNAPSHOT_MAX_AGE,
+                        help="DEVICE_SNAPSHOT_MAX_AGE for the run")
+    parser.add_argument("--direct", action="store_true",
+                        help="also run readers iterating device_log directly (the pre-snapshot behaviour)")
+    parser.add_argument("--output", "-o", help="optional JSON results path")
+    args = parser.parse_args()
+
+    device_tracker.DEVICE_SNAPSHOT_MAX_AGE = args.max_age
+    for rule in alert_system.alert_rules:
+        alert_system.alert_rules[rule] = False
+
+    rows = []
+    print(f"{'readers':>8} {'mode':>9} {'updates/s':>12} {'reads/s':>9} {'errors':>7} {'inconsistent':>13}")
+    for direct in ([False, True] if args.direct else [False]):
+        for n in args.readers:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                row = run(n, args.hosts, args.duration, direct, args.interval)
+            rows.append(row)
+            print(f"{n:>8} {'direct' if direct else 'snapshot':>9} {row['updates_per_s']:>12,.0f} "
+                  f"{row['reads_per_s']:>9,.1f} {row['errors']:>7} {row['inconsistent']:>13}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"hosts": args.hosts, "duration": args.duration, "interval": args.interval,
+                       "max_age": args.max_age,
+                       "runs": rows}, f, indent=2)
+        print(f"\n[BENCH] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import contextlib
+import json
+import time
+
+from src.core import device_tracker
+from src.core.alert_system import alert_system
+from src.core.device_tracker import device_log, update_device
+from src.utils.bounded_set import BoundedOrderedSet
+
+
+def _list_add(history, value, cap):
+    """The pre-BoundedOrderedSet per-device list logic."""
+    if value not in history:
+        history.append(value)
+    if len(history) > cap:
+        history = history[-cap:]
+    return history
+
+
+def bench_containers(caps, ops):
+    """ns per add() once a history is full: new values (evicting) and repeats."""
+    rows = []
+    for cap in caps:
+        row = {"cap": cap}
+        for kind in ("list", "bounded_set"):
+            values = [f"10.0.{i // 250 % 250}.{i % 250}:{i % 65535}" for i in range(cap + ops)]
+            repeats = values[cap:cap + min(cap, ops)]
+            if kind == "list":
+                history = values[:cap]
+                start = time.perf_counter_ns()
+                for v in values[cap:]:
+                    history = _list_add(history, v, cap)
+                new_ns = (time.perf_counter_ns() - start) / ops
+                start = time.perf_counter_ns()
+                for v in repeats:
+                    history = _list_add(history, v, cap)
+                repeat_ns = (time.perf_counter_ns() - start) / len(repeats)
+            else:
+                history = BoundedOrderedSet(cap, values[:cap])
+                start = time.perf_counter_ns()
+                for v in values[cap:]:
+                    history.add(v)
+                new_ns = (time.perf_counter_ns() - start) / ops
+                start = time.perf_counter_ns()
+                for v in repeats:
+                    history.add(v)
+                repeat_ns = (time.perf_counter_ns() - start) / len(repeats)
+            row[f"{kind}_new_ns"] = new_ns
+            row[f"{kind}_repeat_ns"] = repeat_ns
+        rows.append(row)
+    return rows
+
+
+def bench_update_device(step):
+    """
+    ns per update_device call for one device as its connection history fills
+    to MAX_CONNECTIONS and then keeps evicting. Alert checks are switched off
+    so only the tracker's own cost is measured.
+    """
+    saved_rules = dict(alert_system.alert_rules)
+    for rule in alert_system.alert_rules:
+        alert_system.alert_rules[rule] = False
+    device_tracker.clear_devices()
+    cap = device_tracker.MAX_CONNECTIONS
+    rows = []
+    try:
+        update_device("10.0.0.2", "02:00:00:00:00:02", "connections", "seed:0")
+        for level in range(0, cap * 3, step):
+            values = [f"93.184.{(level + i) // 250 % 250}.{(level + i) % 250}:443" for i in range(step)]
+            start = time.perf_counter_ns()
+            for v in values:
+                update_device("10.0.0.2", "02:00:00:00:00:02", "connections", v)
+            new_ns = (time.perf_counter_ns() - start) / step
+            start = time.perf_counter_ns()
+            for v in values:
+                update_device("10.0.0.2", "02:00:00:00:00:02", "connections", v)
+            repeat_ns = (time.perf_counter_ns() - start) / step
+            rows.append({
+                "history": len(device_log["10.0.0.2"]["connections"]),
+                "new_ns": new_ns,
+                "repeat_ns": repeat_ns,
+            })
+    finally:
+        alert_system.alert_rules.update(saved_rules)
+        device_tracker.clear_devices()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-device activity history cost as history fills")
+    parser.add_argument("--caps", default="100,1000,10000", help="history caps for the container comparison")
+    parser.add_argument("--ops", type=int, default=20000, help="adds timed per container")
+    parser.add_argument("--step", type=int, default=20, help="update_device calls per fill level")
+    parser.add_argument("--output", "-o", help="optional JSON results path")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        containers = bench_containers([int(c) for c in args.caps.split(",")], args.ops)
+        tracker = bench_update_device(args.step)
+
+    print(f"{'cap':>7} {'list new':>10} {'list repeat':>12} {'set new':>9} {'set repeat':>11}   (ns/add)")
+    for r in containers:
+        print(f"{r['cap']:>7} {r['list_new_ns']:>10.0f} {r['list_repeat_ns']:>12.0f} "
+              f"{r['bounded_set_new_ns']:>9.0f} {r['bounded_set_repeat_ns']:>11.0f}")
+
+    print(f"\n{'history':>8} {'new ns':>8} {'repeat ns':>10}   (update_device, alerts off)")
+    for r in tracker:
+        print(f"{r['history']:>8} {r['new_ns']:>8.0f} {r['repeat_ns']:>10.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"containers": containers, "update_device": tracker}, f, indent=2)
+        print(f"\n[BENCH] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import time
+
+import numpy as np
+
+from src.ml.feature_extractor import FEATURE_NAMES
+from src.ml.model_manager import TrafficAnomalyModel, CompiledIsolationForest
+
+
+def _time_per_call(fn, X, batch, repeat):
+    """Mean seconds per call of fn over `repeat` blocks of `batch` rows."""
+    blocks = [X[i * batch:(i + 1) * batch] for i in range(repeat)]
+    start = time.perf_counter()
+    for block in blocks:
+        fn(block)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sklearn vs compiled IsolationForest scoring")
+    parser.add_argument("--samples", type=int, default=5000, help="training rows")
+    parser.add_argument("--batches", default="1,16,64,256", help="comma-separated batch sizes")
+    parser.add_argument("--repeat", type=int, default=50, help="calls timed per batch size")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n_features = len(FEATURE_NAMES)
+    X_train = rng.normal(size=(args.samples, n_features)) * 100
+    model = TrafficAnomalyModel()
+    model.fit(X_train)
+    forest = model.model
+    compiled = CompiledIsolationForest.from_sklearn(forest)
+
+    batches = [int(b) for b in args.batches.split(",")]
+    X_test = rng.normal(size=(max(batches) * args.repeat, n_features)) * 150
+
+    max_err = float(np.abs(compiled.score_samples(X_test) - forest.score_samples(X_test)).max())
+    print(f"[BENCH] {len(forest.estimators_)} trees, {len(compiled.feature)} nodes, "
+          f"max |score diff| = {max_err:.3e}")
+    if max_err > 1e-9:
+        print("[BENCH] ERROR: compiled scores diverge from sklearn")
+        sys.exit(1)
+
+    print(f"{'batch':>6} {'sklearn us/row':>15} {'compiled us/row':>16} {'speedup':>8}")
+    for batch in batches:
+        t_sk = _time_per_call(forest.score_samples, X_test, batch, args.repeat)
+        t_c = _time_per_call(compiled.score_samples, X_test, batch, args.repeat)
+        print(f"{batch:>6} {t_sk / batch * 1e6:>15.1f} {t_c / batch * 1e6:>16.1f} {t_sk / t_c:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
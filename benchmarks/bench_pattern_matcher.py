@@ -0,0 +1,67 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import json
+import random
+import string
+import time
+
+from src.utils import pattern_matcher
+from src.utils.pattern_matcher import PatternMatcher
+
+
+def _domain(rng):
+    label = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 14)))
+    return label + rng.choice([".com", ".net", ".org", ".ru", ".io"])
+
+
+def _linear(patterns, text):
+    """The pre-matcher approach: one `in` check per indicator."""
+    text = text.lower()
+    return [p for p in patterns if p in text]
+
+
+def bench(sizes, queries, seed):
+    rng = random.Random(seed)
+    feed = [_domain(rng) for _ in range(max(sizes))]
+    texts = [_domain(rng) if rng.random() < 0.9 else rng.choice(feed) for _ in range(queries)]
+
+    rows = []
+    for n in sizes:
+        patterns = feed[:n]
+        matcher = PatternMatcher(patterns)
+        row = {"indicators": n, "engine": "linear" if n <= pattern_matcher.LINEAR_SCAN_MAX else "automaton"}
+        for name, fn in (("matcher", matcher.search), ("linear", lambda t: _linear(patterns, t))):
+            start = time.perf_counter_ns()
+            for t in texts:
+                fn(t)
+            row[f"{name}_ns"] = (time.perf_counter_ns() - start) / len(texts)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query indicator matching cost vs. indicator count")
+    parser.add_argument("--sizes", default="12,24,100,1000,10000", help="comma-separated indicator counts")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", "-o", help="optional JSON results path")
+    args = parser.parse_args()
+
+    rows = bench([int(s) for s in args.sizes.split(",")], args.queries, args.seed)
+
+    print(f"{'indicators':>10} {'engine':>10} {'matcher ns':>11} {'linear ns':>11}   (per query)")
+    for r in rows:
+        print(f"{r['indicators']:>10} {r['engine']:>10} {r['matcher_ns']:>11.0f} {r['linear_ns']:>11.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n[BENCH] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import contextlib
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.traffic import TrafficGenerator, DEFAULT_MIX, parse_mix
+from scapy.layers.l2 import Ether
+from src.core import sniffer
+from src.core.alert_system import alert_system
+from src.core.analyzer import analyze_packet
+from src.core import device_tracker
+from src.core.device_tracker import update_device
+from src.core.fast_decoder import decode_packet
+from src.ml.feature_extractor import extract_features, as_vector
+from src.ml.window_features import WindowFeatureTracker
+from src.core.flow_table import FlowTable
+from src.ml.model_manager import TrafficAnomalyModel
+
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Alerts stay in memory: the benchmark measures the pipeline, not spool writes
+alert_system.spool = None
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _reset_state():
+    alert_system.flush()
+    device_tracker.clear_devices()
+    alert_system.clear_alerts()
+
+
+def measure(fn, items):
+    """Call fn(item) for each item; return throughput and latency percentiles."""
+    lat = np.empty(len(items), dtype=np.int64)
+    clock = time.perf_counter_ns
+    start = clock()
+    for i, item in enumerate(items):
+        t0 = clock()
+        fn(item)
+        lat[i] = clock() - t0
+    total = (clock() - start) / 1e9
+    us = lat / 1e3
+    return {
+        "calls": len(items),
+        "total_s": total,
+        "ops_per_sec": len(items) / total if total else 0.0,
+        "mean_us": float(us.mean()),
+        "p50_us": float(np.percentile(us, 50)),
+        "p90_us": float(np.percentile(us, 90)),
+        "p99_us": float(np.percentile(us, 99)),
+        "max_us": float(us.max()),
+    }
+
+
+def _device_updates(records):
+    """The update_device calls analyze_packet would make for these records."""
+    calls = []
+    for h in records:
+        if h.is_arp:
+            calls.append((h.ip_src, h.mac_src, "services", f"ARP→{h.ip_dst}"))
+        elif h.is_dns and h.dns_qname and h.ip_src:
+            calls.append((h.ip_src, h.mac_src, "dns_queries", h.dns_qname))
+        elif h.l4 in ("TCP", "UDP") and h.ip_src:
+            calls.append((h.ip_src, h.mac_src, "connections", f"{h.ip_dst}:{h.dport}"))
+    return calls
+
+
+def run(args):
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    print(f"[BENCH] Generating {args.packets} frames ({args.hosts} hosts, seed={args.seed})...")
+    frames = TrafficGenerator(hosts=args.hosts, mix=mix, seed=args.seed).frames(args.packets)
+    records = [decode_packet(f, link=Ether) for f in frames]
+    features = [f for f in (extract_features(h) for h in records) if f is not None]
+    vectors = [as_vector(f) for f in features]
+
+    # Throwaway model fitted on the synthetic traffic, so results don't depend
+    # on whatever happens to be in models/
+    model = TrafficAnomalyModel()
+    model.fit(np.array(vectors, dtype=float))
+    compiled = TrafficAnomalyModel(model=model.model)
+    compiled.compile()
+    ml_vectors = vectors[:args.ml_samples]
+
+    stages = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        stages["decode"] = measure(lambda f: decode_packet(f, link=Ether), frames)
+
+        _reset_state()
+        stages["analyze_packet"] = measure(analyze_packet, records)
+
+        _reset_state()
+        stages["update_device"] = measure(lambda c: update_device(*c), _device_updates(records))
+
+        stages["flow_table"] = measure(FlowTable().update, records)
+        stages["extract_features"] = measure(extract_features, records)
+        stages["window_features"] = measure(WindowFeatureTracker().update, records)
+        stages["predict_one"] = measure(model.predict_one, ml_vectors)
+        stages["predict_one_compiled"] = measure(compiled.predict_one, ml_vectors)
+
+        # Full callback, ML scored by the background batch scorer
+        _reset_state()
+        sniffer.anomaly_scorer.model = compiled
+        start = time.perf_counter()
+        stages["packet_callback"] = measure(lambda f: sniffer.packet_callback(f, link=Ether), frames)
+        sniffer.anomaly_scorer.flush()
+        alert_system.flush()
+        stages["packet_callback"]["drain_s"] = time.perf_counter() - start - stages["packet_callback"]["total_s"]
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {
+            "packets": args.packets,
+            "hosts": args.hosts,
+            "seed": args.seed,
+            "mix": mix,
+            "ml_samples": len(ml_vectors),
+        },
+        "stages": stages,
+    }
+
+
+def print_report(result):
+    print(f"\n{'stage':<22} {'ops/s':>12} {'mean us':>9} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>9}")
+    for name, s in result["stages"].items():
+        print(f"{name:<22} {s['ops_per_sec']:>12,.0f} {s['mean_us']:>9.1f} {s['p50_us']:>8.1f} "
+              f"{s['p90_us']:>8.1f} {s['p99_us']:>8.1f} {s['max_us']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NetSleuth pipeline benchmark (offline, no capture needed)")
+    parser.add_argument("--packets", type=int, default=20000, help="synthetic frames to generate")
+    parser.add_argument("--hosts", type=int, default=50, help="number of LAN hosts")
+    parser.add_argument("--mix", help="traffic mix, e.g. arp=0.1,dns=0.3,syn=0.3,udp=0.3")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ml-samples", type=int, default=200, help="vectors timed for predict_one")
+    parser.add_argument("--output", "-o", help="JSON results path (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n[BENCH] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
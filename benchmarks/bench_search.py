@@ -0,0 +1,84 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import json
+import random
+import time
+
+from src.utils.search_index import SearchIndex, NGRAM
+
+VENDORS = ["Apple", "Samsung", "Google", "Amazon", "Sonos", "HP", "Intel", "Roku", "Netgear", "Dell"]
+KINDS = ["iPhone", "Laptop", "Smart TV", "Printer", "Speaker", "Router", "Camera", "Tablet", "Desktop"]
+
+
+def make_devices(n, rng):
+    ouis = ["%02x:%02x:%02x" % (rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(200)]
+    devices = []
+    for i in range(n):
+        ip = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        mac = rng.choice(ouis) + ":%02x:%02x:%02x" % (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        hostname = f"{rng.choice(VENDORS)} {rng.choice(KINDS)} ({ip})"
+        devices.append((ip, mac, hostname))
+    return devices
+
+
+def _linear(devices, query, limit):
+    """The pre-index /api/search: three substring checks per device."""
+    query = query.lower()
+    out = []
+    for ip, mac, hostname in devices:
+        if query in ip.lower() or query in hostname.lower() or query in mac.lower():
+            out.append(ip)
+    return out[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Device search latency: SearchIndex vs. linear scan")
+    parser.add_argument("--devices", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=200, help="runs per query")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", "-o", help="optional JSON results path")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    devices = make_devices(args.devices, rng)
+    mac = devices[len(devices) // 2][1]
+    queries = ["10.0.12.7", "sonos", "smart tv", "printer (10.0.3", mac[:8], mac, "10.", "ap", "7", "zzz"]
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for ip, mac_, hostname in devices:
+        index.add(ip, ip, mac_, hostname)
+    build = time.perf_counter() - start
+    print(f"[BENCH] Indexed {len(devices)} devices in {build:.2f}s "
+          f"({build / len(devices) * 1e6:.1f} µs/device)")
+
+    rows = []
+    print(f"\n{'query':>18} {'hits':>5} {'index µs':>10} {'linear µs':>10}")
+    for q in queries:
+        hits = index.search(q, args.limit)
+        if len(q) >= NGRAM:
+            assert hits == _linear(devices, q, args.limit), q
+        row = {"query": q, "hits": len(hits)}
+        for name, fn in (("index", lambda: index.search(q, args.limit)),
+                         ("linear", lambda: _linear(devices, q, args.limit))):
+            runs = args.repeat if name == "index" else max(1, args.repeat // 20)
+            start = time.perf_counter()
+            for _ in range(runs):
+                fn()
+            row[f"{name}_us"] = (time.perf_counter() - start) / runs * 1e6
+        rows.append(row)
+        print(f"{q:>18} {row['hits']:>5} {row['index_us']:>10.1f} {row['linear_us']:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"devices": len(devices), "build_s": build, "queries": rows}, f, indent=2)
+        print(f"\n[BENCH] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import contextlib
+import json
+import time
+
+from benchmarks.traffic import TrafficGenerator, DEFAULT_MIX, parse_mix
+from scapy.layers.l2 import Ether
+from src.core import sniffer
+from src.core.sharding import ShardedPipeline
+
+
+# Keep alerts in memory only; spool writes would skew the comparison
+sniffer.alert_system.spool = None
+
+
+def run_in_process(frames):
+    start = time.perf_counter()
+    for frame in frames:
+        sniffer.packet_callback(frame, link=Ether)
+    sniffer.flush_scoring()
+    sniffer.alert_system.flush()
+    return time.perf_counter() - start
+
+
+def run_sharded(frames, workers):
+    pipeline = ShardedPipeline(workers).start()
+    start = time.perf_counter()
+    for frame in frames:
+        pipeline.dispatch(frame, Ether)
+    pipeline.drain()
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput vs. number of sharded analysis workers")
+    parser.add_argument("--packets", type=int, default=50000)
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--mix", help="traffic mix, e.g. arp=0.1,dns=0.3,syn=0.3,udp=0.3")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--output", "-o", help="optional JSON results path")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    print(f"[BENCH] Generating {args.packets} frames ({args.hosts} hosts, seed={args.seed})...")
+    frames = TrafficGenerator(hosts=args.hosts, mix=mix, seed=args.seed).frames(args.packets)
+
+    results = {"cpu_count": os.cpu_count(), "packets": len(frames), "runs": {}}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results["runs"]["in_process"] = run_in_process(frames)
+        for n in (int(w) for w in args.workers.split(",")):
+            results["runs"][f"workers_{n}"] = run_sharded(frames, n)
+
+    base = results["runs"]["in_process"]
+    print(f"\n{'mode':<12} {'elapsed s':>10} {'packets/s':>12} {'speedup':>8}   (cpu_count={os.cpu_count()})")
+    for mode, elapsed in results["runs"].items():
+        print(f"{mode:<12} {elapsed:>10.3f} {len(frames) / elapsed:>12,.0f} {base / elapsed:>7.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[BENCH] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import json
+import time
+
+from src.core.fast_decoder import PacketHeaders
+from src.core.timeseries import DeviceTimeSeries
+
+
+def _headers(hosts):
+    out = []
+    for i in range(hosts):
+        hdr = PacketHeaders(b"\x00" * (60 + i % 1400))
+        hdr.ip_src = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        hdr.dport = 53 if i % 5 == 0 else 443
+        hdr.is_dns = hdr.dport == 53
+        out.append(hdr)
+    return out
+
+
+def run(devices, minutes, packets_per_step):
+    """Every device sends each second; reports per-packet and per-step cost."""
+    series = DeviceTimeSeries(max_devices=devices)
+    headers = _headers(devices)
+    t0 = 1_700_000_000 - 1_700_000_000 % 3600
+    update_ns = []
+    step_ms = []
+    rollup_ms = []
+    for second in range(minutes * 60):
+        now = t0 + second + 0.5
+        start = time.perf_counter_ns()
+        for i in range(packets_per_step):
+            series.update(headers[(second * packets_per_step + i) % devices], now, i % 7 == 0)
+        update_ns.append((time.perf_counter_ns() - start) / packets_per_step)
+        # The step's counters are written when the next one starts
+        start = time.perf_counter()
+        series.flush()
+        elapsed = (time.perf_counter() - start) * 1000
+        (rollup_ms if second % 60 == 0 else step_ms).append(elapsed)
+    start = time.perf_counter()
+    for hdr in headers[:1000]:
+        series.series(hdr.ip_src)
+    query_ms = (time.perf_counter() - start) / min(1000, devices) * 1000
+    return {
+        "devices": devices,
+        "bytes_per_device": series.bytes_per_device,
+        "memory_mb": series.nbytes / 1e6,
+        "update_ns": sum(update_ns) / len(update_ns),
+        "step_write_ms": sum(step_ms) / len(step_ms),
+        "minute_rollup_ms": max(rollup_ms[1:]) if len(rollup_ms) > 1 else 0.0,
+        "query_ms": query_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-device time series: update, roll-up and query cost")
+    parser.add_argument("--devices", type=int, nargs="+", default=[1000, 10000, 30000])
+    parser.add_argument("--minutes", type=int, default=3, help="simulated minutes per run")
+    parser.add_argument("--packets", type=int, default=20000, help="packets per simulated second")
+    parser.add_argument("--output", "-o", help="optional JSON results path")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'devices':>8} {'MB':>8} {'update ns':>10} {'step ms':>8} {'rollup ms':>10} {'query ms':>9}")
+    for n in args.devices:
+        row = run(n, args.minutes, args.packets)
+        rows.append(row)
+        print(f"{n:>8} {row['memory_mb']:>8.0f} {row['update_ns']:>10.0f} {row['step_write_ms']:>8.2f} "
+              f"{row['minute_rollup_ms']:>10.2f} {row['query_ms']:>9.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n[BENCH] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
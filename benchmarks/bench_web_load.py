@@ -0,0 +1,162 @@
+import sys, os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import argparse
+import contextlib
+import http.client
+import json
+import multiprocessing as mp
+import threading
+import time
+
+from benchmarks.traffic import TrafficGenerator
+
+
+def _dashboard(port, interval, duration, revalidate, results):
+    """One simulated dashboard: polls like the browser page does, over a keep-alive connection."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    etags = {}
+    paths = ["/api/network-data", "/api/statistics", "/api/alerts?limit=50"]
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        for path in paths:
+            headers = {}
+            if revalidate:
+                headers["Accept-Encoding"] = "gzip"
+                if path in etags:
+                    headers["If-None-Match"] = etags[path]
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                results["errors"] += 1
+                continue
+            results["latencies"].append(time.perf_counter() - start)
+            results["bytes"] += len(body)
+            results[str(resp.status)] = results.get(str(resp.status), 0) + 1
+            if resp.getheader("ETag"):
+                etags[path] = resp.getheader("ETag")
+        if interval:
+            time.sleep(interval)
+    conn.close()
+
+
+def load_process(port, dashboards, interval, duration, revalidate, out_q):
+    """Runs in its own process so the load generator does not share the capture process's GIL."""
+    results = {"latencies": [], "bytes": 0, "errors": 0}
+    threads = [threading.Thread(target=_dashboard, args=(port, interval, duration, revalidate, results))
+               for _ in range(dashboards)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out_q.put(results)
+
+
+def capture_rate(frames, duration):
+    """Packets/s the in-process pipeline sustains for `duration` seconds."""
+    from scapy.layers.l2 import Ether
+    from src.core import sniffer
+    packets = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        for frame in frames:
+            sniffer.packet_callback(frame, link=Ether)
+        packets += len(frames)
+    return packets / (time.perf_counter() - start)
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture throughput with and without dashboard load on the web API")
+    parser.add_argument("--devices", type=int, default=2000, help="devices in the log (payload size)")
+    parser.add_argument("--hosts", type=int, default=50, help="hosts in the capture traffic")
+    parser.add_argument("--dashboards", type=int, default=20, help="simulated dashboard clients")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between a dashboard's polls (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--server", default="auto", help="auto, waitress, werkzeug or development")
+    parser.add_argument("--plain", action="store_true",
+                        help="no response cache, no compression, clients never revalidate (pre-caching behaviour)")
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--output", "-o", help="optional JSON results path")
+    args = parser.parse_args()
+
+    from src.web import serving
+    if args.plain:
+        serving.WEB_CACHE_TTL = 0
+        serving.WEB_COMPRESS_MIN_BYTES = float("inf")
+    from src.web import web_interface
+    from src.core.alert_system import alert_system
+    from src.core.device_tracker import update_device
+
+    # No alert spool: capture rate should not include disk writes
+    alert_system.spool = None
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(args.devices):
+            ip = f"172.16.{i // 250}.{i % 250 + 1}"
+            for j in range(10):
+                update_device(ip, None, "connections", f"93.184.{j}.{i % 200}:443")
+                update_device(ip, None, "dns_queries", f"host{(i + j) % 500}.example.com")
+        web_interface.update_network_data()
+        for target in (web_interface.data_update_loop, web_interface.device_events_loop,
+                       lambda: serving.serve(web_interface.app, "127.0.0.1", args.port, server=args.server)):
+            threading.Thread(target=target, daemon=True).start()
+        time.sleep(1.0)
+
+        frames = TrafficGenerator(hosts=args.hosts, seed=1).frames(5000)
+        print(f"[BENCH] {args.devices} devices, {args.dashboards} dashboards every {args.interval}s, "
+              f"server={args.server}{' (plain)' if args.plain else ''}", file=sys.stderr)
+
+        baseline = capture_rate(frames, args.duration)
+
+        ctx = mp.get_context("spawn")
+        out_q = ctx.Queue()
+        loader = ctx.Process(target=load_process,
+                             args=(args.port, args.dashboards, args.interval, args.duration, not args.plain, out_q))
+        loader.start()
+        loaded = capture_rate(frames, args.duration)
+        load = out_q.get()
+        loader.join()
+
+    lat = load["latencies"]
+    result = {
+        "cpu_count": os.cpu_count(),
+        "capture_pps_idle": baseline,
+        "capture_pps_loaded": loaded,
+        "slowdown_pct": (1 - loaded / baseline) * 100,
+        "requests": len(lat),
+        "requests_per_s": len(lat) / args.duration,
+        "not_modified": load.get("304", 0),
+        "errors": load["errors"],
+        "bytes_per_request": load["bytes"] / max(1, len(lat)),
+        "latency_p50_ms": _pct(lat, 0.50),
+        "latency_p99_ms": _pct(lat, 0.99),
+    }
+
+    print(f"\n  capture idle        {baseline:>12,.0f} packets/s   (cpu_count={os.cpu_count()})")
+    print(f"  capture under load  {loaded:>12,.0f} packets/s   ({result['slowdown_pct']:+.1f}% slower)")
+    print(f"  requests            {len(lat):>12,} ({result['requests_per_s']:.0f}/s, "
+          f"{result['not_modified']} x 304, {result['errors']} errors)")
+    print(f"  bytes/request       {result['bytes_per_request']:>12,.0f}")
+    print(f"  latency p50 / p99   {result['latency_p50_ms']:>8.1f} / {result['latency_p99_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n[BENCH] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
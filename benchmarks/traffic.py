@@ -0,0 +1,88 @@
+# traffic.py
+"""
+Seeded synthetic traffic for benchmarks.
+
+Frames are built once with Scapy and returned as raw Ethernet bytes, the
+same thing the live capture socket and pcap replay hand to packet_callback.
+"""
+import random
+from typing import Dict, List
+
+from scapy.layers.l2 import Ether, ARP
+from scapy.layers.inet import IP, TCP, UDP
+from scapy.layers.dns import DNS, DNSQR
+from scapy.packet import Raw
+
+DEFAULT_MIX = {"arp": 0.1, "dns": 0.3, "syn": 0.3, "udp": 0.3}
+
+_DOMAINS = [
+    "google.com", "github.com", "apple.com", "netflix.com", "spotify.com",
+    "amazon.com", "roku.com", "microsoft.com", "cloudflare.com", "example.org",
+]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'arp=0.1,dns=0.3,syn=0.3,udp=0.3' -> normalized weights."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip().lower()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"unknown traffic kind '{name}' (expected one of {sorted(DEFAULT_MIX)})")
+        mix[name] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("traffic mix weights must sum to > 0")
+    return {k: v / total for k, v in mix.items()}
+
+
+class TrafficGenerator:
+    """
+    Deterministic mix of ARP, DNS, TCP SYN fan-out and UDP across `hosts`
+    LAN hosts. The same seed always yields the same frames.
+    """
+
+    def __init__(self, hosts: int = 50, mix: Dict[str, float] = None, seed: int = 1,
+                 scanners: int = 2, fanout_ports: int = 1024):
+        self.rng = random.Random(seed)
+        self.mix = mix or DEFAULT_MIX
+        self.hosts = [(f"10.{i // 62500 % 256}.{i // 250 % 250}.{i % 250 + 2}",
+                       "02:00:" + i.to_bytes(4, "big").hex(":"))
+                      for i in range(hosts)]
+        # A few hosts do the SYN fan-out (scan-like); everyone else browses
+        self.scanners = self.hosts[:max(1, min(scanners, hosts))]
+        self.fanout_ports = fanout_ports
+        self.remote = [f"93.184.{i // 256}.{i % 256}" for i in range(1, 512)]
+        self._kinds = list(self.mix)
+        self._weights = [self.mix[k] for k in self._kinds]
+
+    def _arp(self):
+        ip, mac = self.rng.choice(self.hosts)
+        target, _ = self.rng.choice(self.hosts)
+        return Ether(src=mac, dst="ff:ff:ff:ff:ff:ff") / ARP(psrc=ip, pdst=target, hwsrc=mac)
+
+    def _dns(self):
+        ip, mac = self.rng.choice(self.hosts)
+        name = f"{self.rng.choice(['www', 'api', 'cdn', 'img'])}{self.rng.randrange(20)}.{self.rng.choice(_DOMAINS)}"
+        return (Ether(src=mac) / IP(src=ip, dst="10.0.0.1") /
+                UDP(sport=self.rng.randrange(1024, 65535), dport=53) /
+                DNS(rd=1, qd=DNSQR(qname=name)))
+
+    def _syn(self):
+        ip, mac = self.rng.choice(self.scanners)
+        return (Ether(src=mac) / IP(src=ip, dst=self.rng.choice(self.remote)) /
+                TCP(sport=self.rng.randrange(1024, 65535),
+                    dport=self.rng.randrange(1, self.fanout_ports + 1), flags="S"))
+
+    def _udp(self):
+        ip, mac = self.rng.choice(self.hosts)
+        payload = bytes(self.rng.getrandbits(8) for _ in range(self.rng.randrange(16, 512)))
+        return (Ether(src=mac) / IP(src=ip, dst=self.rng.choice(self.remote)) /
+                UDP(sport=self.rng.randrange(1024, 65535), dport=self.rng.choice([123, 443, 1900, 5000])) /
+                Raw(payload))
+
+    def frames(self, count: int) -> List[bytes]:
+        """Return `count` raw Ethernet frames."""
+        makers = {"arp": self._arp, "dns": self._dns, "syn": self._syn, "udp": self._udp}
+        kinds = self.rng.choices(self._kinds, weights=self._weights, k=count)
+        return [bytes(makers[kind]()) for kind in kinds]
@@ -21,8 +21,129 @@ WEB_UPDATE_INTERVAL = 5
 MAX_DEVICES = 1000
 MAX_CONNECTIONS_PER_DEVICE = 100
 MAX_DNS_QUERIES_PER_DEVICE = 50
+# Readers (web API, summaries) see the device log through snapshots; one is
+# reused for up to this many seconds, so busy readers cannot make the capture
+# path copy entries continually. 0 rebuilds on every change
+DEVICE_SNAPSHOT_MAX_AGE = 0.05
 
 # Logging settings
 LOG_LEVEL = 'INFO'  # DEBUG, INFO, WARNING, ERROR
 LOG_TO_FILE = False
-LOG_FILE = 'netsleuth.log' 
\ No newline at end of file
+LOG_FILE = 'netsleuth.log' 
+
+# ML anomaly scoring (batched)
+ML_BATCH_SIZE = 64           # Score once this many feature vectors are queued
+ML_BATCH_MAX_LATENCY_MS = 50 # ...or once the oldest queued vector is this old
+ML_QUEUE_MAXSIZE = 10000     # Vectors beyond this are dropped (counted)
+ML_WINDOW_SECONDS = 10       # Per-host feature window scored by models/isoforest_windows.pkl
+# 'packet' scores every packet (models/isoforest.pkl), 'window' each host once
+# per window, 'both' does both; 'auto' is 'window' when the window model exists
+ML_SCORING = 'auto'
+
+# Capture filter: these rules are compiled into a BPF program that the kernel
+# runs on each packet, so dropped traffic never reaches Python. A packet is
+# kept when it matches one entry of every non-empty include list and no entry
+# of the exclude lists (python main.py --print-filter shows the result).
+# Subnets match source or destination; ports are numbers or 'lo-hi' ranges and
+# match TCP/UDP source or destination, so an include port list drops ARP and
+# ICMP. CAPTURE_FILTER is any extra tcpdump-syntax expression, ANDed in
+CAPTURE_INCLUDE_SUBNETS = []  # e.g. ['192.168.0.0/16']
+CAPTURE_EXCLUDE_SUBNETS = []  # e.g. ['10.20.0.0/16'] (known-good backup network)
+CAPTURE_INCLUDE_PORTS = []
+CAPTURE_EXCLUDE_PORTS = []    # e.g. [873, '9000-9100']
+CAPTURE_PROTOCOLS = []        # Any of 'ip', 'ip6', 'arp', 'tcp', 'udp', 'icmp'; empty = all
+CAPTURE_FILTER = None
+# Bytes of each packet copied to userspace (Linux L2 capture); byte counts
+# still use the IP length. 0 keeps whole packets; below ~320 long DNS names
+# are cut off
+CAPTURE_SNAPLEN = 0
+
+# Sharded analysis workers (main.py --workers N)
+SHARD_BATCH_SIZE = 256            # Frames shipped to a worker per IPC message
+SHARD_BATCH_MAX_LATENCY_MS = 100  # Partial batches are flushed after this long
+SHARD_PUBLISH_INTERVAL = 1.0      # Seconds between worker state snapshots
+
+# Hot-path metrics (/api/metrics). False removes all per-packet instrumentation
+METRICS_ENABLED = True
+
+# Alerts: repeats of the same (type, ip, indicator) within this many seconds
+# are folded into the existing alert's count instead of raising a new one.
+# 0 disables suppression
+ALERT_COOLDOWN = 300
+
+# Alert storage: the dashboard keeps the most recent ALERT_RING_SIZE alerts in
+# memory; every alert is also appended to a rotating JSONL spool on disk,
+# which /api/alerts/export streams from. A relative ALERT_SPOOL_PATH is taken
+# from the repository root. Set ALERT_SPOOL_PATH = None to disable
+ALERT_RING_SIZE = 1000
+ALERT_SPOOL_PATH = 'logs/alerts.jsonl'
+ALERT_SPOOL_MAX_BYTES = 10 * 1024 * 1024  # Rotate when the spool reaches this size...
+ALERT_SPOOL_MAX_AGE = 3600                # ...or is this many seconds old
+ALERT_SPOOL_BACKUPS = 5                   # Rotated files kept (alerts.jsonl.1 .. .5)
+
+# Alert delivery: handlers and console output run on a pool of dispatch
+# threads fed by a bounded queue; alerts beyond it are dropped (counted).
+# 0 workers calls handlers inline on the capture thread
+ALERT_DISPATCH_WORKERS = 2
+ALERT_QUEUE_MAXSIZE = 1000
+ALERT_DISPATCH_BATCH = 64     # Alerts a dispatch thread takes off the queue at once
+
+# Alert indicators (case-insensitive substrings). DNS_INDICATOR_FEED may point
+# to a threat-intel file with one domain per line; its entries are matched
+# alongside SUSPICIOUS_DNS_TERMS in a single pass per query
+SUSPICIOUS_DNS_TERMS = [
+    'malware', 'virus', 'trojan', 'botnet', 'c2', 'command',
+    'control', 'exfil', 'data', 'steal', 'crypto', 'mining'
+]
+EXFIL_INDICATORS = [
+    'pastebin.com', 'github.com', 'gist.github.com',
+    'dropbox.com', 'drive.google.com', 'mega.nz'
+]
+DNS_INDICATOR_FEED = None
+# A flow whose initiator sent more than this raises a large_transfer alert
+# when it expires (0 disables)
+LARGE_TRANSFER_BYTES = 100 * 1024 * 1024
+
+# Flow table: bidirectional 5-tuple flows, expired after these idle times
+# (seconds). Half-open TCP (no reply yet) expires sooner so SYN floods recycle
+# entries; at FLOW_TABLE_MAX_FLOWS the soonest-due flows are evicted early
+FLOW_TABLE_MAX_FLOWS = 1_000_000
+FLOW_IDLE_TIMEOUT = 60
+FLOW_HALF_OPEN_TIMEOUT = 10
+FLOW_FINISHED_TIMEOUT = 5    # After RST, or FIN in both directions
+FLOW_RECENT_SIZE = 1000      # Expired flows kept for /api/flows
+FLOW_COUNTER_MAX_DEVICES = 65536  # Devices with per-device flow totals (/api/flows, /api/device/<ip>)
+
+# Live event stream (/api/events, Server-Sent Events): recent events kept for
+# clients resuming with Last-Event-ID, and each client's buffer before it is
+# told to resync. Device changes are batched every EVENT_DEVICE_INTERVAL seconds
+EVENT_BACKLOG = 1000
+EVENT_CLIENT_BUFFER = 256
+EVENT_DEVICE_INTERVAL = 0.5
+EVENT_KEEPALIVE = 15          # Seconds between keep-alive comments on an idle stream
+
+# Per-device traffic time series (/api/device/<ip>/timeseries): (step seconds,
+# slots) per resolution, each step a multiple of the finest. The finest tier
+# only has rows for the TIMESERIES_FINE_DEVICES most recently active devices
+# (~25 MB); the others cost 20 bytes x (slots + 1) per device, ~7 KB for the
+# default (70 MB per 10,000 devices). Rows are allocated as devices appear;
+# past either limit the least recently active device is dropped
+TIMESERIES_TIERS = [(1, 600), (60, 180), (3600, 168)]  # 10 min, 3 h, 7 days
+TIMESERIES_MAX_DEVICES = 65536
+TIMESERIES_FINE_DEVICES = 2048
+
+# Persistence: with a path, devices, alerts and anomalies are saved to this
+# SQLite database (WAL mode) by a background thread every
+# PERSIST_FLUSH_INTERVAL seconds and restored on startup (main.py --db PATH)
+PERSIST_PATH = None           # e.g. 'data/netsleuth.db'
+PERSIST_FLUSH_INTERVAL = 2.0
+PERSIST_RETENTION_DAYS = 30   # Older rows are pruned; 0 keeps everything
+
+# Web serving: 'auto' runs the API on waitress when installed (pip install
+# waitress), else on a threaded werkzeug server; 'development' is Flask's
+# app.run(). JSON bodies of WEB_COMPRESS_MIN_BYTES or more are gzip (or brotli)
+# compressed, and polled GET endpoints are cached for WEB_CACHE_TTL seconds
+WEB_SERVER = 'auto'
+WEB_THREADS = 16              # waitress worker threads; each open event stream holds one
+WEB_COMPRESS_MIN_BYTES = 1024
+WEB_CACHE_TTL = 1.0           # 0 disables the response cache
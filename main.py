@@ -1,6 +1,9 @@
 from src.core.sniffer import start_sniffing
 from src.utils.network_utils import get_active_interfaces
 from src.core.device_tracker import print_summary
+from src.core.alert_system import alert_system
+from src.core import persistence
+from src.core import capture_filter
 from src.web.web_interface import start_web_interface
 import threading
 import time
@@ -14,14 +17,76 @@ def start_periodic_summary(interval=30):
     thread = threading.Thread(target=summary_loop, daemon=True)
     thread.start()
 
+def start_web_thread(port):
+    web_thread = threading.Thread(
+        target=start_web_interface, 
+        kwargs={'port': port}, 
+        daemon=True
+    )
+    web_thread.start()
+    print(f"Web interface started at http://localhost:{port}")
+    print("Open your browser to view the real-time dashboard\n")
+
+def replay(args):
+    """Offline mode: push a capture file through the pipeline, then report."""
+    from src.core.replay import replay_pcap, print_replay_report
+
+    if args.web:
+        start_web_thread(args.port)
+
+    print(f"Replaying {args.read}...\n")
+    stats = replay_pcap(args.read, workers=args.workers)
+    print_summary()
+    print_replay_report(stats)
+
+    if args.web:
+        print("Replay finished; dashboard stays up until Ctrl+C.")
+        while True:
+            time.sleep(1)
+
+def print_filter():
+    """Show the BPF capture filter built from the CAPTURE_* settings."""
+    try:
+        bpf = capture_filter.build_filter()
+        snaplen = capture_filter.check_snaplen()
+    except ValueError as e:
+        print(f"[!] {e}")
+        return
+    print(f"Capture filter:   {bpf or '(none: every packet is captured)'}")
+    print(f"IP-only fallback: {capture_filter.ip_only(bpf)}")
+    print(f"Snaplen:          {snaplen or 'whole packets'}")
+
 def main():
     parser = argparse.ArgumentParser(description='NetSleuth - Network Traffic Monitor')
     parser.add_argument('--web', action='store_true', help='Start web interface')
     parser.add_argument('--interface', '-i', help='Network interface to monitor')
     parser.add_argument('--port', '-p', type=int, default=5000, help='Web interface port (default: 5000)')
+    parser.add_argument('--read', '-r', metavar='FILE', help='Replay a pcap/pcapng file at full speed instead of sniffing')
+    parser.add_argument('--workers', type=int, default=0, help='Analyze in N worker processes sharded by source IP (default: in-process)')
+    parser.add_argument('--db', metavar='FILE', default=persistence.PERSIST_PATH,
+                        help='Save state to this SQLite database and restore it on startup')
+    parser.add_argument('--print-filter', action='store_true',
+                        help='Print the BPF capture filter generated from config.py and exit')
     args = parser.parse_args()
 
+    if args.print_filter:
+        print_filter()
+        return
+
+    persistence.open_store(args.db)
     try:
+        if args.read:
+            replay(args)
+            return
+
+        # Reject bad CAPTURE_* rules before asking for an interface
+        try:
+            capture_filter.build_filter()
+            capture_filter.check_snaplen()
+        except ValueError as e:
+            print(f"[!] {e}")
+            return
+
         interfaces = get_active_interfaces()
 
         if not interfaces:
@@ -58,20 +123,20 @@ def main():
         
         # Start web interface if requested
         if args.web:
-            web_thread = threading.Thread(
-                target=start_web_interface, 
-                kwargs={'port': args.port}, 
-                daemon=True
-            )
-            web_thread.start()
-            print(f"Web interface started at http://localhost:{args.port}")
-            print("Open your browser to view the real-time dashboard\n")
+            start_web_thread(args.port)
 
         # Start sniffing
-        start_sniffing(interface=selected_iface, packet_count=0)
+        callback = None
+        if args.workers > 0:
+            from src.core.sharding import ShardedPipeline
+            callback = ShardedPipeline(args.workers).start().packet_callback
+        start_sniffing(interface=selected_iface, packet_count=0, callback=callback)
 
     except KeyboardInterrupt:
         print("\n[!] Interrupted by user. Exiting NetSleuth.\n")
+    finally:
+        alert_system.flush()
+        persistence.close_store()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,178 @@
+# alert_dispatch.py
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+# Import configuration
+try:
+    from config import ALERT_DISPATCH_WORKERS, ALERT_QUEUE_MAXSIZE, ALERT_DISPATCH_BATCH
+except ImportError:
+    ALERT_DISPATCH_WORKERS = 2
+    ALERT_QUEUE_MAXSIZE = 1000
+    ALERT_DISPATCH_BATCH = 64
+
+
+class AlertHandler:
+    """
+    One registered handler and its delivery counters.
+
+    With a `timeout` the handler runs on its own single thread and the
+    dispatcher stops waiting after `timeout` seconds; while a timed-out call
+    is still running, further deliveries to that handler are skipped (and
+    counted) instead of piling up behind it. With `batch_size` the handler
+    is called with a list of up to that many alerts instead of one alert.
+    """
+
+    def __init__(self, fn: Callable, timeout: Optional[float] = None,
+                 batch_size: Optional[int] = None, name: str = None):
+        self.fn = fn
+        self.name = name or getattr(fn, '__name__', repr(fn))
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.skipped = 0  # alerts not delivered because a timed-out call was still running
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def _invoke(self, arg) -> None:
+        try:
+            self.fn(arg)
+            self.calls += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Alert handler error: {e}")
+
+    def call(self, arg) -> None:
+        if self.timeout is None:
+            self._invoke(arg)
+            return
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                self.skipped += len(arg) if self.batch_size else 1
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(1, thread_name_prefix=f"alert-{self.name}")
+            self._pending = future = self._executor.submit(self._invoke, arg)
+        try:
+            future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.timeouts += 1
+            print(f"[!] Alert handler {self.name} timed out after {self.timeout}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'timeout': self.timeout,
+            'batch_size': self.batch_size,
+            'calls': self.calls,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'skipped': self.skipped,
+        }
+
+
+class AlertDispatcher:
+    """
+    Delivers alerts to handlers off the capture thread.
+
+    submit() only puts the alert on a bounded queue; when the queue is full
+    the alert is dropped (and counted) rather than blocking packet
+    processing. A pool of `workers` threads drains up to `max_batch` queued
+    alerts at a time and hands them to every handler. With `workers` = 0
+    handlers are called inline, as before. Handlers may be called from more
+    than one thread at once when `workers` > 1.
+    """
+
+    def __init__(self, workers: int = ALERT_DISPATCH_WORKERS,
+                 max_queue: int = ALERT_QUEUE_MAXSIZE,
+                 max_batch: int = ALERT_DISPATCH_BATCH):
+        self.workers = max(0, int(workers))
+        self.max_batch = max(1, int(max_batch))
+        self.handlers: List[AlertHandler] = []
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def add_handler(self, fn: Callable, timeout: Optional[float] = None,
+                    batch_size: Optional[int] = None, name: str = None) -> AlertHandler:
+        handler = AlertHandler(fn, timeout, batch_size, name)
+        self.handlers.append(handler)
+        return handler
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._run, daemon=True,
+                                     name=f"alert-dispatch-{len(self._threads)}")
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, alert: Dict) -> bool:
+        """Queue one alert for delivery; never blocks the caller."""
+        if not self.workers:
+            self._deliver([alert])
+            return True
+        if not self._threads:
+            self.start()
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Block until every queued alert has been delivered."""
+        if self._threads:
+            self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                print(f"[!] Alert dispatch error: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, alerts: List[Dict]) -> None:
+        for handler in list(self.handlers):
+            if handler.batch_size:
+                for i in range(0, len(alerts), handler.batch_size):
+                    handler.call(alerts[i:i + handler.batch_size])
+            else:
+                for alert in alerts:
+                    handler.call(alert)
+        with self._lock:
+            self.delivered += len(alerts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'queue_depth': self.queue_depth(),
+            'submitted': self.submitted,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'handlers': [h.stats() for h in self.handlers],
+        }
@@ -0,0 +1,136 @@
+# alert_spool.py
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator
+
+
+class AlertSpool:
+    """
+    Append-only JSONL log of alerts with size/age based rotation.
+
+    Writes go through a buffered file and are flushed at most every
+    `flush_interval` seconds (and on rotate/read), so raising an alert does
+    not cost a syscall. Rotated files are named <path>.1 (newest) to
+    <path>.<backups> (oldest), like logging.handlers.RotatingFileHandler.
+    The file is opened lazily, so a spool that never sees an alert never
+    touches the disk.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, max_age: float = 3600,
+                 backups: int = 5, flush_interval: float = 1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._file = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._last_flush = 0.0
+        self._failed = False
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8', buffering=64 * 1024)
+        self._size = self._file.tell()
+        self._opened_at = self._last_flush = time.monotonic()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def append(self, alert: Dict) -> None:
+        line = json.dumps(alert) + '\n'
+        with self._lock:
+            if self._failed:
+                return
+            try:
+                if self._file is None:
+                    self._open()
+                now = time.monotonic()
+                if self._size and (self._size + len(line) > self.max_bytes
+                                   or now - self._opened_at >= self.max_age):
+                    self._rotate()
+                self._file.write(line)
+                self._size += len(line)
+                self.written += 1
+                if now - self._last_flush >= self.flush_interval:
+                    self._file.flush()
+                    self._last_flush = now
+            except OSError as e:
+                self._failed = True
+                print(f"[!] Alert spool disabled ({self.path}): {e}")
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+
+    def files(self):
+        """Spool files that exist, oldest first."""
+        paths = [f"{self.path}.{i}" for i in range(self.backups, 0, -1)] + [self.path]
+        return [p for p in paths if os.path.exists(p)]
+
+    def iter_lines(self) -> Iterator[str]:
+        """Stream every spooled alert as its JSON text, oldest first."""
+        self.flush()
+        for path in self.files():
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        line = line.rstrip('\n')
+                        if line:
+                            yield line
+            except FileNotFoundError:
+                continue  # rotated away while we were reading
+
+    def last_id(self, tail: int = 64 * 1024) -> int:
+        """
+        Highest alert id in the newest spool file that has any (0 if none),
+        read from its last `tail` bytes: ids only grow, so the end suffices.
+        """
+        for path in reversed(self.files()):
+            try:
+                with open(path, 'rb') as f:
+                    size = f.seek(0, os.SEEK_END)
+                    f.seek(max(0, size - tail))
+                    lines = f.read().splitlines()
+            except OSError:
+                continue
+            if size > tail:
+                lines = lines[1:]  # probably cut mid-record
+            last = 0
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                if isinstance(record, dict):
+                    last = max(last, record.get('update', record).get('id') or 0)
+            if last:
+                return last
+        return 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -1,50 +1,219 @@
 # alert_system.py
+import os
+import threading
 import time
 import json
+from bisect import bisect_left, bisect_right
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Callable
+from itertools import islice
+from typing import Dict, List, Callable, Tuple
 from ..utils.device_mapper import get_hostname
+from ..utils.pattern_matcher import PatternMatcher, load_patterns
+from .alert_spool import AlertSpool
+from .alert_dispatch import AlertDispatcher
+from .event_bus import event_bus
+
+# Import configuration
+try:
+    from config import ALERT_COOLDOWN
+except ImportError:
+    ALERT_COOLDOWN = 300
+
+try:
+    from config import (ALERT_RING_SIZE, ALERT_SPOOL_PATH, ALERT_SPOOL_MAX_BYTES,
+                        ALERT_SPOOL_MAX_AGE, ALERT_SPOOL_BACKUPS)
+except ImportError:
+    ALERT_RING_SIZE = 1000
+    ALERT_SPOOL_PATH = 'logs/alerts.jsonl'
+    ALERT_SPOOL_MAX_BYTES = 10 * 1024 * 1024
+    ALERT_SPOOL_MAX_AGE = 3600
+    ALERT_SPOOL_BACKUPS = 5
+
+# A relative spool path is taken from the repository root (like MODEL_PATH),
+# not the working directory
+_ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+
+try:
+    from config import LARGE_TRANSFER_BYTES
+except ImportError:
+    LARGE_TRANSFER_BYTES = 100 * 1024 * 1024
+
+try:
+    from config import SUSPICIOUS_DNS_TERMS, EXFIL_INDICATORS, DNS_INDICATOR_FEED
+except ImportError:
+    SUSPICIOUS_DNS_TERMS = [
+        'malware', 'virus', 'trojan', 'botnet', 'c2', 'command',
+        'control', 'exfil', 'data', 'steal', 'crypto', 'mining'
+    ]
+    # Known data exfiltration services
+    EXFIL_INDICATORS = [
+        'pastebin.com', 'github.com', 'gist.github.com',
+        'dropbox.com', 'drive.google.com', 'mega.nz'
+    ]
+    DNS_INDICATOR_FEED = None
+
+
+def copy_alert(alert: Dict) -> Dict:
+    """A copy that later repeats of the alert do not change"""
+    return dict(alert, data=dict(alert['data']))
+
+
+def _alert_id(alert: Dict) -> int:
+    return alert['id']
+
+
+def _connection_port(conn: str):
+    """Destination port of an 'host:port' connection string, or None"""
+    if ':' in conn:
+        try:
+            return int(conn.split(':')[-1])
+        except ValueError:
+            return None
+    return None
+
 
 class AlertSystem:
     """Network monitoring alert system for security and performance events"""
     
-    def __init__(self):
-        self.alerts = []
-        self.alert_handlers = []
+    def __init__(self, cooldown: float = ALERT_COOLDOWN, ring_size: int = ALERT_RING_SIZE,
+                 spool_path: str = ALERT_SPOOL_PATH):
+        # Recent alerts for the dashboard; the full history lives in the spool
+        self.alerts = deque(maxlen=ring_size)
+        self.spool = AlertSpool(os.path.abspath(os.path.join(_ROOT, spool_path)), ALERT_SPOOL_MAX_BYTES, ALERT_SPOOL_MAX_AGE,
+                                ALERT_SPOOL_BACKUPS) if spool_path else None
+        self.total_alerts = 0
+        if self.spool is not None:
+            # The spool outlives the process: number after the alerts already
+            # in it, so an update record matches only its own run's alert
+            self.total_alerts = self.spool.last_id()
+        self.version = 0  # bumped on any change to the in-memory alerts
+        self.suppressed_alerts = 0
+        # Indicator matchers, compiled once; each new query/connection is one pass
+        self.dns_matcher = PatternMatcher(SUSPICIOUS_DNS_TERMS + load_patterns(DNS_INDICATOR_FEED))
+        self.exfil_matcher = PatternMatcher(EXFIL_INDICATORS)
+        self.cooldown = cooldown
+        # (type, ip, indicator) -> (alert, monotonic time its window closes)
+        self._active: Dict[Tuple, Tuple[Dict, float]] = {}
+        self._next_prune = 0.0
+        # Shard workers collect alerts updated by repeats (id -> alert) for
+        # the parent; the parent maps (worker, worker's id) -> its own copy
+        self.export_repeats = False
+        self._repeated: Dict[int, Dict] = {}
+        self._merged: Dict[Tuple, Tuple[Dict, float]] = {}
+        # Alerts changed by repeats since they were spooled (id -> alert); their
+        # new state is appended to the spool as {"update": alert} records
+        self._unspooled: Dict[int, Dict] = {}
+        self._next_spool_sync = 0.0
+        self._lock = threading.Lock()
+        # Handlers (and console output) run on the dispatcher's worker
+        # threads, never on the capture thread
+        self.dispatcher = AlertDispatcher()
+        self.dispatcher.add_handler(self._print_alert, name='console')
         self.alert_rules = {
             'new_device': True,
             'suspicious_dns': True,
             'high_connection_rate': True,
             'unknown_device': True,
             'port_scan': True,
-            'data_exfiltration': True
-        }
-        
-    def add_alert_handler(self, handler: Callable):
-        """Add a custom alert handler function"""
-        self.alert_handlers.append(handler)
-    
-    def create_alert(self, alert_type: str, severity: str, message: str, data: Dict = None):
-        """Create and process a new alert"""
-        alert = {
-            'timestamp': datetime.now().isoformat(),
-            'type': alert_type,
-            'severity': severity,  # LOW, MEDIUM, HIGH, CRITICAL
-            'message': message,
-            'data': data or {}
+            'data_exfiltration': True,
+            'large_transfer': True
         }
+        # Incremental detector state: ip -> {port: connections in history}
+        self._device_ports: Dict[str, Dict[int, int]] = {}
         
-        self.alerts.append(alert)
-        
-        # Call alert handlers
-        for handler in self.alert_handlers:
-            try:
-                handler(alert)
-            except Exception as e:
-                print(f"Alert handler error: {e}")
+    def add_alert_handler(self, handler: Callable, timeout: float = None, batch_size: int = None):
+        """
+        Add a custom alert handler function. With `timeout` (seconds) a slow
+        call stops holding up delivery; with `batch_size` the handler gets a
+        list of up to that many alerts per call instead of one alert.
+        """
+        return self.dispatcher.add_handler(handler, timeout=timeout, batch_size=batch_size)
+    
+    def flush(self):
+        """Wait until every raised alert has been delivered to the handlers (and spooled)"""
+        self.dispatcher.flush()
+        if self.spool is not None:
+            with self._lock:
+                self._spool_updates(time.monotonic(), force=True)
+    
+    def create_alert(self, alert_type: str, severity: str, message: str, data: Dict = None,
+                     ip: str = None, indicator: str = None):
+        """
+        Create and process a new alert. Alerts raised for an ip are suppressed
+        per (type, ip, indicator) for `cooldown` seconds: a repeat inside the
+        window only bumps the existing alert's count, last_seen, message and
+        data, without handlers or console output. Handlers run asynchronously.
+        """
+        now = time.monotonic()
+        key = None
+        if ip is not None and self.cooldown > 0:
+            key = (alert_type, ip, indicator)
+        # Raised from the capture, scorer, web and shard-collector threads:
+        # ids must follow ring (and spool) order
+        with self._lock:
+            if key is not None:
+                active = self._active.get(key)
+                if active is not None and now < active[1]:
+                    alert = active[0]
+                    alert['count'] += 1
+                    alert['last_seen'] = datetime.now().isoformat()
+                    alert['message'] = message
+                    if data:
+                        alert['data'].update(data)
+                    if self.export_repeats:
+                        self._repeated[alert['id']] = alert
+                    if self.spool is not None:
+                        self._unspooled[alert['id']] = alert
+                        self._spool_updates(now)
+                    self.suppressed_alerts += 1
+                    self.version += 1
+                    return alert
+            
+            timestamp = datetime.now().isoformat()
+            alert = {
+                'id': self.total_alerts + 1,  # increases by one per alert
+                'timestamp': timestamp,
+                'type': alert_type,
+                'severity': severity,  # LOW, MEDIUM, HIGH, CRITICAL
+                'message': message,
+                'data': data or {},
+                'count': 1,
+                'last_seen': timestamp
+            }
+            
+            if key is not None:
+                self._prune_cooldowns(now)
+                self._active[key] = (alert, now + self.cooldown)
+            
+            self.alerts.append(alert)
+            self.total_alerts += 1
+            self.version += 1
+            if self.spool is not None:
+                self.spool.append(alert)
+                self._spool_updates(now)
+            event_bus.publish('alert', alert)
         
-        # Print alert
-        self._print_alert(alert)
+        # Hand off to handlers and console output
+        self.dispatcher.submit(alert)
+        return alert
+    
+    def _spool_updates(self, now: float, force: bool = False):
+        """Spool the current state of repeated alerts, at most once a second unless forced"""
+        if not self._unspooled or (now < self._next_spool_sync and not force):
+            return
+        pending, self._unspooled = self._unspooled, {}
+        for alert in pending.values():
+            self.spool.append({'update': alert})
+        self._next_spool_sync = now + 1.0
+    
+    def _prune_cooldowns(self, now: float):
+        """Forget expired suppression windows, at most once per cooldown period"""
+        if now < self._next_prune:
+            return
+        self._active = {k: v for k, v in self._active.items() if v[1] > now}
+        self._merged = {k: v for k, v in self._merged.items() if v[1] > now}
+        self._next_prune = now + self.cooldown
     
     def _print_alert(self, alert):
         """Print formatted alert"""
@@ -71,107 +240,276 @@ class AlertSystem:
                 'new_device',
                 'MEDIUM',
                 f"New device detected: {hostname} ({ip})",
-                {'ip': ip, 'mac': mac, 'hostname': hostname}
+                {'ip': ip, 'mac': mac, 'hostname': hostname},
+                ip=ip
             )
     
-    def check_suspicious_dns(self, ip: str, dns_queries: List[str]):
-        """Check for suspicious DNS queries"""
+    def check_suspicious_dns(self, ip: str, query: str):
+        """Check a newly seen DNS query for suspicious terms"""
         if not self.alert_rules['suspicious_dns']:
             return
             
-        suspicious_domains = [
-            'malware', 'virus', 'trojan', 'botnet', 'c2', 'command',
-            'control', 'exfil', 'data', 'steal', 'crypto', 'mining'
-        ]
-        
-        for query in dns_queries:
-            query_lower = query.lower()
-            for suspicious in suspicious_domains:
-                if suspicious in query_lower:
-                    self.create_alert(
-                        'suspicious_dns',
-                        'HIGH',
-                        f"Suspicious DNS query from {ip}: {query}",
-                        {'ip': ip, 'query': query, 'suspicious_term': suspicious}
-                    )
-                    break
-    
-    def check_high_connection_rate(self, ip: str, connections: List[str], threshold: int = 50):
+        suspicious = self.dns_matcher.first(query)
+        if suspicious:
+            self.create_alert(
+                'suspicious_dns',
+                'HIGH',
+                f"Suspicious DNS query from {ip}: {query}",
+                {'ip': ip, 'query': query, 'suspicious_term': suspicious},
+                ip=ip, indicator=suspicious
+            )
+    
+    def check_high_connection_rate(self, ip: str, connection_count: int, threshold: int = 50):
         """Check for unusually high connection rates"""
         if not self.alert_rules['high_connection_rate']:
             return
             
-        if len(connections) > threshold:
+        if connection_count > threshold:
             self.create_alert(
                 'high_connection_rate',
                 'MEDIUM',
-                f"High connection rate from {ip}: {len(connections)} connections",
-                {'ip': ip, 'connection_count': len(connections), 'threshold': threshold}
+                f"High connection rate from {ip}: {connection_count} connections",
+                {'ip': ip, 'connection_count': connection_count, 'threshold': threshold},
+                ip=ip
             )
     
-    def check_port_scan(self, ip: str, connections: List[str]):
-        """Detect potential port scanning activity"""
+    def check_port_scan(self, ip: str, connection: str, evicted: str = None):
+        """
+        Detect potential port scanning activity. Keeps a per-device count of
+        connections per destination port, updated for the newly added
+        connection and for the one the device history evicted, so the
+        distinct-port total always matches the history without rescanning it.
+        """
+        ports = self._device_ports.setdefault(ip, {})
+        port = _connection_port(connection)
+        if port is not None:
+            ports[port] = ports.get(port, 0) + 1
+        old_port = _connection_port(evicted) if evicted is not None else None
+        if old_port is not None and old_port in ports:
+            if ports[old_port] <= 1:
+                del ports[old_port]
+            else:
+                ports[old_port] -= 1
+        
         if not self.alert_rules['port_scan']:
             return
             
-        # Extract unique ports
-        ports = set()
-        for conn in connections:
-            if ':' in conn:
-                try:
-                    port = int(conn.split(':')[-1])
-                    ports.add(port)
-                except ValueError:
-                    continue
-        
         # Alert if many different ports are accessed
         if len(ports) > 20:
             self.create_alert(
                 'port_scan',
                 'HIGH',
                 f"Potential port scan from {ip}: {len(ports)} different ports",
-                {'ip': ip, 'ports': list(ports), 'port_count': len(ports)}
+                {'ip': ip, 'ports': list(ports), 'port_count': len(ports)},
+                ip=ip
             )
     
-    def check_data_exfiltration(self, ip: str, connections: List[str]):
-        """Detect potential data exfiltration patterns"""
+    def check_data_exfiltration(self, ip: str, connection: str):
+        """Check a newly seen connection against data exfiltration destinations"""
         if not self.alert_rules['data_exfiltration']:
             return
             
-        # Check for connections to known data exfiltration services
-        exfil_indicators = [
-            'pastebin.com', 'github.com', 'gist.github.com',
-            'dropbox.com', 'drive.google.com', 'mega.nz'
-        ]
+        for indicator in self.exfil_matcher.matches(connection):
+            self.create_alert(
+                'data_exfiltration',
+                'CRITICAL',
+                f"Potential data exfiltration from {ip} to {indicator}",
+                {'ip': ip, 'destination': connection, 'indicator': indicator},
+                ip=ip, indicator=indicator
+            )
+    
+    def check_large_transfer(self, flow: Dict, threshold: int = LARGE_TRANSFER_BYTES):
+        """Flow-table consumer: check an expired flow for a bulk upload by its initiator"""
+        if not self.alert_rules['large_transfer'] or not threshold:
+            return
         
+        sent = flow['fwd_bytes']
+        if sent > threshold:
+            ip, destination = flow['src_ip'], f"{flow['dst_ip']}:{flow['dst_port']}"
+            self.create_alert(
+                'large_transfer',
+                'HIGH',
+                f"Large upload from {ip} to {destination}: {sent / 1e6:.1f} MB "
+                f"in {flow['duration']:.0f}s",
+                {'ip': ip, 'destination': destination, 'protocol': flow['protocol'],
+                 'bytes_sent': sent, 'bytes_received': flow['rev_bytes'],
+                 'duration': flow['duration'], 'threshold': threshold},
+                ip=ip, indicator=flow['dst_ip']
+            )
+    
+    def track_device_ports(self, ip: str, connections):
+        """Rebuild check_port_scan's per-port counts for ip from its whole connection history"""
+        ports = {}
         for conn in connections:
-            for indicator in exfil_indicators:
-                if indicator in conn.lower():
-                    self.create_alert(
-                        'data_exfiltration',
-                        'CRITICAL',
-                        f"Potential data exfiltration from {ip} to {indicator}",
-                        {'ip': ip, 'destination': conn, 'indicator': indicator}
-                    )
+            port = _connection_port(conn)
+            if port is not None:
+                ports[port] = ports.get(port, 0) + 1
+        self._device_ports[ip] = ports
+    
+    def forget_devices(self):
+        """Drop per-device detector state, e.g. after the device log is cleared"""
+        self._device_ports.clear()
+    
+    def take_repeats(self) -> List[Dict]:
+        """Copies of the alerts updated by suppressed repeats since the last call (export_repeats)"""
+        repeated, self._repeated = self._repeated, {}
+        return [copy_alert(alert) for alert in repeated.values()]
+    
+    def merge_alerts(self, alerts: List[Dict], repeats: List[Dict] = None, source=None):
+        """
+        Add alerts raised by a shard worker (`source`): they are renumbered,
+        spooled, published and delivered to this process's handlers. `repeats`
+        are the worker's updated copies of alerts it raised earlier; their
+        count, last_seen, message and data replace those of the merged alert.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for alert in alerts or ():
+                key = (source, alert['id'])
+                self.total_alerts += 1
+                alert['id'] = self.total_alerts
+                self.suppressed_alerts += alert['count'] - 1  # repeated before it was published
+                if self.cooldown > 0:
+                    # Repeats can arrive until the worker's window closes, a publish later
+                    self._prune_cooldowns(now)
+                    self._merged[key] = (alert, now + self.cooldown + 60)
+                self.alerts.append(alert)
+                if self.spool is not None:
+                    self.spool.append(alert)
+                event_bus.publish('alert', alert)
+            for update in repeats or ():
+                merged = self._merged.get((source, update['id']))
+                if merged is None or update['count'] < merged[0]['count']:
+                    continue
+                alert = merged[0]
+                self.suppressed_alerts += max(0, update['count'] - alert['count'])
+                for field in ('count', 'last_seen', 'message', 'data'):
+                    alert[field] = update[field]
+                if self.spool is not None:
+                    self._unspooled[alert['id']] = alert
+            if alerts or repeats:
+                self.version += 1
+            if self.spool is not None:
+                self._spool_updates(now)
+        for alert in alerts or ():
+            self.dispatcher.submit(alert)
+    
+    def restore_alerts(self, alerts: List[Dict]):
+        """
+        Load alerts saved by an earlier run (oldest first) into the ring, and
+        continue numbering after them. Not spooled, published or delivered again.
+        """
+        if not alerts:
+            return
+        with self._lock:
+            self.alerts.extend(alerts)
+            self.total_alerts = max(self.total_alerts, alerts[-1]['id'])
+            self.version += 1
+    
+    def alerts_since(self, seen: int) -> List[Dict]:
+        """Alerts with an id above `seen` that the ring still holds, oldest first"""
+        with self._lock:
+            alerts = list(self.alerts)
+        return alerts[bisect_right(alerts, seen, key=_alert_id):]
     
     def get_alerts(self, limit: int = 100) -> List[Dict]:
         """Get recent alerts"""
-        return self.alerts[-limit:]
+        if limit <= 0:
+            return list(self.alerts)
+        recent = list(islice(reversed(self.alerts), limit))
+        recent.reverse()
+        return recent
+    
+    def query_alerts(self, limit: int = 50, since: int = None, before: int = None,
+                     severity: List[str] = None, alert_type: str = None, ip: str = None) -> List[Dict]:
+        """
+        Alerts matching the filters, oldest first (like get_alerts). Without a
+        cursor this is the newest `limit`; `before=<id>` pages back through
+        older alerts, and `since=<id>` returns the first `limit` alerts after
+        it, so a poller can move its cursor to the highest id it received.
+        A limit of 0 means no limit.
+        """
+        with self._lock:
+            alerts = list(self.alerts)  # oldest first, id rising
+        if not alerts:
+            return []
+        if limit <= 0:
+            limit = len(alerts)
+        
+        checks = []
+        if severity:
+            severities = {s.upper() for s in severity}
+            checks.append(lambda a: a['severity'] in severities)
+        if alert_type:
+            checks.append(lambda a: a['type'] == alert_type)
+        if ip:
+            checks.append(lambda a: a['data'].get('ip') == ip)
+        wanted = (lambda a: all(check(a) for check in checks)) if checks else None
+        
+        if since is not None:
+            start = bisect_right(alerts, since, key=_alert_id)
+            return list(islice(filter(wanted, islice(alerts, start, None)), limit))
+        end = len(alerts) if before is None else bisect_left(alerts, before, key=_alert_id)
+        page = list(islice(filter(wanted, reversed(alerts[:end])), limit))
+        page.reverse()
+        return page
     
     def clear_alerts(self):
-        """Clear all alerts"""
-        self.alerts.clear()
+        """Clear the in-memory alerts (the on-disk spool is kept)"""
+        with self._lock:
+            self.alerts.clear()
+            self._active.clear()
+            self.version += 1
+        event_bus.publish('reset', {'reason': 'alerts_cleared'})
     
     def export_alerts(self, filename: str = None):
-        """Export alerts to JSON file"""
+        """
+        Export alerts to a JSON file. Streams the spooled history line by
+        line, so the export never builds one big document in memory; without
+        a spool only the in-memory ring is exported. Alerts updated by
+        repeats are written once, in their latest spooled state.
+        """
         if not filename:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"alerts_{timestamp}.json"
         
+        if self.spool is not None:
+            with self._lock:
+                self._spool_updates(time.monotonic(), force=True)
+            lines = self._spooled_alerts()
+        else:
+            lines = (json.dumps(alert) for alert in list(self.alerts))
+        
+        count = 0
         with open(filename, 'w') as f:
-            json.dump(self.alerts, f, indent=2)
+            f.write('[')
+            for line in lines:
+                f.write(',\n' if count else '\n')
+                f.write(line)
+                count += 1
+            f.write('\n]\n')
         
-        print(f"Alerts exported to {filename}")
+        print(f"{count} alerts exported to {filename}")
+
+    def _spooled_alerts(self):
+        """Spooled alert lines, oldest first, with each update folded into its alert"""
+        # First pass: only the (few) repeated alerts' latest state is kept
+        updates = {}
+        for line in self.spool.iter_lines():
+            if line.startswith('{"update": '):
+                alert = json.loads(line)['update']
+                updates[alert['id']] = json.dumps(alert)
+        for line in self.spool.iter_lines():
+            if line.startswith('{"update": '):
+                continue
+            if updates:
+                latest = updates.pop(json.loads(line).get('id'), None)
+                if latest is not None:
+                    yield latest
+                    continue
+            yield line
+        # Updates whose alert was rotated out of the spool
+        yield from updates.values()
 
 # Global alert system instance
 alert_system = AlertSystem() 
\ No newline at end of file
@@ -1,10 +1,7 @@
 # analyzer.py
-from scapy.layers.inet import TCP, UDP, IP
-from scapy.layers.dns  import DNS
-from scapy.layers.l2   import ARP, Ether
-from scapy.packet      import Raw
 import time
 from .device_tracker import update_device   #  (ip, mac, field, value)
+from .fast_decoder import PacketHeaders, decode_packet
 
 # Import configuration
 try:
@@ -25,40 +22,41 @@ def colored(text, color):
 
 #Main Dispatch
 def analyze_packet(pkt, mac_src=None, ip_src=None, ip_dst=None):
-    """Parse one Scapy packet; update device log."""
+    """Parse one packet (PacketHeaders record or Scapy packet); update device log."""
     now = time.strftime('%H:%M:%S')
 
     try:
+        hdr = pkt if isinstance(pkt, PacketHeaders) else decode_packet(pkt, keep_payload=VERBOSE)
+
         # Fallback extraction if sniffer didn't supply values
-        if mac_src is None and pkt.haslayer(Ether):
-            mac_src = pkt[Ether].src.lower()
-        if ip_src is None and pkt.haslayer(IP):
-            ip_src = pkt[IP].src
-        if ip_dst is None and pkt.haslayer(IP):
-            ip_dst = pkt[IP].dst
+        if mac_src is None:
+            mac_src = hdr.mac_src
+        if ip_src is None and hdr.is_ip:
+            ip_src = hdr.ip_src
+        if ip_dst is None and hdr.is_ip:
+            ip_dst = hdr.ip_dst
 
         # ARP
-        if pkt.haslayer(ARP):
-            handle_arp(pkt[ARP], mac_src, now)
+        if hdr.is_arp:
+            handle_arp(hdr, mac_src, now)
 
         # DNS (UDP/53)
-        if pkt.haslayer(DNS):
-            handle_dns(pkt, mac_src, ip_src, now)
+        if hdr.is_dns:
+            handle_dns(hdr, mac_src, ip_src, now)
 
         # UDP (non-DNS)
-        if pkt.haslayer(UDP) and not pkt.haslayer(DNS):
-            handle_udp(pkt[UDP], ip_src, ip_dst, mac_src, now)
+        if hdr.l4 == "UDP" and not hdr.is_dns:
+            handle_udp(hdr, ip_src, ip_dst, mac_src, now)
 
         # TCP
-        if pkt.haslayer(TCP):
-            handle_tcp(pkt[TCP], ip_src, ip_dst, mac_src, now)
+        if hdr.l4 == "TCP":
+            handle_tcp(hdr, ip_src, ip_dst, mac_src, now)
 
         # Optional mDNS / service discovery inspection
-        if pkt.haslayer(Raw):
-            raw = bytes(pkt[Raw])
+        if VERBOSE and hdr.payload:
+            raw = hdr.payload
             if b'model=' in raw or b'manufacturer=' in raw:
-                if VERBOSE:
-                    print(colored(f"[{now}] [mDNS] Possible device info: {raw}", "green"))
+                print(colored(f"[{now}] [mDNS] Possible device info: {raw}", "green"))
 
     except Exception as e:
         if VERBOSE:
@@ -66,37 +64,30 @@ def analyze_packet(pkt, mac_src=None, ip_src=None, ip_dst=None):
 
 # Layer-specific handlers
 
-def handle_arp(arp, mac_src, now):
+def handle_arp(hdr, mac_src, now):
     if VERBOSE:
-        print(colored(f"[{now}] [ARP] {arp.psrc} → {arp.pdst}", "yellow"))
-    update_device(arp.psrc, mac_src, "services", f"ARP→{arp.pdst}")
+        print(colored(f"[{now}] [ARP] {hdr.ip_src} → {hdr.ip_dst}", "yellow"))
+    update_device(hdr.ip_src, mac_src, "services", f"ARP→{hdr.ip_dst}")
 
-def handle_dns(pkt, mac_src, ip_src, now):
+def handle_dns(hdr, mac_src, ip_src, now):
     if not ip_src:
         return
     if VERBOSE:
         print(colored(f"[{now}] [DNS] Query from {ip_src}", "magenta"))
-    
-    # Safely extract DNS query name
-    try:
-        if pkt[DNS].qd and pkt[DNS].qd.qname:
-            qname = pkt[DNS].qd.qname.decode(errors="ignore").rstrip('.')
-            update_device(ip_src, mac_src, "dns_queries", qname)
-    except (AttributeError, IndexError):
-        # DNS packet doesn't have expected structure
-        pass
-
-def handle_udp(udp, ip_src, ip_dst, mac_src, now):
+
+    if hdr.dns_qname:
+        update_device(ip_src, mac_src, "dns_queries", hdr.dns_qname)
+
+def handle_udp(hdr, ip_src, ip_dst, mac_src, now):
     if not ip_src or not ip_dst:
         return
     if VERBOSE:
-        print(colored(f"[{now}] [UDP] {ip_src}:{udp.sport} → {ip_dst}:{udp.dport}", "blue"))
-    update_device(ip_src, mac_src, "connections", f"{ip_dst}:{udp.dport}")
+        print(colored(f"[{now}] [UDP] {ip_src}:{hdr.sport} → {ip_dst}:{hdr.dport}", "blue"))
+    update_device(ip_src, mac_src, "connections", f"{ip_dst}:{hdr.dport}")
 
-def handle_tcp(tcp, ip_src, ip_dst, mac_src, now):
+def handle_tcp(hdr, ip_src, ip_dst, mac_src, now):
     if not ip_src or not ip_dst:
         return
-    flags = tcp.sprintf("%TCP.flags%")
     if VERBOSE:
-        print(colored(f"[{now}] [TCP] {ip_src}:{tcp.sport} → {ip_dst}:{tcp.dport} [{flags}]", "cyan"))
-    update_device(ip_src, mac_src, "connections", f"{ip_dst}:{tcp.dport}")
+        print(colored(f"[{now}] [TCP] {ip_src}:{hdr.sport} → {ip_dst}:{hdr.dport} [{hdr.flags_str()}]", "cyan"))
+    update_device(ip_src, mac_src, "connections", f"{ip_dst}:{hdr.dport}")
@@ -1,9 +1,14 @@
 
+import itertools
+import threading
+from bisect import bisect_left, bisect_right
 from collections import deque
 from dataclasses import dataclass, asdict
-from typing import Deque, Dict, Any, List
+from typing import Deque, Dict, Any, List, Optional
 from datetime import datetime
 
+from .event_bus import event_bus
+
 
 @dataclass
 class AnomalyEvent:
@@ -15,17 +20,89 @@ class AnomalyEvent:
     protocol: str
     score: float
     extra: Dict[str, Any]
+    seq: int = 0  # assigned by AnomalyStore.add; increases by one per event
+
+
+def _neg_seq(event: AnomalyEvent) -> int:
+    return -event.seq
 
 
 class AnomalyStore:
     def __init__(self, maxlen: int = 500):
         self._events: Deque[AnomalyEvent] = deque(maxlen=maxlen)
+        self.added = 0  # total events ever added, for delta consumers
+        # Both scorer threads add events: seq order must match store order
+        self._lock = threading.Lock()
 
     def add(self, event: AnomalyEvent) -> None:
-        self._events.appendleft(event)
+        with self._lock:
+            self.added += 1
+            event.seq = self.added
+            self._events.appendleft(event)
+            event_bus.publish('anomaly', event)
+
+    def restore(self, events: List[AnomalyEvent]) -> None:
+        """Load events saved by an earlier run (oldest first); seq continues after them."""
+        with self._lock:
+            for event in events:
+                self._events.appendleft(event)
+            if events:
+                self.added = max(self.added, events[-1].seq)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def latest(self, n: int) -> List[AnomalyEvent]:
+        """The n most recent events (newest first), as stored."""
+        with self._lock:
+            return list(itertools.islice(self._events, n))
+
+    def events_since(self, seq: int) -> List[AnomalyEvent]:
+        """Stored events with a seq above `seq` (newest first), as stored."""
+        with self._lock:
+            events = list(self._events)
+        return events[:bisect_left(events, -seq, key=_neg_seq)]
 
     def list(self) -> List[Dict[str, Any]]:
-        return [asdict(e) for e in self._events]
+        with self._lock:
+            events = list(self._events)
+        return [asdict(e) for e in events]
+
+    def query(self, limit: int = 200, since: Optional[int] = None, before: Optional[int] = None,
+              src_ip: Optional[str] = None, protocol: Optional[str] = None,
+              min_score: Optional[float] = None, max_score: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Events matching the filters, newest first; only the returned page is
+        converted to dicts. Without a cursor this is the newest `limit`.
+        `before=<seq>` pages back through older events. `since=<seq>` returns
+        the oldest `limit` events after it, so a poller can move its cursor
+        to the highest seq it received.
+        """
+        with self._lock:
+            events = list(self._events)  # newest first, seq falling
+        if not events or limit <= 0:
+            return []
+
+        checks = []
+        if src_ip:
+            checks.append(lambda e: e.src_ip == src_ip)
+        if protocol:
+            protocol = protocol.upper()
+            checks.append(lambda e: e.protocol == protocol)
+        if min_score is not None:
+            checks.append(lambda e: e.score >= min_score)
+        if max_score is not None:
+            checks.append(lambda e: e.score <= max_score)
+        wanted = (lambda e: all(check(e) for check in checks)) if checks else None
+
+        if since is not None:
+            end = bisect_left(events, -since, key=_neg_seq)  # first event with seq <= since
+            page = list(itertools.islice(filter(wanted, reversed(events[:end])), limit))
+            page.reverse()
+        else:
+            start = 0 if before is None else bisect_right(events, -before, key=_neg_seq)
+            page = list(itertools.islice(filter(wanted, itertools.islice(events, start, None)), limit))
+        return [asdict(e) for e in page]
 
 
 # global singleton for now
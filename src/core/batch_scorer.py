@@ -0,0 +1,140 @@
+# batch_scorer.py
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.ml.model_manager import TrafficAnomalyModel, AnomalyResult
+
+# Import configuration
+try:
+    from config import ML_BATCH_SIZE, ML_BATCH_MAX_LATENCY_MS, ML_QUEUE_MAXSIZE
+except ImportError:
+    ML_BATCH_SIZE = 64
+    ML_BATCH_MAX_LATENCY_MS = 50
+    ML_QUEUE_MAXSIZE = 10000
+
+# (feature vector, packet metadata) as queued by the capture thread
+QueuedItem = Tuple[List[float], Dict[str, Any]]
+
+
+class BatchAnomalyScorer:
+    """
+    Background ML scoring stage.
+
+    The capture thread only submits feature vectors; a worker thread drains
+    them in blocks of `batch_size` (or whatever arrived within
+    `max_latency_ms`), scores each block with one model call and hands every
+    anomaly to `on_anomaly(meta, result)`.
+    """
+
+    def __init__(self,
+                 model: TrafficAnomalyModel,
+                 on_anomaly: Callable[[Dict[str, Any], AnomalyResult], None],
+                 batch_size: int = ML_BATCH_SIZE,
+                 max_latency_ms: float = ML_BATCH_MAX_LATENCY_MS,
+                 max_queue: int = ML_QUEUE_MAXSIZE):
+        self.model = model
+        self.on_anomaly = on_anomaly
+        self.batch_size = max(1, int(batch_size))
+        self.max_latency = max(0.0, max_latency_ms / 1000.0)
+        self._queue: "queue.Queue[QueuedItem]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = 0
+        self.batches = 0
+        self.anomalies = 0
+        self.score_time = 0.0  # seconds spent scoring and routing batches
+        self.batch_histogram = None  # set when metrics are enabled
+
+    @property
+    def enabled(self) -> bool:
+        return self.model is not None and self.model.model is not None
+
+    def start(self) -> None:
+        """Start the worker thread (idempotent)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def submit(self, vec: List[float], meta: Dict[str, Any]) -> bool:
+        """Queue one feature vector; never blocks the caller."""
+        if not self.enabled:
+            return False
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait((vec, meta))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Block until every submitted vector has been scored."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'queue_depth': self.queue_depth(),
+            'batch_size': self.batch_size,
+            'max_latency_ms': self.max_latency * 1000.0,
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'scored': self.scored,
+            'batches': self.batches,
+            'anomalies': self.anomalies,
+            'score_time': self.score_time,
+        }
+
+    def _next_batch(self) -> List[QueuedItem]:
+        # Block for the first item, then collect until full or the deadline hits
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            start = time.perf_counter()
+            try:
+                self._score_batch(batch)
+            except Exception as e:
+                print(f"[ML] Batch scoring error: {e}")
+            finally:
+                elapsed = time.perf_counter() - start
+                self.score_time += elapsed
+                if self.batch_histogram is not None:
+                    self.batch_histogram.observe(elapsed)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _score_batch(self, batch: List[QueuedItem]) -> None:
+        results = self.model.predict_batch([vec for vec, _ in batch])
+        if results is None:
+            return
+        self.batches += 1
+        self.scored += len(results)
+        for (_, meta), result in zip(batch, results):
+            if result.is_anomaly:
+                self.anomalies += 1
+                self.on_anomaly(meta, result)
@@ -0,0 +1,120 @@
+# capture_filter.py
+import ipaddress
+import socket
+from typing import Optional
+
+# Import configuration
+try:
+    from config import (CAPTURE_INCLUDE_SUBNETS, CAPTURE_EXCLUDE_SUBNETS, CAPTURE_INCLUDE_PORTS,
+                        CAPTURE_EXCLUDE_PORTS, CAPTURE_PROTOCOLS, CAPTURE_FILTER, CAPTURE_SNAPLEN)
+except ImportError:
+    CAPTURE_INCLUDE_SUBNETS = []
+    CAPTURE_EXCLUDE_SUBNETS = []
+    CAPTURE_INCLUDE_PORTS = []
+    CAPTURE_EXCLUDE_PORTS = []
+    CAPTURE_PROTOCOLS = []
+    CAPTURE_FILTER = None
+    CAPTURE_SNAPLEN = 0
+
+PROTOCOLS = ('ip', 'ip6', 'arp', 'tcp', 'udp', 'icmp')
+
+# Ethernet + IPv4 + TCP headers with options, so the fast decoder still
+# finds ports and flags
+MIN_SNAPLEN = 96
+
+_BPF_RET_K = 0x06
+
+
+def _any(terms) -> str:
+    return terms[0] if len(terms) == 1 else "(" + " or ".join(terms) + ")"
+
+
+def _net(subnet) -> str:
+    try:
+        net = ipaddress.ip_network(str(subnet).strip(), strict=False)
+    except ValueError:
+        raise ValueError(f"capture filter: {subnet!r} is not an IP address or subnet")
+    if net.prefixlen == net.max_prefixlen:
+        return f"host {net.network_address}"
+    return f"net {net}"
+
+
+def _port(port) -> str:
+    lo, _, hi = str(port).partition("-")
+    try:
+        lo, hi = int(lo), int(hi or lo)
+    except ValueError:
+        lo, hi = 0, -1
+    if not 0 < lo <= hi <= 65535:
+        raise ValueError(f"capture filter: {port!r} is not a port or port range (e.g. 8000-8100)")
+    return f"port {lo}" if lo == hi else f"portrange {lo}-{hi}"
+
+
+def build_filter(include_subnets=None, exclude_subnets=None, include_ports=None,
+                 exclude_ports=None, protocols=None, extra=None) -> Optional[str]:
+    """
+    BPF expression for the capture rules (the CAPTURE_* settings unless
+    given). A packet is kept when it matches one entry of every non-empty
+    include list and no entry of the exclude lists. None when no rule is
+    set, i.e. capture everything.
+    """
+    include_subnets = CAPTURE_INCLUDE_SUBNETS if include_subnets is None else include_subnets
+    exclude_subnets = CAPTURE_EXCLUDE_SUBNETS if exclude_subnets is None else exclude_subnets
+    include_ports = CAPTURE_INCLUDE_PORTS if include_ports is None else include_ports
+    exclude_ports = CAPTURE_EXCLUDE_PORTS if exclude_ports is None else exclude_ports
+    protocols = CAPTURE_PROTOCOLS if protocols is None else protocols
+    extra = CAPTURE_FILTER if extra is None else extra
+
+    terms = []
+    if protocols:
+        names = [str(p).strip().lower() for p in protocols]
+        unknown = [p for p in names if p not in PROTOCOLS]
+        if unknown:
+            raise ValueError(f"capture filter: unknown protocol(s) {unknown}, expected some of {list(PROTOCOLS)}")
+        terms.append(_any(names))
+    if include_subnets:
+        terms.append(_any([_net(s) for s in include_subnets]))
+    if include_ports:
+        terms.append(_any([_port(p) for p in include_ports]))
+    # and/or share one precedence level in BPF, so every group is bracketed
+    if exclude_subnets:
+        terms.append("not " + _any([_net(s) for s in exclude_subnets]))
+    if exclude_ports:
+        terms.append("not " + _any([_port(p) for p in exclude_ports]))
+    if extra and extra.strip():
+        terms.append(f"({extra.strip()})")
+    return " and ".join(terms) or None
+
+
+def ip_only(expression: Optional[str]) -> str:
+    """The expression for the IP-only fallback capture."""
+    return f"ip and ({expression})" if expression else "ip"
+
+
+def check_snaplen(snaplen: int = CAPTURE_SNAPLEN) -> int:
+    if snaplen and snaplen < MIN_SNAPLEN:
+        raise ValueError(f"capture filter: CAPTURE_SNAPLEN must be 0 (whole packets) or at least {MIN_SNAPLEN}")
+    return snaplen
+
+
+def attach_filter(sock, expression: Optional[str], iface, snaplen: int = CAPTURE_SNAPLEN) -> None:
+    """
+    Compile `expression` (None: every packet) with libpcap and attach it to a
+    Linux packet socket, replacing any filter already there. With a snaplen
+    the kernel cuts accepted packets to that many bytes before copying them.
+    """
+    from scapy.arch.common import compile_filter, free_filter
+    from scapy.data import SO_ATTACH_FILTER
+    from scapy.libs.structures import sock_fprog
+
+    bp = compile_filter(expression or "", iface)
+    try:
+        if snaplen:
+            # "accept" is `ret #<length to keep>`; libpcap compiles it with the full MTU
+            for i in range(bp.bf_len):
+                insn = bp.bf_insns[i]
+                if insn.code == _BPF_RET_K and insn.k:
+                    insn.k = min(insn.k, snaplen)
+        sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, sock_fprog(bp.bf_len, bp.bf_insns))
+    finally:
+        free_filter(bp)
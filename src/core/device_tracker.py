@@ -1,75 +1,359 @@
 # deviceTracker.py
+import threading
 import time
+from types import MappingProxyType
 from ..utils.device_mapper import get_hostname
+from ..utils.bounded_set import BoundedOrderedSet
+from ..utils.top_counter import TopCounter
+from ..utils.search_index import SearchIndex
 from .alert_system import alert_system
 
-# Global device activity log
+# Import configuration
+try:
+    from config import DEVICE_SNAPSHOT_MAX_AGE
+except ImportError:
+    DEVICE_SNAPSHOT_MAX_AGE = 0.05
+
+# Per-device history limits (oldest entries are evicted first)
+MAX_DNS_QUERIES = 100
+MAX_CONNECTIONS = 100
+MAX_SERVICES = 50
+
+# Global device activity log. Writers (the capture path, shard merges, a
+# reset from the web UI) hold _lock; other threads read it through
+# snapshot() and the query functions below, never directly.
 device_log = {}
 
+# Readers never take _lock. Writers make _seq odd while they change anything
+# here, and a read is retried if _seq moved while it ran (a seqlock), so a
+# busy dashboard never stalls packet processing. Each snapshot() is a
+# shallow copy of device_log and starts a new generation: an entry from an
+# older generation may be shared with a snapshot, so the writer replaces it
+# with a private copy before changing it (copy-on-write)
+_lock = threading.Lock()
+_seq = 0
+_generation = 0
+_entry_generation = {}
+_snapshot = (MappingProxyType({}), -1, 0.0)
+
+# Bumped on every change to device_log, so readers (the web API) can tell
+# whether a snapshot they built earlier is still current
+_version = 0
+
+# Version at which each device last changed, for delta consumers
+_device_versions = {}
+
+# Network-wide aggregates, kept in step with device_log as entries are added,
+# evicted and replaced, so statistics never have to walk every device
+totals = {'dns_queries': 0, 'connections': 0, 'services': 0}
+device_type_counts = {}
+dns_counter = TopCounter()         # query -> devices that recently looked it up
+connection_counter = TopCounter()  # "ip:port" -> devices recently connected to it
+
+# Search over IP, MAC and hostname; re-indexed when a device's MAC or hostname changes
+device_index = SearchIndex()
+
+def _index(ip, entry):
+    device_index.add(ip, ip, entry.get('mac'), entry.get('hostname'))
+
+def device_type(hostname):
+    """Coarse device category used in the statistics breakdown."""
+    if 'Apple' in hostname:
+        return 'Apple'
+    if 'Smart TV' in hostname:
+        return 'Smart TV'
+    if 'Router' in hostname:
+        return 'Router'
+    if 'DNS Server' in hostname:
+        return 'DNS Server'
+    return 'Other'
+
+def _count_type(hostname, delta):
+    kind = device_type(hostname or 'Unknown')
+    count = device_type_counts.get(kind, 0) + delta
+    if count:
+        device_type_counts[kind] = count
+    else:
+        device_type_counts.pop(kind, None)
+
+def _set_hostname(entry, hostname):
+    _count_type(entry['hostname'], -1)
+    entry['hostname'] = hostname
+    _count_type(hostname, 1)
+
+def _account(entry, sign):
+    """Add (sign=1) or remove (sign=-1) a whole entry's share of the aggregates."""
+    _count_type(entry.get('hostname'), sign)
+    for field, counter in (('dns_queries', dns_counter), ('connections', connection_counter),
+                           ('services', None)):
+        values = entry.get(field, ())
+        totals[field] += sign * len(values)
+        if counter is not None:
+            step = counter.increment if sign > 0 else counter.decrement
+            for value in values:
+                step(value)
+
+def _reset_aggregates():
+    for field in totals:
+        totals[field] = 0
+    device_type_counts.clear()
+    dns_counter.clear()
+    connection_counter.clear()
+
+def get_version():
+    """Current device_log version; equal versions mean identical contents."""
+    return _version
+
+def _read(fn, attempts=10):
+    """fn() as of a single point between writes, without blocking the writer."""
+    for _ in range(attempts):
+        seq = _seq
+        if seq & 1:
+            # A write is in progress (its thread was switched out mid-update);
+            # step aside long enough for it to finish
+            time.sleep(0.001)
+            continue
+        try:
+            result = fn()
+        except (RuntimeError, KeyError, IndexError):
+            if _seq == seq:
+                raise  # not caused by a concurrent write
+            continue
+        if _seq == seq:
+            return result
+    # The writer kept getting in the way; wait for it instead
+    with _lock:
+        return fn()
+
+def _take_snapshot():
+    global _generation
+    devices = device_log.copy()
+    _generation += 1
+    return devices, _version
+
+def snapshot():
+    """
+    Consistent point-in-time view of device_log as a read-only {ip: entry}
+    mapping. Entries in it never change afterwards; treat them as read-only.
+    A new one is taken when the log has changed and the last one is older
+    than DEVICE_SNAPSHOT_MAX_AGE; either way it costs the writer nothing
+    but copying the entries it changes next.
+    """
+    return versioned_snapshot()[0]
+
+def versioned_snapshot():
+    """snapshot() and the get_version() it was taken at."""
+    global _snapshot
+    devices, version, taken = _snapshot
+    now = time.monotonic()
+    if version == _version or now - taken < DEVICE_SNAPSHOT_MAX_AGE:
+        return devices, version
+    devices, version = _read(_take_snapshot)
+    devices = MappingProxyType(devices)
+    _snapshot = (devices, version, now)
+    return devices, version
+
+def copy_entry(entry):
+    """A device_log entry with its own copies of the history sets."""
+    entry = dict(entry)
+    for field in ('dns_queries', 'connections', 'services'):
+        entry[field] = entry[field].copy()
+    return entry
+
+def _writable(ip):
+    """device_log[ip], copied first if a published snapshot may share it."""
+    entry = device_log[ip]
+    if _entry_generation.get(ip) != _generation:
+        entry = copy_entry(entry)
+        device_log[ip] = entry
+        _entry_generation[ip] = _generation
+    return entry
+
+def changed_since(version):
+    """IPs of devices that changed after `version` (see get_version())."""
+    return [ip for ip, v in list(_device_versions.items()) if v > version]
+
+def _copy_entry(entry):
+    entry = dict(entry)
+    for field in ('dns_queries', 'connections', 'services'):
+        entry[field] = list(entry[field])
+    return entry
+
+def changed_devices(version):
+    """
+    (get_version(), {ip: entry copy}) for the devices that changed after
+    `version`. Only those entries are copied, through _read: unlike
+    snapshot() this starts no new generation, so the writer does not have
+    to copy every entry it touches next.
+    """
+    def read():
+        changed = {}
+        for ip in changed_since(version):
+            entry = device_log.get(ip)
+            if entry is not None:
+                changed[ip] = _copy_entry(entry)
+        return _version, changed
+    return _read(read)
+
+def merge_devices(devices):
+    """
+    Add or replace device entries built elsewhere, e.g. by a shard worker.
+    The port-scan detector's counts for them are rebuilt from their histories.
+    """
+    global _version, _seq
+    if not devices:
+        return
+    with _lock:
+        _seq += 1
+        try:
+            _version += 1
+            for ip, entry in devices.items():
+                old = device_log.get(ip)
+                if old is not None:
+                    _account(old, -1)
+                device_log[ip] = entry
+                _entry_generation[ip] = _generation
+                _account(entry, 1)
+                _index(ip, entry)
+                _device_versions[ip] = _version
+                alert_system.track_device_ports(ip, entry['connections'])
+        finally:
+            _seq += 1
+
+def restore_devices(devices):
+    """
+    Load devices saved as plain data ({ip: entry with lists for the
+    histories}, e.g. from the state store) into device_log.
+    """
+    limits = {'dns_queries': MAX_DNS_QUERIES, 'connections': MAX_CONNECTIONS,
+              'services': MAX_SERVICES}
+    entries = {}
+    for ip, data in devices.items():
+        entry = dict(data)
+        for field, maxlen in limits.items():
+            entry[field] = BoundedOrderedSet(maxlen, data.get(field, ()))
+        entries[ip] = entry
+    merge_devices(entries)
+
+def clear_devices():
+    """Forget all devices."""
+    global _version, _seq
+    with _lock:
+        _seq += 1
+        try:
+            device_log.clear()
+            _entry_generation.clear()
+            _device_versions.clear()
+            _reset_aggregates()
+            device_index.clear()
+            _version += 1
+        finally:
+            _seq += 1
+
 def update_device(ip, mac, field, value):
     """Update device log with new activity."""
+    global _seq
+    with _lock:
+        _seq += 1
+        try:
+            _update_device(ip, mac, field, value)
+        finally:
+            _seq += 1
+
+def _update_device(ip, mac, field, value):
+    global _version
     now = time.strftime('%H:%M:%S')
+    changed = False
     
     # Initialize device entry if not exists
     if ip not in device_log:
+        changed = True
+        _entry_generation[ip] = _generation
         device_log[ip] = {
             'hostname': get_hostname(ip=ip, mac=mac),
             'mac': mac or 'Unknown',
-            'dns_queries': [],
-            'connections': [],
-            'services': [],
+            'dns_queries': BoundedOrderedSet(MAX_DNS_QUERIES),
+            'connections': BoundedOrderedSet(MAX_CONNECTIONS),
+            'services': BoundedOrderedSet(MAX_SERVICES),
             'last_seen': now
         }
+        _count_type(device_log[ip]['hostname'], 1)
+        _index(ip, device_log[ip])
         
         # Check for new device alert
         alert_system.check_new_device(ip, mac, device_log)
+    else:
+        _writable(ip)
     
-    # Update last seen time
-    device_log[ip]['last_seen'] = now
+    # Update last seen time (second resolution, so this changes at most once a second)
+    if device_log[ip]['last_seen'] != now:
+        device_log[ip]['last_seen'] = now
+        changed = True
     
     # Update hostname if we have new information
     if field == 'hostname' and value:
-        device_log[ip]['hostname'] = value
+        if device_log[ip]['hostname'] != value:
+            _set_hostname(device_log[ip], value)
+            _index(ip, device_log[ip])
+            changed = True
     elif field == 'mac' and value and value != 'Unknown':
-        device_log[ip]['mac'] = value
         # Update hostname with new MAC info
-        device_log[ip]['hostname'] = get_hostname(ip=ip, mac=value)
+        hostname = get_hostname(ip=ip, mac=value)
+        if device_log[ip]['mac'] != value or device_log[ip]['hostname'] != hostname:
+            device_log[ip]['mac'] = value
+            _set_hostname(device_log[ip], hostname)
+            _index(ip, device_log[ip])
+            changed = True
     
-    # Handle different field types
+    # Handle different field types; push() is an O(1) dedupe that also
+    # evicts the oldest entry once the per-device limit is reached, and
+    # reports it so the aggregates can follow
     if field == 'dns_queries':
-        if value not in device_log[ip]['dns_queries']:
-            device_log[ip]['dns_queries'].append(value)
-            # Check for suspicious DNS queries
-            alert_system.check_suspicious_dns(ip, device_log[ip]['dns_queries'])
+        added, evicted = device_log[ip]['dns_queries'].push(value)
+        if added:
+            changed = True
+            dns_counter.increment(value)
+            if evicted is None:
+                totals['dns_queries'] += 1
+            else:
+                dns_counter.decrement(evicted)
+            # Check the new query for suspicious terms
+            alert_system.check_suspicious_dns(ip, value)
     
     elif field == 'connections':
-        if value not in device_log[ip]['connections']:
-            device_log[ip]['connections'].append(value)
+        # Detectors are incremental: they see only the new connection and
+        # whichever old one was evicted to make room for it
+        connections = device_log[ip]['connections']
+        added, evicted = connections.push(value)
+        if added:
+            changed = True
+            connection_counter.increment(value)
+            if evicted is None:
+                totals['connections'] += 1
+            else:
+                connection_counter.decrement(evicted)
             # Check for high connection rates
-            alert_system.check_high_connection_rate(ip, device_log[ip]['connections'])
+            alert_system.check_high_connection_rate(ip, len(connections))
             # Check for port scanning
-            alert_system.check_port_scan(ip, device_log[ip]['connections'])
+            alert_system.check_port_scan(ip, value, evicted)
             # Check for data exfiltration
-            alert_system.check_data_exfiltration(ip, device_log[ip]['connections'])
+            alert_system.check_data_exfiltration(ip, value)
     
     elif field == 'services':
-        if value not in device_log[ip]['services']:
-            device_log[ip]['services'].append(value)
+        added, evicted = device_log[ip]['services'].push(value)
+        if added:
+            changed = True
+            if evicted is None:
+                totals['services'] += 1
     
-    # Limit the size of lists to prevent memory issues
-    if len(device_log[ip]['dns_queries']) > 100:
-        device_log[ip]['dns_queries'] = device_log[ip]['dns_queries'][-100:]
-    
-    if len(device_log[ip]['connections']) > 100:
-        device_log[ip]['connections'] = device_log[ip]['connections'][-100:]
-    
-    if len(device_log[ip]['services']) > 50:
-        device_log[ip]['services'] = device_log[ip]['services'][-50:]
+    if changed:
+        _version += 1
+        _device_versions[ip] = _version
 
 def get_device_summary():
     """Get a summary of all devices."""
     summary = []
-    for ip, data in device_log.items():
+    for ip, data in snapshot().items():
         summary.append({
             'ip': ip,
             'hostname': data.get('hostname', 'Unknown'),
@@ -81,43 +365,32 @@ def get_device_summary():
     return summary
 
 def get_network_statistics():
-    """Get comprehensive network statistics."""
-    total_devices = len(device_log)
-    total_connections = sum(len(d.get('connections', [])) for d in device_log.values())
-    total_dns_queries = sum(len(d.get('dns_queries', [])) for d in device_log.values())
-    total_services = sum(len(d.get('services', [])) for d in device_log.values())
-    
-    # Device type breakdown
-    device_types = {}
-    for data in device_log.values():
-        hostname = data.get('hostname', 'Unknown')
-        if 'Apple' in hostname:
-            device_types['Apple'] = device_types.get('Apple', 0) + 1
-        elif 'Smart TV' in hostname:
-            device_types['Smart TV'] = device_types.get('Smart TV', 0) + 1
-        elif 'Router' in hostname:
-            device_types['Router'] = device_types.get('Router', 0) + 1
-        elif 'DNS Server' in hostname:
-            device_types['DNS Server'] = device_types.get('DNS Server', 0) + 1
-        else:
-            device_types['Other'] = device_types.get('Other', 0) + 1
-    
-    # Real-time statistics
-    statistics = {
-        'total_devices': total_devices,
-        'total_connections': total_connections,
-        'total_dns_queries': total_dns_queries,
-        'total_services': total_services,
-        'device_types': device_types,
-        'active_alerts': len(alert_system.get_alerts())
-    }
-    
-    return statistics
+    """Get comprehensive network statistics (O(1): read from the aggregates)."""
+    return _read(lambda: {
+        'total_devices': len(device_log),
+        'total_connections': totals['connections'],
+        'total_dns_queries': totals['dns_queries'],
+        'total_services': totals['services'],
+        'device_types': dict(device_type_counts),
+        'active_alerts': len(alert_system.alerts)
+    })
+
+def search_devices(query, limit=100, offset=0):
+    """IPs of devices whose IP, MAC or hostname matches query (see SearchIndex)."""
+    return _read(lambda: device_index.search(query, limit, offset))
+
+def top_dns_queries(k=10):
+    """The k queries looked up by the most devices, as (query, devices)."""
+    return _read(lambda: dns_counter.top(k))
+
+def top_connections(k=10):
+    """The k destinations connected to by the most devices, as (destination, devices)."""
+    return _read(lambda: connection_counter.top(k))
 
 def print_summary():
     
     print("\n==================== NETWORK SUMMARY ====================")
-    for ip, data in device_log.items():
+    for ip, data in snapshot().items():
         print(f"\n[Device: {data['hostname']}] {ip}")
         if data.get("mac"):
             print(f"  ▸ MAC: {data['mac']}")
@@ -0,0 +1,128 @@
+# event_bus.py
+import threading
+import time
+from collections import deque
+from typing import Any, List, Optional, Set, Tuple
+
+# Import configuration
+try:
+    from config import EVENT_BACKLOG, EVENT_CLIENT_BUFFER
+except ImportError:
+    EVENT_BACKLOG = 1000
+    EVENT_CLIENT_BUFFER = 256
+
+# (sequence number, kind, payload)
+Event = Tuple[int, str, Any]
+
+# Event ids are "<boot>-<seq>", so an id from before a restart is recognised
+BOOT_ID = format(int(time.time()), 'x')
+
+
+class Subscription:
+    """One stream client's pending events, bounded to `maxlen`."""
+    __slots__ = ("events", "maxlen", "overflowed")
+
+    def __init__(self, maxlen: int):
+        self.events = deque()
+        self.maxlen = maxlen
+        self.overflowed = False
+
+    def push(self, event: Event) -> None:
+        if len(self.events) >= self.maxlen:
+            # A slow client loses its backlog and is told to resync instead
+            # of holding memory (or the publisher) hostage
+            self.events.clear()
+            self.overflowed = True
+        elif not self.overflowed:
+            self.events.append(event)
+
+
+class EventBus:
+    """
+    Fan-out of live events (alerts, anomalies, device changes) to stream
+    clients. publish() is cheap and never blocks on a client: each
+    subscriber has a bounded buffer, and one that falls behind gets a single
+    'reset' event telling it to reload a snapshot. The last `backlog` events
+    are kept so a reconnecting client can resume from its Last-Event-ID.
+    """
+
+    def __init__(self, backlog: int = EVENT_BACKLOG, client_buffer: int = EVENT_CLIENT_BUFFER):
+        self._cond = threading.Condition()
+        self._backlog = deque(maxlen=backlog)
+        self._subs: Set[Subscription] = set()
+        self.client_buffer = client_buffer
+        self.seq = 0
+        self.resets = 0
+
+    def publish(self, kind: str, data: Any = None) -> None:
+        """Send an event to every subscriber. `data` is serialized at delivery."""
+        with self._cond:
+            self.seq += 1
+            event = (self.seq, kind, data)
+            self._backlog.append(event)
+            if self._subs:
+                for sub in self._subs:
+                    sub.push(event)
+                self._cond.notify_all()
+
+    def event_id(self, seq: int) -> str:
+        return f"{BOOT_ID}-{seq}"
+
+    def _parse_id(self, last_id: Optional[str]) -> Optional[int]:
+        """Sequence number of a Last-Event-ID, -1 if it is not from this run."""
+        if not last_id:
+            return None
+        boot, _, seq = last_id.rpartition('-')
+        if boot != BOOT_ID or not seq.isdigit():
+            return -1
+        return int(seq)
+
+    def subscribe(self, last_id: Optional[str] = None) -> Subscription:
+        """
+        Register a client. With `last_id` the events it missed are queued
+        first, or a reset if they are no longer in the backlog.
+        """
+        sub = Subscription(self.client_buffer)
+        with self._cond:
+            seq = self._parse_id(last_id)
+            if seq is not None and seq != self.seq:
+                oldest = self._backlog[0][0] if self._backlog else self.seq + 1
+                if seq < 0 or seq > self.seq or seq + 1 < oldest:
+                    sub.overflowed = True
+                else:
+                    for event in self._backlog:
+                        if event[0] > seq:
+                            sub.push(event)
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._cond:
+            self._subs.discard(sub)
+
+    def wait(self, sub: Subscription, timeout: float) -> List[Event]:
+        """Pending events for `sub`, waiting up to `timeout` seconds for one."""
+        with self._cond:
+            if not sub.events and not sub.overflowed:
+                self._cond.wait(timeout)
+            if sub.overflowed:
+                sub.overflowed = False
+                sub.events.clear()
+                self.resets += 1
+                return [(self.seq, 'reset', {'reason': 'resync'})]
+            events = list(sub.events)
+            sub.events.clear()
+            return events
+
+    def stats(self):
+        with self._cond:
+            return {
+                'clients': len(self._subs),
+                'last_id': self.event_id(self.seq),
+                'backlog': len(self._backlog),
+                'resets': self.resets,
+            }
+
+
+# Global event bus
+event_bus = EventBus()
@@ -0,0 +1,312 @@
+# fast_decoder.py
+import socket
+import struct
+from typing import Optional
+
+from scapy.packet import Packet, Raw
+from scapy.layers.l2 import Ether, ARP
+from scapy.layers.inet import IP, TCP, UDP, ICMP
+from scapy.layers.dns import DNS
+
+ETH_P_IP   = 0x0800
+ETH_P_ARP  = 0x0806
+ETH_P_VLAN = (0x8100, 0x88A8)
+
+IPPROTO_ICMP = 1
+IPPROTO_TCP  = 6
+IPPROTO_UDP  = 17
+
+DNS_PORTS = (53, 5353)
+
+_ETH   = struct.Struct("!6s6sH")
+_VLAN  = struct.Struct("!HH")
+_IPV4  = struct.Struct("!BBHHHBBH4s4s")
+_ARP   = struct.Struct("!HHBBH6s4s6s4s")
+_PORTS = struct.Struct("!HH")
+_U16   = struct.Struct("!H")
+
+# Scapy's TCP flag letters, lowest bit first
+_TCP_FLAG_CHARS = "FSRPAUECN"
+
+_inet_ntoa = socket.inet_ntoa
+
+
+class PacketHeaders:
+    """
+    Compact parsed-header record shared by the sniffer, analyzer and
+    feature extractor. Built once per packet, either straight from the raw
+    frame bytes (decode_frame) or, for anything the fast path does not
+    cover, from a Scapy dissection (from_scapy).
+    """
+    __slots__ = (
+        "frame", "wirelen", "mac_src", "ip_src", "ip_dst", "is_ip", "is_arp",
+        "ip_len", "ttl", "l4", "sport", "dport", "tcp_flags",
+        "is_dns", "dns_qname", "payload",
+    )
+
+    def __init__(self, frame: bytes, mac_src: Optional[str] = None):
+        self.frame = frame          # bytes from the first captured layer
+        self.wirelen = len(frame)
+        self.mac_src = mac_src
+        self.ip_src = None          # IPv4 source, or ARP psrc
+        self.ip_dst = None          # IPv4 destination, or ARP pdst
+        self.is_ip = False
+        self.is_arp = False
+        self.ip_len = 0
+        self.ttl = 0
+        self.l4 = None              # "TCP", "UDP", "ICMP" or None
+        self.sport = 0
+        self.dport = 0
+        self.tcp_flags = 0
+        self.is_dns = False
+        self.dns_qname = None       # first question name, trailing dot stripped
+        self.payload = b""          # L4 payload (only kept when VERBOSE needs it)
+
+    def flags_str(self) -> str:
+        """TCP flags formatted like Scapy's %TCP.flags% (e.g. 'SA')."""
+        return "".join(c for i, c in enumerate(_TCP_FLAG_CHARS) if self.tcp_flags >> i & 1)
+
+
+# Fast path: raw bytes
+
+def _decode_qname(buf, off: int) -> Optional[str]:
+    labels = []
+    while True:
+        n = buf[off]
+        if n == 0:
+            return ".".join(labels)
+        if n & 0xC0:
+            return None  # compression pointer: leave it to Scapy
+        labels.append(bytes(buf[off + 1:off + 1 + n]).decode(errors="ignore"))
+        off += 1 + n
+
+
+def _decode_dns(hdr: PacketHeaders, buf, off: int, parse: bool = True) -> bool:
+    """Question name of a DNS message at buf[off:]; False if Scapy is needed."""
+    hdr.is_dns = True
+    if not parse or len(buf) < off + 12:
+        return True  # too short to be a DNS message; Scapy would not find a qd either
+    if _U16.unpack_from(buf, off + 4)[0] == 0:
+        return True
+    qname = _decode_qname(buf, off + 12)
+    if qname is None:
+        return False
+    hdr.dns_qname = qname.rstrip(".") or None
+    return True
+
+
+def _decode_ipv4(hdr: PacketHeaders, buf, off: int, keep_payload: bool, dns: bool = True) -> bool:
+    ver_ihl, _, total_len, _, frag, ttl, proto, _, src, dst = _IPV4.unpack_from(buf, off)
+    if ver_ihl >> 4 != 4:
+        return False
+    hdr.is_ip = True
+    hdr.ip_src = _inet_ntoa(src)
+    hdr.ip_dst = _inet_ntoa(dst)
+    hdr.ip_len = total_len
+    hdr.ttl = ttl
+    if off + total_len > len(buf):
+        hdr.wirelen = off + total_len  # cut short by the capture snaplen
+
+    if frag & 0x1FFF:
+        return True  # non-first fragment: no L4 header to read
+    l4 = off + (ver_ihl & 0x0F) * 4
+    end = min(len(buf), off + total_len) if total_len else len(buf)
+
+    if proto == IPPROTO_TCP:
+        hdr.sport, hdr.dport = _PORTS.unpack_from(buf, l4)
+        hdr.tcp_flags = ((buf[l4 + 12] & 0x01) << 8) | buf[l4 + 13]
+        hdr.l4 = "TCP"
+        data = l4 + (buf[l4 + 12] >> 4) * 4
+        if keep_payload:
+            hdr.payload = bytes(buf[data:end])
+        if 53 in (hdr.sport, hdr.dport) and end - data > 2:
+            return _decode_dns(hdr, buf[:end], data + 2, dns)  # 2-byte length prefix
+    elif proto == IPPROTO_UDP:
+        hdr.sport, hdr.dport = _PORTS.unpack_from(buf, l4)
+        hdr.l4 = "UDP"
+        if hdr.sport in DNS_PORTS or hdr.dport in DNS_PORTS:
+            return _decode_dns(hdr, buf[:end], l4 + 8, dns)
+        if keep_payload:
+            hdr.payload = bytes(buf[l4 + 8:end])
+    elif proto == IPPROTO_ICMP:
+        hdr.l4 = "ICMP"
+    return True
+
+
+def _decode_arp(hdr: PacketHeaders, buf, off: int) -> bool:
+    htype, ptype, hlen, plen, _, _, psrc, _, pdst = _ARP.unpack_from(buf, off)
+    if ptype != ETH_P_IP or hlen != 6 or plen != 4:
+        return False
+    hdr.is_arp = True
+    hdr.ip_src = _inet_ntoa(psrc)
+    hdr.ip_dst = _inet_ntoa(pdst)
+    return True
+
+
+def decode_frame(frame: bytes, keep_payload: bool = False) -> Optional[PacketHeaders]:
+    """
+    Decode an Ethernet frame without Scapy. Returns None when the frame needs
+    a full dissection (truncated or malformed headers, DNS name compression).
+    Ethertypes other than IPv4/ARP yield a bare record with only the MAC.
+    """
+    try:
+        buf = memoryview(frame)
+        _, src, etype = _ETH.unpack_from(buf, 0)
+        off = 14
+        while etype in ETH_P_VLAN:
+            _, etype = _VLAN.unpack_from(buf, off)
+            off += 4
+        hdr = PacketHeaders(frame, src.hex(":"))
+        if etype == ETH_P_IP:
+            ok = _decode_ipv4(hdr, buf, off, keep_payload)
+        elif etype == ETH_P_ARP:
+            ok = _decode_arp(hdr, buf, off)
+        else:
+            ok = True
+        return hdr if ok else None
+    except (struct.error, IndexError):
+        return None
+
+
+def decode_ip(frame: bytes, keep_payload: bool = False) -> Optional[PacketHeaders]:
+    """Decode a frame captured at layer 3 (starts with the IPv4 header)."""
+    try:
+        hdr = PacketHeaders(frame)
+        return hdr if _decode_ipv4(hdr, memoryview(frame), 0, keep_payload) else None
+    except (struct.error, IndexError):
+        return None
+
+
+def decode_flow_headers(frame: bytes, link=Ether) -> Optional[PacketHeaders]:
+    """
+    Only the fields flow and time-series accounting read (addresses, ports,
+    TCP flags, length, DNS port), for the sharding dispatcher. DNS messages
+    are not parsed and Scapy is never called: None for anything else.
+    """
+    try:
+        buf = memoryview(frame)
+        if link is IP:
+            hdr = PacketHeaders(frame)
+            return hdr if _decode_ipv4(hdr, buf, 0, False, dns=False) else None
+        if link is not Ether:
+            return None
+        etype = _U16.unpack_from(buf, 12)[0]
+        off = 14
+        while etype in ETH_P_VLAN:
+            etype = _U16.unpack_from(buf, off + 2)[0]
+            off += 4
+        hdr = PacketHeaders(frame)
+        if etype == ETH_P_IP:
+            ok = _decode_ipv4(hdr, buf, off, False, dns=False)
+        elif etype == ETH_P_ARP:
+            ok = _decode_arp(hdr, buf, off)
+        else:
+            ok = False
+        return hdr if ok else None
+    except (struct.error, IndexError):
+        return None
+
+
+def shard_key(frame: bytes, link=Ether) -> bytes:
+    """
+    Source address bytes (IPv4 src or ARP psrc) for partitioning frames by
+    device without a full decode; b"" when there is no such address.
+    """
+    try:
+        if link is IP:
+            return frame[12:16]
+        if link is not Ether:
+            return b""
+        etype = _U16.unpack_from(frame, 12)[0]
+        off = 14
+        while etype in ETH_P_VLAN:
+            etype = _U16.unpack_from(frame, off + 2)[0]
+            off += 4
+        if etype == ETH_P_IP:
+            return frame[off + 12:off + 16]
+        if etype == ETH_P_ARP:
+            return frame[off + 14:off + 18]
+    except struct.error:
+        pass
+    return b""
+
+
+# Fallback: Scapy dissection
+
+def from_scapy(pkt: Packet) -> PacketHeaders:
+    """Build the record from a dissected Scapy packet."""
+    hdr = PacketHeaders(bytes(pkt), pkt[Ether].src.lower() if pkt.haslayer(Ether) else None)
+
+    if pkt.haslayer(IP):
+        ip = pkt[IP]
+        hdr.is_ip = True
+        hdr.ip_src = ip.src
+        hdr.ip_dst = ip.dst
+        hdr.ip_len = ip.len or 0
+        hdr.ttl = ip.ttl
+    elif pkt.haslayer(ARP):
+        hdr.is_arp = True
+        hdr.ip_src = pkt[ARP].psrc
+        hdr.ip_dst = pkt[ARP].pdst
+
+    if pkt.haslayer(TCP):
+        hdr.l4 = "TCP"
+        hdr.sport = int(pkt[TCP].sport)
+        hdr.dport = int(pkt[TCP].dport)
+        hdr.tcp_flags = int(pkt[TCP].flags)
+    elif pkt.haslayer(UDP):
+        hdr.l4 = "UDP"
+        hdr.sport = int(pkt[UDP].sport)
+        hdr.dport = int(pkt[UDP].dport)
+    elif pkt.haslayer(ICMP):
+        hdr.l4 = "ICMP"
+
+    if pkt.haslayer(DNS):
+        hdr.is_dns = True
+        try:
+            if pkt[DNS].qd and pkt[DNS].qd.qname:
+                hdr.dns_qname = pkt[DNS].qd.qname.decode(errors="ignore").rstrip('.') or None
+        except (AttributeError, IndexError):
+            # DNS packet doesn't have expected structure
+            pass
+
+    if pkt.haslayer(Raw):
+        hdr.payload = bytes(pkt[Raw])
+    return hdr
+
+
+def decode_packet(pkt, link=Ether, keep_payload: bool = False) -> PacketHeaders:
+    """
+    Parse one captured packet into a PacketHeaders record.
+
+    `pkt` may be raw frame bytes, an undissected Raw packet (fast capture
+    sockets) or a dissected Scapy packet. `link` is the layer class the raw
+    bytes start with. Scapy is only invoked when the fast path declines.
+    """
+    if isinstance(pkt, (bytes, bytearray)):
+        frame = bytes(pkt)
+    elif isinstance(pkt, Raw):
+        frame = pkt.load
+    else:
+        link = type(pkt)
+        frame = pkt.original if pkt.original else bytes(pkt)
+
+    if link is Ether:
+        hdr = decode_frame(frame, keep_payload)
+    elif link is IP:
+        hdr = decode_ip(frame, keep_payload)
+    else:
+        hdr = None
+    if hdr is not None:
+        return hdr
+
+    if not isinstance(pkt, Packet) or isinstance(pkt, Raw):
+        pkt = link(frame)
+    return from_scapy(pkt)
+
+
+def pcap_timestamp(meta) -> float:
+    """Capture time (epoch seconds) of a RawPcapReader/RawPcapNgReader record."""
+    if hasattr(meta, "tshigh"):
+        return ((meta.tshigh << 32) | meta.tslow) / float(meta.tsresol)
+    return meta.sec + meta.usec / 1e6
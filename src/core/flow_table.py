@@ -0,0 +1,421 @@
+# flow_table.py
+import heapq
+import socket
+import threading
+import time
+from array import array
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional
+
+from .alert_system import alert_system
+from .fast_decoder import PacketHeaders
+
+# Import configuration
+try:
+    from config import (FLOW_TABLE_MAX_FLOWS, FLOW_IDLE_TIMEOUT, FLOW_HALF_OPEN_TIMEOUT,
+                        FLOW_FINISHED_TIMEOUT, FLOW_RECENT_SIZE, FLOW_COUNTER_MAX_DEVICES)
+except ImportError:
+    FLOW_TABLE_MAX_FLOWS = 1_000_000
+    FLOW_IDLE_TIMEOUT = 60
+    FLOW_HALF_OPEN_TIMEOUT = 10
+    FLOW_FINISHED_TIMEOUT = 5
+    FLOW_RECENT_SIZE = 1000
+    FLOW_COUNTER_MAX_DEVICES = 65536
+
+_PROTO_NUMBERS = {"TCP": 6, "UDP": 17, "ICMP": 1}
+_PROTO_NAMES = {v: k for k, v in _PROTO_NUMBERS.items()}
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+# Scapy's TCP flag letters, lowest bit first
+_TCP_FLAG_CHARS = "FSRPAUECN"
+
+_inet_aton = socket.inet_aton
+_inet_ntoa = socket.inet_ntoa
+_from_bytes = int.from_bytes
+
+_GEN_SHIFT = 32
+_SLOT_MASK = (1 << _GEN_SHIFT) - 1
+
+
+def _endpoint(ip: str, port: int) -> int:
+    """IPv4 address and port packed into one 48-bit int."""
+    return _from_bytes(_inet_aton(ip), "big") << 16 | port
+
+
+def _unpack_endpoint(ep: int):
+    return _inet_ntoa((ep >> 16).to_bytes(4, "big")), ep & 0xFFFF
+
+
+def _flags_str(flags: int) -> str:
+    return "".join(c for i, c in enumerate(_TCP_FLAG_CHARS) if flags >> i & 1)
+
+
+class FlowTable:
+    """
+    Bidirectional IPv4 flow table keyed by the normalized 5-tuple.
+
+    Both directions of a conversation share one entry; the endpoint that sent
+    the first packet is the flow's initiator ("fwd"). Per-flow counters live
+    in typed arrays indexed by a slot number, and freed slots are reused.
+    Those arrays are about 50 bytes of a flow; with its packed-int key, the
+    index dict entry and its timer-wheel entries a flow costs ~210 bytes
+    (measured at 1M flows: ~210 MB).
+
+    Expiry uses a hashed timer wheel with one-second ticks. A flow is put in
+    the bucket of its deadline when created; when that bucket comes round,
+    flows that have seen traffic since are re-bucketed, the rest are evicted
+    and handed to every consumer as a flow record. Half-open TCP flows (only
+    the initiator has spoken) get a short timeout, so a SYN flood recycles
+    its entries quickly; if the table still fills up, the soonest-due flows
+    are evicted early to make room. The wheel turns on every packet and,
+    once start_timer() has run (live capture), once a tick from a timer
+    thread, so flows still expire when the link goes quiet. Both hold
+    _lock, and consumers run under it: keep them cheap.
+    """
+
+    def __init__(self, max_flows: int = FLOW_TABLE_MAX_FLOWS,
+                 idle_timeout: float = FLOW_IDLE_TIMEOUT,
+                 half_open_timeout: float = FLOW_HALF_OPEN_TIMEOUT,
+                 finished_timeout: float = FLOW_FINISHED_TIMEOUT,
+                 recent_size: int = FLOW_RECENT_SIZE,
+                 tick: float = 1.0):
+        self.max_flows = max(1, int(max_flows))
+        self.idle_timeout = idle_timeout
+        self.half_open_timeout = half_open_timeout
+        self.finished_timeout = finished_timeout
+        self.tick = tick
+
+        self._index: Dict[int, int] = {}   # packed 5-tuple -> slot
+        self._keys: List[Optional[int]] = []
+        self._free: List[int] = []
+        self._gen = array("I")
+        self._init_low = array("B")        # 1 if the lower endpoint initiated
+        self._fwd_packets = array("I")
+        self._rev_packets = array("I")
+        self._fwd_bytes = array("Q")
+        self._rev_bytes = array("Q")
+        self._first = array("d")
+        self._last = array("d")
+        self._fwd_flags = array("H")
+        self._rev_flags = array("H")
+
+        self._wheel_size = int(max(idle_timeout, half_open_timeout, finished_timeout) / tick) + 2
+        self._wheel: List[List[int]] = [[] for _ in range(self._wheel_size)]
+        self._tick_no: Optional[int] = None  # next tick to process
+        self._lock = threading.Lock()        # capture thread vs. expiry timer
+        self._timer = None
+
+        self.consumers: List[Callable[[Dict[str, Any]], None]] = []
+        self.recent = deque(maxlen=recent_size)
+        self.created = 0
+        self.expired = 0
+        self.evicted_early = 0
+
+    def add_consumer(self, fn: Callable[[Dict[str, Any]], None]) -> None:
+        """Call fn(record) for every flow as it expires."""
+        self.consumers.append(fn)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # ---------- per-packet path ----------
+
+    def update(self, hdr: PacketHeaders, now: float = None) -> bool:
+        """Account one decoded packet to its flow (IPv4 TCP/UDP/ICMP only). True if it started one."""
+        proto = _PROTO_NUMBERS.get(hdr.l4)
+        if proto is None or not hdr.is_ip:
+            return False
+        if now is None:
+            now = time.time()
+        with self._lock:
+            self._advance(now)
+
+            src = _endpoint(hdr.ip_src, hdr.sport)
+            dst = _endpoint(hdr.ip_dst, hdr.dport)
+            src_is_low = src <= dst
+            key = ((src << 48 | dst) if src_is_low else (dst << 48 | src)) << 8 | proto
+            size = hdr.wirelen
+
+            slot = self._index.get(key)
+            new = slot is None
+            if new:
+                slot = self._new_flow(key, src_is_low, now, proto)
+            flags = hdr.tcp_flags
+            if self._init_low[slot] == src_is_low:
+                self._fwd_packets[slot] += 1
+                self._fwd_bytes[slot] += size
+                if flags:
+                    new_flags = flags & ~self._fwd_flags[slot]
+                    self._fwd_flags[slot] |= flags
+            else:
+                self._rev_packets[slot] += 1
+                self._rev_bytes[slot] += size
+                if flags:
+                    new_flags = flags & ~self._rev_flags[slot]
+                    self._rev_flags[slot] |= flags
+            self._last[slot] = now
+            # First FIN/RST in a direction: the flow may now be finished, which
+            # has a shorter timeout than the one it is currently bucketed for
+            if flags and new_flags & (TCP_FIN | TCP_RST):
+                self._schedule(slot, now + self.finished_timeout)
+            return new
+
+    def _new_flow(self, key: int, src_is_low: bool, now: float, proto: int) -> int:
+        if len(self._index) >= self.max_flows:
+            self._evict_early()
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+            self._gen[slot] += 1
+            self._init_low[slot] = src_is_low
+            self._fwd_packets[slot] = self._rev_packets[slot] = 0
+            self._fwd_bytes[slot] = self._rev_bytes[slot] = 0
+            self._fwd_flags[slot] = self._rev_flags[slot] = 0
+            self._first[slot] = self._last[slot] = now
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+            self._gen.append(0)
+            self._init_low.append(src_is_low)
+            self._fwd_packets.append(0)
+            self._rev_packets.append(0)
+            self._fwd_bytes.append(0)
+            self._rev_bytes.append(0)
+            self._fwd_flags.append(0)
+            self._rev_flags.append(0)
+            self._first.append(now)
+            self._last.append(now)
+        self._index[key] = slot
+        self.created += 1
+        # A new TCP flow is half-open until the responder speaks
+        timeout = self.half_open_timeout if proto == 6 else self.idle_timeout
+        self._schedule(slot, now + timeout)
+        return slot
+
+    # ---------- timer wheel ----------
+
+    def _timeout(self, slot: int) -> float:
+        flags = self._fwd_flags[slot] | self._rev_flags[slot]
+        if flags & TCP_RST or (self._fwd_flags[slot] & TCP_FIN and self._rev_flags[slot] & TCP_FIN):
+            return self.finished_timeout
+        if self._keys[slot] & 0xFF == 6 and not self._rev_packets[slot]:
+            return self.half_open_timeout
+        return self.idle_timeout
+
+    def _schedule(self, slot: int, deadline: float) -> None:
+        tick_no = int(deadline / self.tick)
+        if self._tick_no is not None and tick_no < self._tick_no:
+            tick_no = self._tick_no
+        self._wheel[tick_no % self._wheel_size].append(self._gen[slot] << _GEN_SHIFT | slot)
+
+    def advance(self, now: float = None) -> None:
+        """Process every wheel tick up to `now`, expiring idle and finished flows."""
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+
+    def start_timer(self) -> None:
+        """Advance the wheel from a daemon thread every tick (wall-clock capture only)."""
+        if self._timer is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.tick)
+                self.advance()
+
+        self._timer = threading.Thread(target=run, daemon=True, name='flow-expiry')
+        self._timer.start()
+
+    def _advance(self, now: float) -> None:
+        current = int(now / self.tick)
+        if self._tick_no is None:
+            self._tick_no = current
+            return
+        if current < self._tick_no:
+            return
+        # After a long gap each bucket only needs one visit
+        if current - self._tick_no >= self._wheel_size:
+            self._tick_no = current - self._wheel_size + 1
+        while self._tick_no <= current:
+            bucket_index = self._tick_no % self._wheel_size
+            bucket = self._wheel[bucket_index]
+            self._wheel[bucket_index] = []
+            self._tick_no += 1
+            for entry in bucket:
+                slot = entry & _SLOT_MASK
+                if self._keys[slot] is None or self._gen[slot] != entry >> _GEN_SHIFT:
+                    continue  # flow already gone; slot may have been reused
+                timeout = self._timeout(slot)
+                deadline = self._last[slot] + timeout
+                if deadline <= now:
+                    self._expire(slot, "finished" if timeout == self.finished_timeout else "idle")
+                else:
+                    self._schedule(slot, deadline)
+
+    def _evict_early(self) -> None:
+        """Table full: evict the soonest-due flows (at least 1% of capacity)."""
+        want = max(1, self.max_flows // 100)
+        freed = 0
+        start = self._tick_no or 0
+        for offset in range(self._wheel_size):
+            bucket_index = (start + offset) % self._wheel_size
+            bucket = self._wheel[bucket_index]
+            keep = []
+            for i, entry in enumerate(bucket):
+                if freed >= want:
+                    keep.extend(bucket[i:])
+                    break
+                slot = entry & _SLOT_MASK
+                if self._keys[slot] is None or self._gen[slot] != entry >> _GEN_SHIFT:
+                    continue
+                self._expire(slot, "pressure")
+                self.evicted_early += 1
+                freed += 1
+            self._wheel[bucket_index] = keep
+            if freed >= want:
+                return
+
+    # ---------- expiry and records ----------
+
+    def _record(self, slot: int, reason: str = None) -> Dict[str, Any]:
+        key = self._keys[slot]
+        proto = key & 0xFF
+        low, high = key >> 56, key >> 8 & ((1 << 48) - 1)
+        init, resp = (low, high) if self._init_low[slot] else (high, low)
+        src, sport = _unpack_endpoint(init)
+        dst, dport = _unpack_endpoint(resp)
+        first, last = self._first[slot], self._last[slot]
+        fwd_p, rev_p = self._fwd_packets[slot], self._rev_packets[slot]
+        fwd_b, rev_b = self._fwd_bytes[slot], self._rev_bytes[slot]
+        record = {
+            'protocol': _PROTO_NAMES.get(proto, str(proto)),
+            'src_ip': src,
+            'src_port': sport,
+            'dst_ip': dst,
+            'dst_port': dport,
+            'packets': fwd_p + rev_p,
+            'bytes': fwd_b + rev_b,
+            'fwd_packets': fwd_p,
+            'rev_packets': rev_p,
+            'fwd_bytes': fwd_b,
+            'rev_bytes': rev_b,
+            'first_seen': first,
+            'last_seen': last,
+            'duration': last - first,
+            'tcp_flags': _flags_str(self._fwd_flags[slot] | self._rev_flags[slot]),
+        }
+        if reason is not None:
+            record['reason'] = reason
+        return record
+
+    def _expire(self, slot: int, reason: str) -> None:
+        record = self._record(slot, reason)
+        del self._index[self._keys[slot]]
+        self._keys[slot] = None
+        self._free.append(slot)
+        self.expired += 1
+        self.recent.append(record)
+        for consumer in self.consumers:
+            try:
+                consumer(record)
+            except Exception as e:
+                print(f"[!] Flow consumer error: {e}")
+
+    def expire_all(self, reason: str = "shutdown") -> int:
+        """Expire every active flow (end of a capture or replay)."""
+        with self._lock:
+            slots = list(self._index.values())
+            for slot in slots:
+                self._expire(slot, reason)
+            self._wheel = [[] for _ in range(self._wheel_size)]
+        return len(slots)
+
+    def clear(self) -> None:
+        """Drop all flows without emitting them."""
+        with self._lock:
+            self._index.clear()
+            self._keys = [None] * len(self._keys)
+            self._free = list(range(len(self._keys)))
+            self._wheel = [[] for _ in range(self._wheel_size)]
+            self.recent.clear()
+
+    # ---------- read side (web API) ----------
+
+    def active_flows(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """The `limit` active flows with the most bytes."""
+        with self._lock:
+            slots = list(self._index.values())
+            fwd_b, rev_b = self._fwd_bytes, self._rev_bytes
+            top = heapq.nlargest(limit, slots, key=lambda s: fwd_b[s] + rev_b[s])
+            return [self._record(s) for s in top]
+
+    def recent_flows(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recently expired flows, newest first."""
+        return list(islice(reversed(self.recent), limit))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'active': len(self._index),
+            'capacity': self.max_flows,
+            'created': self.created,
+            'expired': self.expired,
+            'evicted_early': self.evicted_early,
+            'allocated_slots': len(self._keys),
+        }
+
+
+class DeviceFlowCounters:
+    """
+    Flow consumer: per-device totals over the flows each device initiated,
+    counted as they expire. Unanswered flows (the responder never spoke)
+    and resets are what scans and refused connections look like. Past
+    max_devices the least recently updated device is dropped.
+    """
+
+    FIELDS = ('flows', 'unanswered', 'reset', 'bytes_out', 'bytes_in', 'duration')
+
+    def __init__(self, max_devices: int = FLOW_COUNTER_MAX_DEVICES):
+        self.max_devices = max_devices
+        self._counts: Dict[str, List[float]] = {}  # insertion order = least recently updated first
+
+    def add(self, record: Dict[str, Any]) -> None:
+        ip = record['src_ip']
+        counts = self._counts.pop(ip, None)
+        if counts is None:
+            counts = [0, 0, 0, 0, 0, 0.0]
+            if len(self._counts) >= self.max_devices:
+                del self._counts[next(iter(self._counts))]
+        counts[0] += 1
+        if not record['rev_packets']:
+            counts[1] += 1
+        if 'R' in record['tcp_flags']:
+            counts[2] += 1
+        counts[3] += record['fwd_bytes']
+        counts[4] += record['rev_bytes']
+        counts[5] += record['duration']
+        self._counts[ip] = counts
+
+    def get(self, ip: str) -> Optional[Dict[str, Any]]:
+        counts = self._counts.get(ip)
+        return None if counts is None else dict(zip(self.FIELDS, counts))
+
+    def top(self, limit: int = 10, field: str = 'flows') -> List[Dict[str, Any]]:
+        """Devices with the highest `field`, highest first."""
+        j = self.FIELDS.index(field)
+        items = heapq.nlargest(limit, list(self._counts.items()), key=lambda kv: kv[1][j])
+        return [{'ip': ip, **dict(zip(self.FIELDS, counts))} for ip, counts in items]
+
+    def clear(self) -> None:
+        self._counts.clear()
+
+
+# Global flow table instance. Expired flows feed the per-device totals and
+# the flow-level detectors
+flow_table = FlowTable()
+device_flow_counts = DeviceFlowCounters()
+flow_table.add_consumer(device_flow_counts.add)
+flow_table.add_consumer(alert_system.check_large_transfer)
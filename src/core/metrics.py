@@ -0,0 +1,149 @@
+# metrics.py
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# Import configuration
+try:
+    from config import METRICS_ENABLED
+except ImportError:
+    METRICS_ENABLED = True
+
+# Latency bucket upper bounds (seconds): 1µs .. 100ms, plus +Inf
+LATENCY_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 1e-1,
+)
+
+
+def _labels(labels: Dict[str, str], **extra) -> str:
+    items = dict(labels, **extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items.items()) + "}"
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n: int = 1) -> None:
+        self.value += n
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and two additions."""
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and scrape-time gauges rendered in the Prometheus
+    text exposition format. Metrics are keyed by (name, labels); asking for
+    an existing one returns it.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, Tuple], Counter] = {}
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._gauges: Dict[Tuple[str, Tuple], Callable[[], float]] = {}
+
+    def _key(self, name, kind, help_text, labels):
+        self._help.setdefault(name, (kind, help_text))
+        return name, tuple(sorted((labels or {}).items()))
+
+    def counter(self, name: str, help_text: str = "", labels: Dict[str, str] = None) -> Counter:
+        key = self._key(name, "counter", help_text, labels)
+        if key not in self._counters:
+            self._counters[key] = Counter()
+        return self._counters[key]
+
+    def histogram(self, name: str, help_text: str = "", labels: Dict[str, str] = None,
+                  bounds=LATENCY_BUCKETS) -> Histogram:
+        key = self._key(name, "histogram", help_text, labels)
+        if key not in self._histograms:
+            self._histograms[key] = Histogram(bounds)
+        return self._histograms[key]
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], float],
+              labels: Dict[str, str] = None) -> None:
+        """Register a gauge whose value is read from fn() at scrape time."""
+        self._gauges[self._key(name, "gauge", help_text, labels)] = fn
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        by_name: Dict[str, List[str]] = {}
+
+        for (name, labels), c in self._counters.items():
+            by_name.setdefault(name, []).append(f"{name}{_labels(dict(labels))} {c.value}")
+
+        for (name, labels), fn in self._gauges.items():
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            by_name.setdefault(name, []).append(f"{name}{_labels(dict(labels))} {value:g}")
+
+        for (name, labels), h in self._histograms.items():
+            labels = dict(labels)
+            lines = by_name.setdefault(name, [])
+            cumulative = 0
+            for bound, n in zip(h.bounds, h.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels, le=f'{bound:g}')} {cumulative}")
+            cumulative += h.counts[-1]
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {h.sum:.9g}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+        out = []
+        for name, lines in by_name.items():
+            kind, help_text = self._help[name]
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+def instrument_methods(obj, names, histogram_name: str, help_text: str,
+                       registry: "MetricsRegistry", label: str = "check") -> None:
+    """
+    Replace obj.<name> with a timed wrapper for each name. Nothing is wrapped
+    unless the caller decides metrics are on, so disabled metrics cost
+    nothing on the hot path.
+    """
+    for name in names:
+        method = getattr(obj, name)
+        hist = registry.histogram(histogram_name, help_text, {label: name})
+
+        def timed(*args, _method=method, _hist=hist, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                _hist.observe(time.perf_counter() - start)
+
+        functools.update_wrapper(timed, method)
+        setattr(obj, name, timed)
+
+
+# global registry
+metrics = MetricsRegistry()
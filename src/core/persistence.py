@@ -0,0 +1,352 @@
+# persistence.py
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from . import device_tracker
+from .alert_system import alert_system
+from .anomaly_store import anomaly_store, AnomalyEvent
+
+# Import configuration
+try:
+    from config import PERSIST_PATH, PERSIST_FLUSH_INTERVAL, PERSIST_RETENTION_DAYS
+except ImportError:
+    PERSIST_PATH = None
+    PERSIST_FLUSH_INTERVAL = 2.0
+    PERSIST_RETENTION_DAYS = 30
+
+# Old rows are pruned at most this often (seconds)
+PRUNE_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    ip       TEXT PRIMARY KEY,
+    mac      TEXT,
+    hostname TEXT,
+    updated  REAL NOT NULL,
+    data     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS devices_mac ON devices (mac);
+CREATE INDEX IF NOT EXISTS devices_updated ON devices (updated);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id       INTEGER PRIMARY KEY,
+    ts       REAL NOT NULL,
+    type     TEXT,
+    severity TEXT,
+    ip       TEXT,
+    data     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_ts ON alerts (ts);
+CREATE INDEX IF NOT EXISTS alerts_ip_ts ON alerts (ip, ts);
+
+CREATE TABLE IF NOT EXISTS anomalies (
+    seq      INTEGER PRIMARY KEY,
+    ts       REAL NOT NULL,
+    src_ip   TEXT,
+    data     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS anomalies_ts ON anomalies (ts);
+CREATE INDEX IF NOT EXISTS anomalies_src_ts ON anomalies (src_ip, ts);
+"""
+
+
+def _epoch(iso: str) -> float:
+    try:
+        return datetime.fromisoformat(iso).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def _dumps(value) -> str:
+    # NumPy scalars (model scores, features) become plain numbers
+    return json.dumps(value, default=lambda v: v.item() if hasattr(v, 'item') else str(v))
+
+
+def _device_row(ip: str, entry: Dict, now: float):
+    data = {field: list(value) if field in ('dns_queries', 'connections', 'services') else value
+            for field, value in entry.items()}
+    mac = entry.get('mac')
+    return ip, mac.lower() if mac else mac, entry.get('hostname'), now, _dumps(data)
+
+
+def _contiguous_tail(rows, key):
+    """rows (newest first) up to the first gap in `key`, returned oldest first."""
+    tail = []
+    for row in rows:
+        if tail and key(row) != key(tail[-1]) - 1:
+            break
+        tail.append(row)
+    tail.reverse()
+    return tail
+
+
+class StateStore:
+    """
+    SQLite copy of the device log, alerts and anomalies, so a restart picks
+    up where the last run stopped.
+
+    Nothing is written from the capture path. A background thread wakes
+    every `flush_interval` seconds, collects what changed since its last
+    flush (devices by device_tracker version, alerts by id and last_seen,
+    anomalies by seq) and writes it in one transaction. The database runs
+    in WAL mode, so the web API's history queries, each thread on its own
+    connection, never wait for a flush.
+    """
+
+    def __init__(self, path: str, flush_interval: float = PERSIST_FLUSH_INTERVAL,
+                 retention_days: float = PERSIST_RETENTION_DAYS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        self._local = threading.local()
+        self._lock = threading.Lock()  # one flush at a time (flush thread vs. close)
+        self._stop = threading.Event()
+        self._thread = None
+        self._closed = False
+        # What the database already holds
+        self._device_version = 0
+        self._alert_id = 0
+        self._alerts_checked = ''  # alerts with a later last_seen were updated after it
+        self._anomaly_seq = 0
+        self._next_prune = 0.0
+        # Stats
+        self.flushes = 0
+        self.rows_written = 0
+        self.missed = 0  # alerts/anomalies that left the in-memory rings before a flush
+        self.last_flush_ms = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # durable at checkpoints; a crash loses at most the last flush
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def restore(self) -> None:
+        """Load the saved state into device_tracker, alert_system and anomaly_store."""
+        conn = self._conn
+        devices = {ip: json.loads(data) for ip, data in conn.execute('SELECT ip, data FROM devices')}
+        device_tracker.restore_devices(devices)
+
+        # The in-memory rings need consecutive ids, so only the newest unbroken run is loaded
+        rows = conn.execute('SELECT id, data FROM alerts ORDER BY id DESC LIMIT ?',
+                            (alert_system.alerts.maxlen or -1,))
+        alerts = [json.loads(data) for _, data in _contiguous_tail(rows, key=lambda r: r[0])]
+        alert_system.restore_alerts(alerts)
+
+        rows = conn.execute('SELECT seq, data FROM anomalies ORDER BY seq DESC LIMIT ?',
+                            (anomaly_store._events.maxlen or -1,))
+        events = [AnomalyEvent(**json.loads(data)) for _, data in _contiguous_tail(rows, key=lambda r: r[0])]
+        anomaly_store.restore(events)
+
+        self._device_version = device_tracker.get_version()
+        self._alert_id = alert_system.total_alerts
+        self._alerts_checked = datetime.now().isoformat()
+        self._anomaly_seq = anomaly_store.added
+        print(f"[i] Restored {len(devices)} devices, {len(alerts)} alerts and "
+              f"{len(events)} anomalies from {self.path}")
+
+    def _collect(self):
+        """Rows changed since the last flush, and the cursors to move to once they are written."""
+        now = time.time()
+        devices, version = device_tracker.versioned_snapshot()
+        device_rows = []
+        if version != self._device_version:
+            for ip in device_tracker.changed_since(self._device_version):
+                entry = devices.get(ip)
+                if entry is not None:  # changed after the snapshot; picked up next time
+                    device_rows.append(_device_row(ip, entry, now))
+
+        checked = datetime.now().isoformat()
+        alerts = list(alert_system.alerts)
+        alert_rows = []
+        missed = 0
+        if alerts and alerts[0]['id'] > self._alert_id + 1:
+            missed += alerts[0]['id'] - self._alert_id - 1
+        for alert in alerts:
+            if alert['id'] > self._alert_id or alert['last_seen'] >= self._alerts_checked:
+                alert_rows.append((alert['id'], _epoch(alert['timestamp']), alert['type'],
+                                   alert['severity'], alert['data'].get('ip'), _dumps(alert)))
+        alert_id = max(self._alert_id, alerts[-1]['id'] if alerts else 0)
+
+        anomaly_seq = anomaly_store.added
+        events = []
+        if anomaly_seq > self._anomaly_seq:
+            # Events added while reading have a higher seq and wait for the next flush
+            events = [e for e in anomaly_store.latest(len(anomaly_store))
+                      if self._anomaly_seq < e.seq <= anomaly_seq]
+            oldest = events[-1].seq if events else anomaly_seq + 1
+            missed += oldest - self._anomaly_seq - 1
+        anomaly_rows = [(e.seq, _epoch(e.timestamp), e.src_ip, _dumps(asdict(e))) for e in events]
+
+        return (device_rows, alert_rows, anomaly_rows, missed), (version, alert_id, checked, anomaly_seq)
+
+    def flush(self) -> int:
+        """Write everything that changed since the last flush; returns rows written."""
+        with self._lock:
+            if self._closed:
+                return 0
+            start = time.perf_counter()
+            try:
+                (device_rows, alert_rows, anomaly_rows, missed), cursors = self._collect()
+            except RuntimeError:
+                return 0  # an alert changed while it was serialized; try again next flush
+            with self._conn:
+                if device_rows:
+                    self._conn.executemany('INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?, ?)', device_rows)
+                if alert_rows:
+                    self._conn.executemany('INSERT OR REPLACE INTO alerts VALUES (?, ?, ?, ?, ?, ?)', alert_rows)
+                if anomaly_rows:
+                    self._conn.executemany('INSERT OR REPLACE INTO anomalies VALUES (?, ?, ?, ?)', anomaly_rows)
+                self._prune()
+            self._device_version, self._alert_id, self._alerts_checked, self._anomaly_seq = cursors
+            written = len(device_rows) + len(alert_rows) + len(anomaly_rows)
+            if missed and not self.missed:
+                print(f"[!] State store: {missed} alerts/anomalies left memory before they were saved; "
+                      f"lower PERSIST_FLUSH_INTERVAL to keep up")
+            self.missed += missed
+            self.flushes += 1
+            self.rows_written += written
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            return written
+
+    def _prune(self):
+        now = time.time()
+        if self.retention_days <= 0 or now < self._next_prune:
+            return
+        cutoff = now - self.retention_days * 86400
+        self._conn.execute('DELETE FROM devices WHERE updated < ?', (cutoff,))
+        self._conn.execute('DELETE FROM alerts WHERE ts < ?', (cutoff,))
+        self._conn.execute('DELETE FROM anomalies WHERE ts < ?', (cutoff,))
+        self._next_prune = now + PRUNE_INTERVAL
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"[!] State store flush failed ({self.path}): {e}")
+
+    def start(self) -> "StateStore":
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True, name='state-store')
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the flush thread, write what is left and close the database."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            print(f"[!] State store final flush failed ({self.path}): {e}")
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._conn.close()
+
+    # Historical queries (any thread)
+
+    def find_devices(self, ip: str = None, mac: str = None, limit: int = 100) -> List[Dict]:
+        """Saved devices by exact IP and/or MAC, most recently updated first."""
+        clauses, params = [], []
+        if ip:
+            clauses.append('ip = ?')
+            params.append(ip)
+        if mac:
+            clauses.append('mac = ?')
+            params.append(mac.lower())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._reader().execute(
+            f'SELECT ip, updated, data FROM devices {where} ORDER BY updated DESC LIMIT ?',
+            params + [limit])
+        return [{'ip': ip_, 'updated': datetime.fromtimestamp(updated).isoformat(), **json.loads(data)}
+                for ip_, updated, data in rows]
+
+    def _range_query(self, table: str, key: str, start: Optional[float], end: Optional[float],
+                     filters: Dict, limit: int) -> List[Dict]:
+        clauses, params = [], []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if start is not None:
+            clauses.append('ts >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('ts < ?')
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._reader().execute(
+            f'SELECT data FROM {table} {where} ORDER BY ts, {key} LIMIT ?', params + [limit])
+        return [json.loads(data) for data, in rows]
+
+    def alerts_between(self, start: float = None, end: float = None, limit: int = 100,
+                       ip: str = None, severity: List[str] = None, alert_type: str = None) -> List[Dict]:
+        """Saved alerts raised in [start, end) (epoch seconds), oldest first."""
+        severities = [s.upper() for s in severity] if severity else None
+        return self._range_query('alerts', 'id', start, end,
+                                 {'ip': ip, 'severity': severities, 'type': alert_type}, limit)
+
+    def anomalies_between(self, start: float = None, end: float = None, limit: int = 100,
+                          src_ip: str = None) -> List[Dict]:
+        """Saved anomalies scored in [start, end) (epoch seconds), oldest first."""
+        return self._range_query('anomalies', 'seq', start, end, {'src_ip': src_ip}, limit)
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'missed': self.missed,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+        }
+
+
+# Set by open_store() when persistence is enabled
+state_store: Optional[StateStore] = None
+
+
+def open_store(path: str = PERSIST_PATH) -> Optional[StateStore]:
+    """Open the state store at `path`, restore its state and start flushing. None disables."""
+    global state_store
+    if not path:
+        return None
+    if state_store is None:
+        try:
+            store = StateStore(path)
+            store.restore()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"[!] State store disabled ({path}): {e}")
+            return None
+        state_store = store.start()
+        atexit.register(store.close)
+    return state_store
+
+
+def close_store() -> None:
+    if state_store is not None:
+        state_store.close()
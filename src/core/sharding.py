@@ -0,0 +1,268 @@
+# sharding.py
+import multiprocessing as mp
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Dict, List
+
+from scapy.all import Ether
+from scapy.packet import Raw
+
+from .fast_decoder import shard_key, decode_flow_headers
+from . import device_tracker
+from .device_tracker import device_log
+from .alert_system import alert_system, copy_alert
+from .anomaly_store import anomaly_store
+from .flow_table import flow_table
+from .suspicious_devices import suspicious_tracker
+from .timeseries import device_series
+
+# Import configuration
+try:
+    from config import SHARD_BATCH_SIZE, SHARD_BATCH_MAX_LATENCY_MS, SHARD_PUBLISH_INTERVAL
+except ImportError:
+    SHARD_BATCH_SIZE = 256
+    SHARD_BATCH_MAX_LATENCY_MS = 100
+    SHARD_PUBLISH_INTERVAL = 1.0
+
+# Workers are started with "spawn" everywhere: the capture process runs
+# threads (web, summary, ML scorer) that must not be forked mid-flight
+_ctx = mp.get_context("spawn")
+
+
+def _worker_main(index: int, frames_q, results_q, publish_interval: float) -> None:
+    """
+    Shard worker: runs the normal packet_callback pipeline on the frames
+    dispatched to it. Its device_log, suspicious_tracker and feature-extractor
+    state only ever see this shard's source IPs; it periodically publishes
+    what changed for the parent to merge. Flows and time series are kept by
+    the parent, since a conversation's two directions go to different shards.
+    """
+    from . import sniffer  # loads the model and pipeline in this process
+    # The parent spools merged alerts and delivers them to its handlers
+    alert_system.spool = None
+    alert_system.dispatcher.handlers.clear()
+    alert_system.export_repeats = True
+    sniffer.track_flows = False
+    results_q.put({'worker': index, 'ready': True})
+
+    profiler = sniffer.StageProfiler()
+    packets = 0
+    alerts_sent = 0
+    anomalies_sent = 0
+    devices_version = suspicious_version = -1
+    last_publish = time.monotonic()
+
+    def publish(final=False):
+        nonlocal alerts_sent, anomalies_sent, devices_version, suspicious_version
+        # Alerts and devices are copied now: the queue pickles them later, on
+        # its feeder thread, while repeats and new packets may change them
+        alerts = [copy_alert(alert) for alert in alert_system.alerts_since(alerts_sent)]
+        if alerts:
+            alerts_sent = alerts[-1]['id']
+        anomalies = anomaly_store.events_since(anomalies_sent)
+        if anomalies:
+            anomalies_sent = anomalies[0].seq
+        # Only devices that changed since the last publish travel; the
+        # suspicious-device table is sent whole, when it changed
+        version = device_tracker.get_version()
+        devices = {ip: device_tracker.copy_entry(device_log[ip])
+                   for ip in device_tracker.changed_since(devices_version)}
+        devices_version = version
+        suspicious = None
+        if suspicious_version != suspicious_tracker.version:
+            suspicious_version = suspicious_tracker.version
+            suspicious = {ip: dict(d) for ip, d in suspicious_tracker.devices.items()}
+        results_q.put({
+            'worker': index,
+            'final': final,
+            'packets': packets,
+            'devices': devices,
+            'alerts': alerts,
+            'repeats': alert_system.take_repeats(),
+            'anomalies': anomalies,
+            'suspicious': suspicious,
+            'stage_times': dict(profiler.times, ml_scoring=sniffer.scoring_time()),
+        })
+
+    while True:
+        try:
+            item = frames_q.get(timeout=publish_interval)
+        except queue.Empty:
+            item = ()
+        if item is None:
+            break
+        if item:
+            link, frames = item
+            for frame in frames:
+                profiler.packet_callback(frame, link=link)
+            packets += len(frames)
+        if time.monotonic() - last_publish >= publish_interval:
+            publish()
+            last_publish = time.monotonic()
+
+    sniffer.flush_scoring()
+    alert_system.flush()
+    publish(final=True)
+
+
+class ShardedPipeline:
+    """
+    Capture-side dispatcher for N analysis worker processes.
+
+    The capture process only extracts the source address from each frame
+    and hashes it to a worker, so every device's state lives in exactly one
+    worker. Frames are shipped in batches to keep IPC overhead per packet
+    low. A collector thread merges worker snapshots back into this
+    process's device_log, alert_system, anomaly_store and suspicious_tracker,
+    which the web interface and print_summary keep reading as before.
+
+    Flow accounting (flow_table, device_series) stays in this process, on a
+    header-only decode of each frame: sharding by source IP sends a reply
+    to a different worker than its request, so no worker sees whole flows.
+    """
+
+    def __init__(self, workers: int,
+                 batch_size: int = SHARD_BATCH_SIZE,
+                 max_latency_ms: float = SHARD_BATCH_MAX_LATENCY_MS,
+                 publish_interval: float = SHARD_PUBLISH_INTERVAL):
+        self.n = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.max_latency = max_latency_ms / 1000.0
+        self.publish_interval = publish_interval
+
+        self._frames_qs = [_ctx.Queue(maxsize=1024) for _ in range(self.n)]
+        self._results_q = _ctx.Queue()
+        self._procs = [
+            _ctx.Process(target=_worker_main,
+                         args=(i, self._frames_qs[i], self._results_q, publish_interval),
+                         daemon=True)
+            for i in range(self.n)
+        ]
+        self._pending: List[List[bytes]] = [[] for _ in range(self.n)]
+        self._pending_link = [Ether] * self.n
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._finished = 0
+        self._stopping = False
+
+        self.dispatched = [0] * self.n
+        self.worker_packets = [0] * self.n
+        self.worker_stage_times: List[Dict[str, float]] = [{} for _ in range(self.n)]
+        self.flow_time = 0.0  # flow accounting in the capture process
+
+    def start(self) -> "ShardedPipeline":
+        for proc in self._procs:
+            proc.start()
+        # Wait until every worker has imported the pipeline, so callers
+        # (and replay timings) only start dispatching once they can keep up
+        for _ in range(self.n):
+            self._results_q.get()
+        self._collector.start()
+        self._flusher.start()
+        print(f"[i] Started {self.n} analysis workers (sharded by source IP)")
+        return self
+
+    # ---------- capture side ----------
+
+    def dispatch(self, frame: bytes, link=Ether, ts: float = None) -> None:
+        """Queue one frame for its worker; `ts` is the capture time for replays (else the wall clock)."""
+        start = time.perf_counter()
+        hdr = decode_flow_headers(frame, link)
+        if hdr is not None:
+            device_series.update(hdr, ts, flow_table.update(hdr, ts))
+        self.flow_time += time.perf_counter() - start
+
+        idx = zlib.crc32(shard_key(frame, link)) % self.n
+        with self._lock:
+            if link is not self._pending_link[idx]:
+                self._send(idx)
+                self._pending_link[idx] = link
+            pending = self._pending[idx]
+            pending.append(frame)
+            if len(pending) >= self.batch_size:
+                self._send(idx)
+
+    def packet_callback(self, pkt) -> None:
+        """Drop-in sniff(prn=...) callback for live capture."""
+        from . import sniffer
+        if isinstance(pkt, Raw):
+            self.dispatch(pkt.load, sniffer._capture_link)
+        else:
+            self.dispatch(pkt.original or bytes(pkt), type(pkt))
+
+    def _send(self, idx: int) -> None:
+        frames = self._pending[idx]
+        if frames:
+            self._frames_qs[idx].put((self._pending_link[idx], frames))
+            self.dispatched[idx] += len(frames)
+            self._pending[idx] = []
+
+    def flush(self) -> None:
+        with self._lock:
+            for idx in range(self.n):
+                self._send(idx)
+            self._last_flush = time.monotonic()
+
+    def _flush_loop(self) -> None:
+        # Partially filled batches still go out within max_latency on quiet links
+        while not self._stopping:
+            time.sleep(self.max_latency)
+            if time.monotonic() - self._last_flush >= self.max_latency:
+                self.flush()
+
+    def drain(self) -> None:
+        """Send everything pending and wait until each worker's final state is merged."""
+        if not self._stopping:
+            self._stopping = True
+            self.flush()
+            for q in self._frames_qs:
+                q.put(None)
+        self._collector.join()
+
+    def stop(self) -> None:
+        """drain(), then wait for the worker processes to exit."""
+        self.drain()
+        for proc in self._procs:
+            proc.join()
+
+    # ---------- merge side ----------
+
+    def _collect(self) -> None:
+        while self._finished < self.n:
+            snap = self._results_q.get()
+            try:
+                self._merge(snap)
+            except Exception as e:
+                print(f"[!] Failed to merge worker {snap.get('worker')} snapshot: {e}")
+            if snap['final']:
+                self._finished += 1
+
+    def _merge(self, snap: Dict[str, Any]) -> None:
+        idx = snap['worker']
+
+        # Devices are keyed by source IP, so shards never overlap
+        device_tracker.merge_devices(snap['devices'])
+
+        alert_system.merge_alerts(snap['alerts'], snap['repeats'], source=idx)
+        for event in reversed(snap['anomalies']):
+            anomaly_store.add(event)
+        if snap['suspicious'] is not None:
+            for ip, entry in snap['suspicious'].items():
+                suspicious_tracker.devices[ip] = entry
+            suspicious_tracker.version += 1
+
+        self.worker_packets[idx] = snap['packets']
+        self.worker_stage_times[idx] = snap['stage_times']
+
+    def stage_times(self) -> Dict[str, float]:
+        """Per-stage CPU time summed over all workers (flows: in the capture process)."""
+        totals: Dict[str, float] = {}
+        for times in self.worker_stage_times:
+            for stage, seconds in times.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        totals['flows'] = self.flow_time
+        return totals
@@ -1,17 +1,31 @@
 # sniffer.py
 import platform
-from scapy.all import sniff, conf, Ether, IP, ARP
-from scapy.layers.inet import IP, TCP, UDP
+from scapy.all import sniff, conf, Ether
 
 from .analyzer import analyze_packet
+from .fast_decoder import decode_packet
 
 from src.ml.feature_extractor import extract_features, as_vector
-from src.ml.model_manager import TrafficAnomalyModel
+from src.ml.window_features import WindowFeatureTracker, as_window_vector
+from src.ml.model_manager import TrafficAnomalyModel, WINDOW_MODEL_PATH
 
 from src.core.anomaly_store import anomaly_store, AnomalyEvent
+from src.core.batch_scorer import BatchAnomalyScorer
 from src.core.suspicious_devices import suspicious_tracker
+from src.core.alert_system import alert_system
+from src.core.device_tracker import device_log
+from src.core.flow_table import flow_table
+from src.core.timeseries import device_series
+from src.core.capture_filter import build_filter, ip_only, check_snaplen, attach_filter
+from src.core.metrics import metrics, instrument_methods, Counter
 
 from datetime import datetime
+from time import perf_counter
+
+try:
+    from config import ML_SCORING
+except ImportError:
+    ML_SCORING = 'auto'
 
 try:
     from scapy.all import L3RawSocket          # Linux/macOS only
@@ -19,72 +33,263 @@ except ImportError:
     L3RawSocket = None
 
 ml_model = TrafficAnomalyModel.load()
+window_model = TrafficAnomalyModel.load(WINDOW_MODEL_PATH)
 
 VERBOSE = False
+# Shard workers leave flows and time series to the dispatching process,
+# which sees both directions of every conversation
+track_flows = True
 WINDOWS = platform.system() == "Windows"
+LINUX = platform.system() == "Linux"
+
+# Link layer of undissected frames handed over by the raw capture socket
+_capture_link = Ether
 
 def colored(text, color):
     _C = {"cyan": "\033[96m", "red": "\033[91m", "reset": "\033[0m"}
     return f"{_C[color]}{text}{_C['reset']}"
 
-def packet_callback(pkt):
-    if VERBOSE:
+def _decode(pkt, link):
+    if VERBOSE and hasattr(pkt, "summary"):
         print(colored(pkt.summary(), "cyan"))
+    # Parse headers once; every stage below reads this record
+    return decode_packet(pkt, link=link or _capture_link, keep_payload=VERBOSE)
 
-    mac_src = pkt[Ether].src.lower() if pkt.haslayer(Ether) else None
-    ip_src  = pkt[IP].src if pkt.haslayer(IP) else pkt[ARP].psrc if pkt.haslayer(ARP) else None
-    ip_dst  = pkt[IP].dst if pkt.haslayer(IP) else pkt[ARP].pdst if pkt.haslayer(ARP) else None
+def _analyze(hdr):
+    analyze_packet(hdr, mac_src=hdr.mac_src, ip_src=hdr.ip_src, ip_dst=hdr.ip_dst)
+
+def _submit_for_scoring(hdr, feat_dict):
+    if not anomaly_scorer.enabled:
+        return  # No model loaded → ML disabled
+
+    # Collect some packet metadata for the event; the packet itself is not
+    # kept past this callback
+    anomaly_scorer.submit(as_vector(feat_dict), {
+        "timestamp": datetime.now().isoformat(),
+        "src_ip": hdr.ip_src,
+        "dst_ip": hdr.ip_dst,
+        "src_port": hdr.sport if hdr.l4 in ("TCP", "UDP") else 0,
+        "dst_port": hdr.dport if hdr.l4 in ("TCP", "UDP") else 0,
+        "protocol": hdr.l4 if hdr.l4 in ("TCP", "UDP") else "OTHER",
+        "features": feat_dict,
+    })
+
+def packet_callback(pkt, link=None, ts=None):
+    """
+    Process one captured packet: a Scapy packet, or raw frame bytes whose
+    first layer is `link` (defaults to the live capture's link layer).
+    `ts` is the capture time for replays; flows and host windows otherwise
+    use the wall clock.
+    """
+    hdr = _decode(pkt, link)
 
     # ----- existing analysis pipeline -----
-    analyze_packet(pkt, mac_src=mac_src, ip_src=ip_src, ip_dst=ip_dst)
+    _analyze(hdr)
+    if track_flows:
+        device_series.update(hdr, ts, flow_table.update(hdr, ts))
 
     # ANOMALY  DETECTION
-    feat_dict = extract_features(pkt)
+    if score_windows:
+        window_features.update(hdr, ts)
+    if not score_packets:
+        return
+    feat_dict = extract_features(hdr)
     if feat_dict is None:
         return  # Not a packet type we extract from
 
-    vec = as_vector(feat_dict)
-    result = ml_model.predict_one(vec)
+    _submit_for_scoring(hdr, feat_dict)
 
-    if result is None:
-        return  # No model loaded → ML disabled
+class StageProfiler:
+    """
+    packet_callback with per-stage latency histograms. Used as the live
+    callback when metrics are enabled, and by replay runs for stage totals.
+    """
+
+    STAGES = ("decode", "analyze", "flows", "features", "ml_submit")
+
+    def __init__(self, registry=metrics):
+        self.packets = Counter()
+        self.hists = {
+            stage: registry.histogram(
+                "netsleuth_stage_seconds", "Per-packet pipeline stage latency", {"stage": stage})
+            for stage in self.STAGES
+        }
+        self._decode = self.hists["decode"].observe
+        self._analyze = self.hists["analyze"].observe
+        self._flows = self.hists["flows"].observe
+        self._features = self.hists["features"].observe
+        self._ml_submit = self.hists["ml_submit"].observe
+
+    @property
+    def times(self):
+        """Total seconds spent per stage."""
+        return {stage: h.sum for stage, h in self.hists.items()}
+
+    def packet_callback(self, pkt, link=None, ts=None):
+        self.packets.value += 1
+        t0 = perf_counter()
+        hdr = _decode(pkt, link)
+        t1 = perf_counter()
+        _analyze(hdr)
+        t2 = perf_counter()
+        if track_flows:
+            device_series.update(hdr, ts, flow_table.update(hdr, ts))
+        t3 = perf_counter()
+        if score_windows:
+            window_features.update(hdr, ts)
+        feat_dict = extract_features(hdr) if score_packets else None
+        t4 = perf_counter()
+        self._decode(t1 - t0)
+        self._analyze(t2 - t1)
+        self._flows(t3 - t2)
+        self._features(t4 - t3)
+        if feat_dict is None:
+            return
+        _submit_for_scoring(hdr, feat_dict)
+        self._ml_submit(perf_counter() - t4)
+
+def report_anomaly(meta, result):
+    """Route one scored anomaly to the anomaly store and suspicious tracker."""
+    ip_src = meta["src_ip"]
+    ip_dst = meta["dst_ip"]
+
+    event = AnomalyEvent(
+        timestamp=meta["timestamp"],
+        src_ip=ip_src or "?",
+        dst_ip=ip_dst or "?",
+        src_port=meta["src_port"],
+        dst_port=meta["dst_port"],
+        protocol=meta["protocol"],
+        score=result.score,
+        extra=meta["features"],
+    )
+
+    anomaly_store.add(event)
+
+    suspicious_tracker.register_anomaly(ip_src, result.score)
+
+    print(colored(
+        f"[ML] Anomaly detected -> {ip_src}:{meta['src_port']} -> {ip_dst}:{meta['dst_port']} "
+        f"(score={result.score:.3f})",
+        "red"
+    ))
+
+anomaly_scorer = BatchAnomalyScorer(ml_model, on_anomaly=report_anomaly)
+
+# Per-host window scoring: one vector per host per window, only when a
+# window model has been trained
+window_scorer = BatchAnomalyScorer(window_model, on_anomaly=report_anomaly)
+
+def _submit_window(ip, window_start, feat_dict):
+    window_scorer.submit(as_window_vector(feat_dict), {
+        "timestamp": datetime.fromtimestamp(window_start).isoformat(),
+        "src_ip": ip,
+        "dst_ip": "*",
+        "src_port": 0,
+        "dst_port": 0,
+        "protocol": "WINDOW",
+        "features": feat_dict,
+    })
+
+window_features = WindowFeatureTracker(on_window=_submit_window)
+
+def _scoring_modes(mode):
+    """(score each packet, score each host window) for ML_SCORING and the models that loaded."""
+    if mode == 'auto':
+        mode = 'window' if window_scorer.enabled else 'packet'
+    if mode not in ('packet', 'window', 'both'):
+        print(f"[ML] Unknown ML_SCORING {mode!r}; scoring packets and windows.")
+        mode = 'both'
+    packets = anomaly_scorer.enabled and mode in ('packet', 'both')
+    windows = window_scorer.enabled and mode in ('window', 'both')
+    if anomaly_scorer.enabled and not packets:
+        print("[ML] Scoring once per host window; per-packet scoring is off (ML_SCORING).")
+    return packets, windows
+
+score_packets, score_windows = _scoring_modes(ML_SCORING)
+
+def flush_scoring():
+    """Close open host windows and wait for both scorers to drain."""
+    window_features.flush_all()
+    anomaly_scorer.flush()
+    window_scorer.flush()
+
+def scoring_time():
+    """Seconds the background scorers have spent scoring and routing batches."""
+    return anomaly_scorer.score_time + window_scorer.score_time
+
+# ---------- metrics: only wired up when enabled, so "off" costs nothing ----------
+_live_profiler = None
+
+def _enable_metrics():
+    global _live_profiler
+    _live_profiler = StageProfiler()
+    instrument_methods(
+        alert_system,
+        [name for name in dir(alert_system) if name.startswith("check_")],
+        "netsleuth_alert_check_seconds", "Latency of each AlertSystem.check_* call",
+        metrics,
+    )
+    anomaly_scorer.batch_histogram = metrics.histogram(
+        "netsleuth_ml_batch_seconds", "Latency of one batched ML scoring call")
+
+    metrics.gauge("netsleuth_packets_seen", "Packets seen by the analysis pipeline",
+                  lambda: _live_profiler.packets.value)
+    metrics.gauge("netsleuth_packets_dropped", "Packets dropped before ML scoring (queue full)",
+                  lambda: anomaly_scorer.dropped)
+    metrics.gauge("netsleuth_alerts_fired", "Alerts raised since start",
+                  lambda: alert_system.total_alerts)
+    metrics.gauge("netsleuth_alerts_dropped", "Alerts dropped before delivery to handlers (queue full)",
+                  lambda: alert_system.dispatcher.dropped)
+    metrics.gauge("netsleuth_alert_queue_depth", "Alerts waiting for handler delivery",
+                  alert_system.dispatcher.queue_depth)
+    metrics.gauge("netsleuth_alerts_suppressed", "Repeat alerts folded into an existing alert (cooldown)",
+                  lambda: alert_system.suppressed_alerts)
+    metrics.gauge("netsleuth_anomaly_queue_depth", "Feature vectors waiting for ML scoring",
+                  lambda: anomaly_scorer.queue_depth() + window_scorer.queue_depth())
+    metrics.gauge("netsleuth_devices", "Devices currently tracked",
+                  lambda: len(device_log))
+    metrics.gauge("netsleuth_flows_active", "Flows currently in the flow table",
+                  lambda: len(flow_table))
+    metrics.gauge("netsleuth_flows_evicted_early", "Flows evicted before their timeout (table full)",
+                  lambda: flow_table.evicted_early)
+
+if metrics.enabled:
+    _enable_metrics()
+
+def _open_raw_l2_socket(interface, bpf=None, snaplen=0):
+    """
+    L2 listen socket that hands frames over undissected, so the fast
+    decoder reads the bytes and Scapy only dissects what it cannot parse.
+    `bpf` and `snaplen` are applied in the kernel.
+    """
+    global _capture_link
+    sock = conf.L2listen(iface=interface, monitor=True, filter=bpf)
+    if snaplen:
+        attach_filter(sock.ins, bpf, interface, snaplen)
+    if getattr(sock, "LL", None) is not None:
+        _capture_link = sock.LL
+        sock.LL = conf.raw_layer
+    return sock
+
+def start_sniffing(interface, packet_count=0, callback=None):
+    # callback replaces packet_callback, e.g. to dispatch to shard workers
+    if callback is None:
+        callback = _live_profiler.packet_callback if _live_profiler else packet_callback
+    prn = callback
+    # Live traffic runs on the wall clock: expire flows and complete time
+    # series intervals even when no packets arrive
+    flow_table.start_timer()
+    device_series.start_timer()
+
+    bpf = build_filter()
+    snaplen = check_snaplen()
+    if bpf:
+        print(f"[i] Capture filter: {bpf}")
+    if snaplen and not LINUX:
+        print(colored("[!] CAPTURE_SNAPLEN is only applied on Linux; capturing whole packets.", "red"))
+        snaplen = 0
 
-    if result.is_anomaly:
-        # Collect some packet metadata for the event
-        src_port = 0
-        dst_port = 0
-        proto = "OTHER"
-
-        if pkt.haslayer(TCP):
-            src_port = int(pkt[TCP].sport)
-            dst_port = int(pkt[TCP].dport)
-            proto = "TCP"
-        elif pkt.haslayer(UDP):
-            src_port = int(pkt[UDP].sport)
-            dst_port = int(pkt[UDP].dport)
-            proto = "UDP"
-
-        event = AnomalyEvent(
-            timestamp=datetime.now().isoformat(),
-            src_ip=ip_src or "?",
-            dst_ip=ip_dst or "?",
-            src_port=src_port,
-            dst_port=dst_port,
-            protocol=proto,
-            score=result.score,
-            extra=feat_dict,
-        )
-
-        anomaly_store.add(event)
-
-        suspicious_tracker.register_anomaly(ip_src, result.score)
-
-        print(colored(
-            f"[ML] Anomaly detected -> {ip_src}:{src_port} -> {ip_dst}:{dst_port} "
-            f"(score={result.score:.3f})",
-            "red"
-        ))
-def start_sniffing(interface, packet_count=0):
     # ---------- Windows: try L2 capture first, fall back to L3 ----------
     if WINDOWS:
         print("[i] Windows detected → attempting L2 capture for MAC addresses")
@@ -92,9 +297,10 @@ def start_sniffing(interface, packet_count=0):
         try:
             # Try to get MAC addresses with L2 capture
             sniff(iface=interface,
-                  prn=packet_callback,
+                  prn=prn,
                   count=packet_count,
-                  store=False)
+                  store=False,
+                  filter=bpf)
             return
         except Exception as e:
             print(colored(f"[!] L2 capture failed: {e}\n    Falling back to IP-only capture.", "red"))
@@ -104,26 +310,25 @@ def start_sniffing(interface, packet_count=0):
             l3sock = conf.L3socket(iface=interface)
             sniff(
                 opened_socket=l3sock,
-                prn=packet_callback,
+                prn=prn,
                 count=packet_count,
                 store=False,
-                filter="ip"
+                filter=ip_only(bpf)
             )
             return
 
     # ---------- Linux / macOS: try full L2, then fall back ----------
     try:
-        sniff(iface=interface,
-              prn=packet_callback,
+        sniff(opened_socket=_open_raw_l2_socket(interface, bpf, snaplen),
+              prn=prn,
               count=packet_count,
-              store=False,
-              monitor=True)
+              store=False)
     except Exception as e:
         print(colored(f"[!] L2 sniffing failed: {e}\n    Falling back to IP-only.", "red"))
         if L3RawSocket:
             conf.L3socket = L3RawSocket
         sniff(iface=interface,
-              prn=packet_callback,
+              prn=prn,
               count=packet_count,
               store=False,
-              filter="ip")
\ No newline at end of file
+              filter=ip_only(bpf))
\ No newline at end of file
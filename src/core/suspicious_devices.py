@@ -19,6 +19,7 @@ class SuspiciousDeviceTracker:
             "recent_anomalies": [],
             "last_seen": None
         })
+        self.version = 0  # bumped whenever a device entry changes
 
     def _severity(self, score):
         if score is None:
@@ -48,6 +49,7 @@ class SuspiciousDeviceTracker:
         entry["recent_anomalies"] = [
             (t, s) for (t, s) in entry["recent_anomalies"] if t > cutoff
         ]
+        self.version += 1
 
     def get_top_suspicious(self, limit=5):
         # Filter out devices with no anomalies
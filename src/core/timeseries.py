@@ -0,0 +1,340 @@
+# timeseries.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Import configuration
+try:
+    from config import TIMESERIES_TIERS, TIMESERIES_MAX_DEVICES, TIMESERIES_FINE_DEVICES
+except ImportError:
+    TIMESERIES_TIERS = [(1, 600), (60, 180), (3600, 168)]
+    TIMESERIES_MAX_DEVICES = 65536
+    TIMESERIES_FINE_DEVICES = 2048
+
+METRICS = ('packets', 'bytes', 'connections', 'dns_queries')
+
+# Rows allocated up front per pool; doubled as devices appear, up to its limit
+INITIAL_DEVICES = 256
+
+
+class _Rows:
+    """
+    ip -> array row, allocated as devices appear (the arrays grow with
+    `capacity`). Past `limit` the row of the least recently active device
+    is reused, and the caller clears its data. A device that finds every
+    row taken by devices active in the same step gets none for that step.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, int(limit))
+        self.capacity = min(self.limit, INITIAL_DEVICES)
+        self.index: Dict[str, int] = OrderedDict()  # least recently active first
+        self._stamp: List[int] = []      # row -> last assign() call that used it
+        self._calls = 0
+        self.evicted = 0
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def assign(self, ips: List[str]):
+        """Rows for `ips` (-1 for a device left without one), and the rows taken over from other devices."""
+        self._calls += 1
+        call = self._calls
+        index, stamp = self.index, self._stamp
+        rows = np.empty(len(ips), dtype=np.intp)
+        new = []
+        for i, ip in enumerate(ips):
+            row = index.get(ip)
+            if row is None:
+                new.append(i)
+                continue
+            index.move_to_end(ip)
+            stamp[row] = call
+            rows[i] = row
+        reused = []
+        for n, i in enumerate(new):
+            if len(index) < self.limit:
+                row = len(index)
+                if row == self.capacity:
+                    self.capacity = min(self.limit, self.capacity * 2)
+                stamp.append(call)
+            else:
+                oldest, row = next(iter(index.items()))
+                if stamp[row] == call:
+                    # Every row is in use this step, so are the ones after it
+                    rows[new[n:]] = -1
+                    self.skipped += len(new) - n
+                    break
+                del index[oldest]
+                stamp[row] = call
+                reused.append(row)
+                self.evicted += 1
+            index[ips[i]] = row
+            rows[i] = row
+        return rows, reused
+
+    def clear(self) -> None:
+        self.index.clear()
+        self._stamp.clear()
+
+
+class DeviceTimeSeries:
+    """
+    Per-device traffic counters at several resolutions, round-robin
+    database style.
+
+    Each tier (step seconds, slots) is a pair of arrays used as a ring over
+    time: uint32 packets/connections/DNS counts of shape (slots + 1, rows, 3)
+    and uint64 bytes of shape (slots + 1, rows). Interval i lives in slot
+    i % (slots + 1), one contiguous block for all devices; the extra slot
+    holds the interval still in progress. Counters are integers, so totals
+    stay exact. Packets only bump a per-device counter for the current step;
+    when the step changes, all devices' counters are added to the current
+    interval of every tier, one vectorized assignment per tier. A timer
+    (start_timer) does the same on a quiet link, so the last intervals still
+    complete.
+
+    Memory is fixed per device. The finest tier only keeps rows for the
+    fine_devices most recently active devices (its whole span is a few
+    minutes, so older rows would be all zeros); the coarser tiers keep one
+    for each of up to max_devices devices, ~7 KB each with the default
+    tiers. Rows are allocated as devices appear; past either limit the rows
+    of the least recently active device are reused.
+    """
+
+    def __init__(self, tiers=TIMESERIES_TIERS, max_devices: int = TIMESERIES_MAX_DEVICES,
+                 fine_devices: int = TIMESERIES_FINE_DEVICES):
+        tiers = sorted((int(step), int(slots)) for step, slots in tiers)
+        base = tiers[0][0]
+        for step, slots in tiers:
+            if step % base or slots < 1:
+                raise ValueError(f"a {step}s tier needs a multiple of the {base}s step "
+                                 f"and at least one slot")
+        self.tiers = tiers
+        self.max_devices = max_devices
+        self._step = base
+        # Intervals of each tier in first-tier steps
+        self._ratios = [step // base for step, _ in tiers]
+        self._rows = _Rows(max_devices)
+        self._fine = _Rows(min(fine_devices, max_devices)) if len(tiers) > 1 else self._rows
+        self._pools = [self._fine] + [self._rows] * (len(tiers) - 1)
+        self._counts = [np.zeros((slots + 1, pool.capacity, 3), dtype=np.uint32)
+                        for (_, slots), pool in zip(tiers, self._pools)]
+        self._bytes = [np.zeros((slots + 1, pool.capacity), dtype=np.uint64)
+                       for (_, slots), pool in zip(tiers, self._pools)]
+        self._newest = None             # newest first-tier step completed
+        self._current = [None] * len(tiers)  # interval each tier's ring has reached
+        self._tick = None               # step being counted in _pending
+        self._pending: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()   # capture thread vs. timer vs. API readers
+        self._timer = None
+        self.late = 0  # device-steps that arrived after their interval left a ring
+
+    @property
+    def bytes_per_device(self) -> int:
+        """Memory per device in the coarser tiers (every device has these)."""
+        return sum(a[:, 0].nbytes + b[:, 0].nbytes
+                   for a, b in zip(self._counts[1:], self._bytes[1:]))
+
+    @property
+    def bytes_per_fine_device(self) -> int:
+        return self._counts[0][:, 0].nbytes + self._bytes[0][:, 0].nbytes
+
+    @property
+    def nbytes(self) -> int:
+        """Memory allocated for all tiers."""
+        return sum(a.nbytes + b.nbytes for a, b in zip(self._counts, self._bytes))
+
+    @staticmethod
+    def _spans(first: int, last: int, slots: int):
+        """The ring slices holding intervals first..last (at most two)."""
+        a, b = first % slots, last % slots
+        if last - first + 1 >= slots:
+            return [slice(0, slots)]
+        if a <= b:
+            return [slice(a, b + 1)]
+        return [slice(a, slots), slice(0, b + 1)]
+
+    def update(self, hdr, now: float = None, new_flow: bool = False) -> None:
+        """Count one decoded packet for its source; new_flow marks a new connection it opened."""
+        ip = hdr.ip_src
+        if not ip:
+            return
+        tick = int((time.time() if now is None else now) // self._step)
+        with self._lock:
+            if tick != self._tick:
+                self._flush()
+                self._tick = tick
+            counts = self._pending.get(ip)
+            if counts is None:
+                counts = self._pending[ip] = [0, 0, 0, 0]
+            counts[0] += 1
+            counts[1] += hdr.wirelen
+            if new_flow:
+                counts[2] += 1
+            if hdr.is_dns and hdr.dport == 53:
+                counts[3] += 1
+
+    def flush(self) -> None:
+        """Write the counters of the step being counted (end of a capture or replay)."""
+        with self._lock:
+            self._flush()
+
+    def advance(self, now: float = None) -> None:
+        """Complete every step before `now`: write the pending one and move the rings on."""
+        tick = int((time.time() if now is None else now) // self._step)
+        with self._lock:
+            if self._tick is not None and tick <= self._tick:
+                return
+            self._flush()
+            self._tick = tick
+            if self._newest is not None and tick - 1 > self._newest:
+                self._advance(tick - 1)
+
+    def start_timer(self) -> None:
+        """Advance from a daemon thread every step (wall-clock capture only)."""
+        if self._timer is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self._step)
+                self.advance()
+
+        self._timer = threading.Thread(target=run, daemon=True, name='timeseries')
+        self._timer.start()
+
+    def clear(self) -> None:
+        """Forget every device's series."""
+        with self._lock:
+            self._pending.clear()
+            for pool in (self._fine, self._rows):
+                pool.clear()
+            for counts, data in zip(self._counts, self._bytes):
+                counts[:] = 0
+                data[:] = 0
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._write(self._tick, list(pending), np.array(list(pending.values()), dtype=np.uint64))
+
+    def _write(self, tick: int, ips: List[str], values: np.ndarray) -> None:
+        if self._newest is None or tick > self._newest:
+            self._advance(tick)
+        counts = values[:, [0, 2, 3]].astype(np.uint32)
+        data = values[:, 1]
+        late = False
+        assigned = {}
+        for k, (_, slots) in enumerate(self.tiers):
+            interval = tick // self._ratios[k]
+            if interval <= self._current[k] - slots - 1:
+                late = True
+                continue
+            pool = self._pools[k]
+            batch = assigned.get(id(pool))
+            if batch is None:
+                rows, reused = pool.assign(ips)
+                self._fit(pool, reused)
+                keep = rows >= 0
+                batch = (rows, counts, data) if keep.all() else (rows[keep], counts[keep], data[keep])
+                assigned[id(pool)] = batch
+            rows, pool_counts, pool_data = batch
+            slot = interval % (slots + 1)
+            self._counts[k][slot, rows] += pool_counts
+            self._bytes[k][slot, rows] += pool_data
+        if late:
+            self.late += len(ips)
+
+    def _fit(self, pool: _Rows, reused: List[int]) -> None:
+        """Grow the pool's tiers to its capacity, and clear rows it reused."""
+        for k, (_, slots) in enumerate(self.tiers):
+            if self._pools[k] is not pool:
+                continue
+            old = self._counts[k].shape[1]
+            if old < pool.capacity:
+                counts = np.zeros((slots + 1, pool.capacity, 3), dtype=np.uint32)
+                counts[:, :old] = self._counts[k]
+                self._counts[k] = counts
+                data = np.zeros((slots + 1, pool.capacity), dtype=np.uint64)
+                data[:, :old] = self._bytes[k]
+                self._bytes[k] = data
+            if reused:
+                self._counts[k][:, reused] = 0
+                self._bytes[k][:, reused] = 0
+
+    def _advance(self, tick: int) -> None:
+        """Move every tier's ring up to the interval holding `tick`, zeroing the slots it reuses."""
+        for k, (_, slots) in enumerate(self.tiers):
+            interval = tick // self._ratios[k]
+            current = self._current[k]
+            if current is not None and interval > current:
+                n = len(self._pools[k])
+                for span in self._spans(max(current + 1, interval - slots), interval, slots + 1):
+                    self._counts[k][span, :n] = 0
+                    self._bytes[k][span, :n] = 0
+            if current is None or interval > current:
+                self._current[k] = interval
+        self._newest = tick
+
+    def series(self, ip: str, step: int = None, points: int = None) -> Optional[List[Dict]]:
+        """
+        The device's completed intervals per tier (or only the tier of
+        `step` seconds), oldest first, at most `points` each. None if the
+        device has no traffic on record. Finer tiers are all zeros for a
+        device that was not among the most recently active.
+        """
+        tiers = []
+        with self._lock:
+            if ip not in self._rows.index and ip not in self._fine.index:
+                return None
+            if self._newest is None:
+                return None
+            for k, (tier_step, slots) in enumerate(self.tiers):
+                if step is not None and tier_step != step:
+                    continue
+                last = (self._newest + 1) // self._ratios[k] - 1
+                count = slots if points is None else max(0, min(points, slots))
+                first = last - count + 1
+                row = self._pools[k].index.get(ip)
+                if row is None:
+                    counts = np.zeros((count, 3), dtype=np.uint32)
+                    data = np.zeros(count, dtype=np.uint64)
+                else:
+                    index = np.arange(first, last + 1) % (slots + 1)
+                    counts, data = self._counts[k][index, row], self._bytes[k][index, row]
+                tiers.append((tier_step, first, last, counts, data))
+        out = []
+        for tier_step, first, last, counts, data in tiers:
+            out.append({
+                'step': tier_step, 'start': first * tier_step, 'end': (last + 1) * tier_step,
+                'packets': counts[:, 0].tolist(),
+                'bytes': data.tolist(),
+                'connections': counts[:, 1].tolist(),
+                'dns_queries': counts[:, 2].tolist(),
+            })
+        return out
+
+    def stats(self) -> Dict:
+        return {
+            'devices': len(self._rows),
+            'max_devices': self.max_devices,
+            'fine_devices': len(self._fine),
+            'max_fine_devices': self._fine.limit,
+            'bytes_per_device': self.bytes_per_device,
+            'bytes_per_fine_device': self.bytes_per_fine_device,
+            'allocated_bytes': self.nbytes,
+            'evicted': self._rows.evicted,
+            'fine_evicted': self._fine.evicted,
+            'fine_skipped': self._fine.skipped,
+            'late': self.late,
+        }
+
+
+# global singleton
+device_series = DeviceTimeSeries()
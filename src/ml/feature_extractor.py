@@ -1,7 +1,7 @@
 # feature_extractor.py
 import time
-from scapy.layers.inet import IP, TCP, UDP, ICMP
-from scapy.packet import Packet
+
+from src.core.fast_decoder import PacketHeaders, decode_packet
 
 # Track last timestamp per source IP (lightweight, no flow tracking)
 _last_seen = {}
@@ -19,58 +19,47 @@ FEATURE_NAMES = [
     "is_broadcast"
 ]
 
-def extract_features(pkt: Packet):
+_PROTOCOL_CODES = {"TCP": 1, "UDP": 2, "ICMP": 3}
+
+def extract_features(pkt):
     """
     Extract lightweight, ML-friendly numeric features.
     Compatible with IsolationForest without normalization.
 
+    Accepts the sniffer's PacketHeaders record or a Scapy packet.
     """
+    hdr = pkt if isinstance(pkt, PacketHeaders) else decode_packet(pkt)
 
     # Drop packets without IP - ARP |-| LLDP still handled elsewhere
-    if not pkt.haslayer(IP):
+    if not hdr.is_ip:
         return None
 
-    ip = pkt[IP]
-
     #  basic 
-    size = len(pkt)
-    ip_len = ip.len
-    ttl = ip.ttl
+    size = hdr.wirelen
+    ip_len = hdr.ip_len
+    ttl = hdr.ttl
 
     #  protocol encoding 
-    protocol = 0
-    src_port = 0
-    dst_port = 0
-    tcp_flags = 0
-
-    if pkt.haslayer(TCP):
-        protocol = 1
-        src_port = pkt[TCP].sport
-        dst_port = pkt[TCP].dport
-        tcp_flags = int(pkt[TCP].flags)
-
-    elif pkt.haslayer(UDP):
-        protocol = 2
-        src_port = pkt[UDP].sport
-        dst_port = pkt[UDP].dport
-
-    elif pkt.haslayer(ICMP):
-        protocol = 3
+    protocol = _PROTOCOL_CODES.get(hdr.l4, 0)
+    src_port = hdr.sport
+    dst_port = hdr.dport
+    tcp_flags = hdr.tcp_flags
 
     #  entropy-like heuristic 
     # For anomalies: high entropy = encrypted/random payload
     # Normal: mDNS/SSDP have patterned payloads (low)
-    raw = bytes(pkt)[:32]
+    raw = hdr.frame[:32]
     entropy_like = sum(raw) / (1 + len(raw))
 
     # inter-arrival time per IP 
     now = time.time()
-    last = _last_seen.get(ip.src, now)
+    last = _last_seen.get(hdr.ip_src, now)
     inter_arrival = now - last
-    _last_seen[ip.src] = now
+    _last_seen[hdr.ip_src] = now
 
     #  broadcast or multicast 
-    is_broadcast = 1 if ip.dst.endswith(".255") or ip.dst.startswith("224.") else 0
+    ip_dst = hdr.ip_dst
+    is_broadcast = 1 if ip_dst.endswith(".255") or ip_dst.startswith("224.") else 0
 
     return {
         "packet_size": size,
@@ -12,6 +12,106 @@ from sklearn.ensemble import IsolationForest
 
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "models", "isoforest.pkl")
+# Per-host window model (see window_features.py)
+WINDOW_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "models", "isoforest_windows.pkl")
+
+
+def _average_path_length(n: np.ndarray) -> np.ndarray:
+    """Expected path length of an unsuccessful BST search over n samples."""
+    n = np.asarray(n, dtype=float)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+class CompiledIsolationForest:
+    """
+    A fitted IsolationForest flattened into NumPy arrays.
+
+    All trees are concatenated into one node table (feature, threshold,
+    left, right) plus a per-node path-length table for leaves, so scoring
+    is a vectorized walk of every (row, tree) pair at once with no sklearn
+    dispatch or input validation. Leaves point at themselves, which lets
+    the walk run a fixed number of steps (the deepest tree's depth).
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_path, roots, max_depth, denominator):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_path = leaf_path
+        self.roots = roots
+        self.max_depth = max_depth
+        self.denominator = denominator
+
+    @classmethod
+    def from_sklearn(cls, forest: IsolationForest) -> "CompiledIsolationForest":
+        n_features = forest.n_features_in_
+        subsample = getattr(forest, "_max_features", n_features) != n_features
+        max_samples = getattr(forest, "_max_samples", None) or forest.max_samples_
+
+        features, thresholds, lefts, rights, paths, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est, est_features in zip(forest.estimators_, forest.estimators_features_):
+            tree = est.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            idx = np.arange(n_nodes)
+
+            # Depth of every node (children always come after their parent)
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):
+                if not is_leaf[node]:
+                    depth[tree.children_left[node]] = depth[node] + 1
+                    depth[tree.children_right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            feat = np.where(is_leaf, 0, tree.feature).astype(np.int64)
+            if subsample:
+                feat = np.asarray(est_features, dtype=np.int64)[feat]
+
+            features.append(feat)
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, idx, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, idx, tree.children_right) + offset)
+            paths.append(np.where(
+                is_leaf,
+                depth + _average_path_length(tree.n_node_samples),
+                0.0,
+            ))
+            roots.append(offset)
+            offset += n_nodes
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            leaf_path=np.concatenate(paths),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth,
+            denominator=len(roots) * float(_average_path_length(np.array([max_samples]))[0]),
+        )
+
+    def score_samples(self, X) -> np.ndarray:
+        """Same values as IsolationForest.score_samples, for (n, f) or (f,) input."""
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        depths = self.leaf_path[node].sum(axis=1)
+        if self.denominator == 0:
+            return -np.ones(X.shape[0])
+        return -(2.0 ** (-depths / self.denominator))
 
 
 @dataclass
@@ -28,15 +128,33 @@ class TrafficAnomalyModel:
         """
         self.model: Optional[IsolationForest] = model
         self.threshold = threshold
+        self.compiled: Optional[CompiledIsolationForest] = None
 
     @classmethod
-    def load(cls, path: str = MODEL_PATH, threshold: float = -0.2) -> "TrafficAnomalyModel":
+    def load(cls, path: str = MODEL_PATH, threshold: float = -0.2,
+             compile: bool = True) -> "TrafficAnomalyModel":
         if not os.path.exists(path):
             print(f"[ML] No model found at {path}, running without ML.")
             return cls(model=None, threshold=threshold)
         model = joblib.load(path)
         print(f"[ML] Loaded anomaly model from {path}")
-        return cls(model=model, threshold=threshold)
+        instance = cls(model=model, threshold=threshold)
+        if compile:
+            instance.compile()
+        return instance
+
+    def compile(self) -> None:
+        """Flatten the loaded forest so inference no longer goes through sklearn."""
+        if self.model is None:
+            raise RuntimeError("No model to compile")
+        self.compiled = CompiledIsolationForest.from_sklearn(self.model)
+        print(f"[ML] Compiled {len(self.compiled.roots)} trees "
+              f"({len(self.compiled.feature)} nodes) for inference")
+
+    def _score(self, X: np.ndarray) -> np.ndarray:
+        if self.compiled is not None:
+            return self.compiled.score_samples(X)
+        return self.model.score_samples(X)
 
     def save(self, path: str = MODEL_PATH) -> None:
         if self.model is None:
@@ -56,12 +174,29 @@ class TrafficAnomalyModel:
             random_state=42,
         )
         self.model.fit(X)
+        self.compiled = None
 
     def predict_one(self, x: List[float]) -> Optional[AnomalyResult]:
         if self.model is None:
             return None
         X = np.array(x, dtype=float).reshape(1, -1)
-        scores = self.model.score_samples(X)  # shape (1,)
+        scores = self._score(X)  # shape (1,)
         score = float(scores[0])
         is_anom = score < self.threshold
         return AnomalyResult(score=score, is_anomaly=is_anom)
+
+    def predict_batch(self, X: List[List[float]]) -> Optional[List[AnomalyResult]]:
+        """
+        Score a block of feature vectors with a single score_samples call.
+        The per-call overhead is paid once per block instead of once per packet.
+        """
+        if self.model is None:
+            return None
+        if len(X) == 0:
+            return []
+        X = np.asarray(X, dtype=float)
+        scores = self._score(X)  # shape (n,)
+        return [
+            AnomalyResult(score=float(s), is_anomaly=bool(s < self.threshold))
+            for s in scores
+        ]
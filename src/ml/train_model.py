@@ -3,20 +3,27 @@ import sys,os
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 sys.path.append(ROOT)
 
+import argparse
 import csv
 
 import numpy as np
+from scapy.all import conf
+from scapy.utils import RawPcapReader
 
+from src.core.fast_decoder import decode_packet, pcap_timestamp
 from src.ml.feature_extractor import FEATURE_NAMES
-from src.ml.model_manager import TrafficAnomalyModel
+from src.ml.window_features import WINDOW_FEATURE_NAMES, ML_WINDOW_SECONDS, WindowFeatureTracker, as_window_vector
+from src.ml.model_manager import TrafficAnomalyModel, MODEL_PATH, WINDOW_MODEL_PATH
 
 
 DATA_PATH = os.path.abspath(os.path.join(ROOT, "data", "training_packets.csv"))
+WINDOW_DATA_PATH = os.path.abspath(os.path.join(ROOT, "data", "training_windows.csv"))
 
 
-def load_training_data(path: str = DATA_PATH) -> np.ndarray:
+def load_training_data(path: str = DATA_PATH, names=FEATURE_NAMES) -> np.ndarray:
     """
-    Expect a CSV with columns matching FEATURE_NAMES.
+    Expect a CSV with columns matching FEATURE_NAMES (or WINDOW_FEATURE_NAMES
+    for the window model).
     This can be created by a capture-mode of NetSleuth that just logs 'normal' traffic.
     """
     rows = []
@@ -25,7 +32,7 @@ def load_training_data(path: str = DATA_PATH) -> np.ndarray:
 
         for row in reader:
             try:
-                vec = [float(row[name]) for name in FEATURE_NAMES]
+                vec = [float(row[name]) for name in names]
                 rows.append(vec)
             except Exception as e:
                 # Skip problem rows if appear and notify
@@ -34,9 +41,55 @@ def load_training_data(path: str = DATA_PATH) -> np.ndarray:
     return np.array(rows)
 
 
+def load_window_data_from_pcap(path: str, window_seconds: float = ML_WINDOW_SECONDS) -> np.ndarray:
+    """
+    Replay a capture of normal traffic through the per-host window tracker,
+    using the packets' own timestamps, and collect one vector per host window.
+    """
+    rows = []
+    tracker = WindowFeatureTracker(
+        window_seconds, on_window=lambda ip, start, feat: rows.append(as_window_vector(feat)))
+    num2layer = conf.l2types.num2layer
+    reader = RawPcapReader(path)
+    default_link = num2layer.get(getattr(reader, "linktype", None), conf.raw_layer)
+    try:
+        for frame, meta in reader:
+            linktype = getattr(meta, "linktype", None)
+            link = default_link if linktype is None else num2layer.get(linktype, conf.raw_layer)
+            tracker.update(decode_packet(frame, link=link), now=pcap_timestamp(meta))
+    finally:
+        reader.close()
+    tracker.flush_all()
+    return np.array(rows)
+
+
 def main():
-    print("[TRAIN] Loading training data from:",DATA_PATH)
-    X = load_training_data()
+    parser = argparse.ArgumentParser(description="Train the NetSleuth IsolationForest on normal traffic")
+    parser.add_argument("--features", choices=("packet", "window"), default="packet",
+                        help="per-packet model, or per-host window model (default: packet)")
+    parser.add_argument("--data", help="training CSV (default: data/training_packets.csv "
+                                       "or data/training_windows.csv)")
+    parser.add_argument("--pcap", help="window model only: compute window features from a capture")
+    parser.add_argument("--window", type=float, default=ML_WINDOW_SECONDS,
+                        help="window length in seconds for --pcap (default: ML_WINDOW_SECONDS)")
+    args = parser.parse_args()
+
+    if args.features == "window":
+        path = WINDOW_MODEL_PATH
+        if args.pcap:
+            print("[TRAIN] Computing window features from:", args.pcap)
+            X = load_window_data_from_pcap(args.pcap, args.window)
+        else:
+            data = args.data or WINDOW_DATA_PATH
+            print("[TRAIN] Loading training data from:", data)
+            X = load_training_data(data, WINDOW_FEATURE_NAMES)
+    else:
+        if args.pcap:
+            parser.error("--pcap is only supported with --features window")
+        path = MODEL_PATH
+        data = args.data or DATA_PATH
+        print("[TRAIN] Loading training data from:", data)
+        X = load_training_data(data)
     print(f"[TRAIN] {len(X)} samples loaded.")
 
     if len(X) < 20:
@@ -45,8 +98,8 @@ def main():
 
     model = TrafficAnomalyModel()
     model.fit(X)
-    model.save()
-    print("[TRAIN] Training complete. Saved to models/isoforest.pkl")
+    model.save(path)
+    print(f"[TRAIN] Training complete. Saved to models/{os.path.basename(path)}")
 
 
 if __name__ == "__main__":
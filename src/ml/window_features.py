@@ -0,0 +1,164 @@
+# window_features.py
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.core.fast_decoder import PacketHeaders
+
+# Import configuration
+try:
+    from config import ML_WINDOW_SECONDS
+except ImportError:
+    ML_WINDOW_SECONDS = 10
+
+# Distinct-value sets stop growing here; the count saturates (port scans)
+MAX_DISTINCT = 4096
+
+WINDOW_FEATURE_NAMES = [
+    "packets_per_sec",
+    "bytes_per_sec",
+    "distinct_dsts",
+    "distinct_dst_ports",
+    "distinct_flows",
+    "syn_ratio",
+    "mean_size",
+    "size_std",
+    "tcp_ratio",
+    "udp_ratio",
+]
+
+_TCP_SYN = 0x02
+_TCP_ACK = 0x10
+
+
+class _HostWindow:
+    """Running statistics for one source host over the current window."""
+    __slots__ = ("start", "packets", "bytes", "syn", "tcp", "udp",
+                 "mean", "m2", "dsts", "ports", "flows")
+
+    def __init__(self, start: float):
+        self.reset(start)
+
+    def reset(self, start: float) -> None:
+        self.start = start
+        self.packets = 0
+        self.bytes = 0
+        self.syn = 0
+        self.tcp = 0
+        self.udp = 0
+        self.mean = 0.0   # Welford running mean / sum of squared deviations
+        self.m2 = 0.0
+        self.dsts = set()
+        self.ports = set()
+        self.flows = set()
+
+
+class WindowFeatureTracker:
+    """
+    Per-host traffic features over fixed (tumbling) windows, updated in O(1)
+    per packet: counters, Welford mean/variance of packet sizes, and capped
+    sets for the distinct counts. When a host's window ends, its feature
+    dict goes to `on_window(ip, window_start, features)` once, so a model
+    scores each host once per window instead of every packet.
+
+    Windows close on the host's next packet after the window ends, or on the
+    periodic sweep for hosts that went quiet; a host with no traffic for a
+    whole window is dropped.
+    """
+
+    def __init__(self, window_seconds: float = ML_WINDOW_SECONDS,
+                 on_window: Optional[Callable[[str, float, Dict[str, float]], None]] = None,
+                 max_distinct: int = MAX_DISTINCT):
+        self.window = float(window_seconds)
+        self.on_window = on_window
+        self.max_distinct = max_distinct
+        self._hosts: Dict[str, _HostWindow] = {}
+        self._next_sweep = 0.0
+        self.windows_closed = 0
+
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    def update(self, hdr: PacketHeaders, now: float = None) -> None:
+        if not hdr.is_ip:
+            return
+        if now is None:
+            now = time.time()
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        ip = hdr.ip_src
+        w = self._hosts.get(ip)
+        if w is None:
+            w = self._hosts[ip] = _HostWindow(now)
+        elif now - w.start >= self.window:
+            self._close(ip, w)
+            w.reset(now)
+
+        size = hdr.wirelen
+        w.packets += 1
+        w.bytes += size
+        delta = size - w.mean
+        w.mean += delta / w.packets
+        w.m2 += delta * (size - w.mean)
+
+        l4 = hdr.l4
+        if l4 == "TCP":
+            w.tcp += 1
+            if hdr.tcp_flags & _TCP_SYN and not hdr.tcp_flags & _TCP_ACK:
+                w.syn += 1
+        elif l4 == "UDP":
+            w.udp += 1
+
+        if len(w.flows) < self.max_distinct:
+            dst = hdr.ip_dst
+            w.dsts.add(dst)
+            w.ports.add(hdr.dport)
+            w.flows.add((dst, hdr.dport))
+
+    def features(self, w: _HostWindow) -> Dict[str, float]:
+        packets = w.packets or 1
+        return {
+            "packets_per_sec": w.packets / self.window,
+            "bytes_per_sec": w.bytes / self.window,
+            "distinct_dsts": len(w.dsts),
+            "distinct_dst_ports": len(w.ports),
+            "distinct_flows": len(w.flows),
+            "syn_ratio": w.syn / w.tcp if w.tcp else 0.0,
+            "mean_size": w.mean,
+            "size_std": (w.m2 / packets) ** 0.5,
+            "tcp_ratio": w.tcp / packets,
+            "udp_ratio": w.udp / packets,
+        }
+
+    def _close(self, ip: str, w: _HostWindow) -> None:
+        if not w.packets:
+            return
+        self.windows_closed += 1
+        if self.on_window is not None:
+            self.on_window(ip, w.start, self.features(w))
+
+    def sweep(self, now: float) -> None:
+        """Close ended windows of quiet hosts; drop hosts idle for a whole window."""
+        self._next_sweep = now + min(1.0, self.window)
+        for ip, w in list(self._hosts.items()):
+            if now - w.start < self.window:
+                continue
+            if w.packets:
+                self._close(ip, w)
+                w.reset(now)
+            else:
+                self._hosts.pop(ip, None)  # clear() may have run meanwhile
+
+    def flush_all(self) -> None:
+        """Close every open window (end of a capture or replay)."""
+        for ip, w in list(self._hosts.items()):
+            self._close(ip, w)
+        self._hosts.clear()
+
+    def clear(self) -> None:
+        self._hosts.clear()
+
+
+def as_window_vector(feat: Dict[str, float]) -> List[float]:
+    """Ensure consistent numeric order for the window model."""
+    return [feat[name] for name in WINDOW_FEATURE_NAMES]
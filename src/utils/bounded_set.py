@@ -0,0 +1,83 @@
+# bounded_set.py
+from collections import OrderedDict
+
+
+class BoundedOrderedSet:
+    """
+    Insertion-ordered set with a size cap.
+
+    Membership, add and eviction of the oldest entry are all O(1), unlike
+    a list with `in` checks and slice truncation. Iteration yields entries
+    oldest first, the same order the old per-device lists had.
+    """
+    __slots__ = ("_items", "maxlen")
+
+    def __init__(self, maxlen: int, iterable=()):
+        self._items = OrderedDict()
+        self.maxlen = maxlen
+        for value in iterable:
+            self.add(value)
+
+    def add(self, value) -> bool:
+        """Add value if new, evicting the oldest entry when full. True if added."""
+        items = self._items
+        if value in items:
+            return False
+        items[value] = None
+        if len(items) > self.maxlen:
+            items.popitem(last=False)
+        return True
+
+    def push(self, value):
+        """
+        Like add(), but returns (added, evicted): evicted is the oldest entry
+        dropped to make room, or None. Lets incremental consumers stay in
+        sync with what the set still holds.
+        """
+        items = self._items
+        if value in items:
+            return False, None
+        items[value] = None
+        if len(items) > self.maxlen:
+            return True, items.popitem(last=False)[0]
+        return True, None
+
+    def discard(self, value) -> None:
+        self._items.pop(value, None)
+
+    def oldest(self):
+        return next(iter(self._items)) if self._items else None
+
+    def to_list(self) -> list:
+        return list(self._items)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def copy(self) -> "BoundedOrderedSet":
+        clone = BoundedOrderedSet.__new__(BoundedOrderedSet)
+        clone._items = self._items.copy()
+        clone.maxlen = self.maxlen
+        return clone
+
+    def __contains__(self, value) -> bool:
+        return value in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BoundedOrderedSet):
+            return list(self._items) == list(other._items)
+        if isinstance(other, list):
+            return list(self._items) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"BoundedOrderedSet(maxlen={self.maxlen}, {list(self._items)!r})"
@@ -1,5 +1,6 @@
 # device_mapper.py
 import json, os, re
+from .pattern_matcher import PatternMatcher
 
 CFG = os.path.join(os.path.dirname(__file__), "..", "config", "known_devices.json")
 
@@ -22,42 +23,35 @@ def normal(mac):
     mac = mac.lower()
     return re.sub(r"[^0-9a-f]", ":", mac)
 
-def identify_device_by_behavior(ip, dns_queries=None, connections=None):
-    """Identify device type based on its network behavior patterns"""
-    if not dns_queries:
-        dns_queries = []
-    if not connections:
-        connections = []
-    
-    # Convert to lowercase for matching
-    dns_lower = [q.lower() for q in dns_queries]
-    conn_lower = [c.lower() for c in connections]
-    
-    # Apple devices
-    if any('apple' in q for q in dns_lower) or any('_airplay' in q for q in dns_lower):
-        return "Apple Device"
-    
+# Behavioral identification rules, in priority order: the first rule with a
+# pattern found in any DNS query wins
+_BEHAVIOR_RULES = [
+    ("Apple Device", ('apple', '_airplay')),
     # Smart TVs
-    if any('webos' in q for q in dns_lower) or any('lg' in q for q in dns_lower):
-        return "LG Smart TV"
-    if any('roku' in q for q in dns_lower):
-        return "Roku Device"
-    if any('firetv' in q for q in dns_lower) or any('amazon' in q for q in dns_lower):
-        return "Amazon Fire TV"
-    
+    ("LG Smart TV", ('webos', 'lg')),
+    ("Roku Device", ('roku',)),
+    ("Amazon Fire TV", ('firetv', 'amazon')),
     # Gaming consoles
-    if any('xbox' in q for q in dns_lower) or any('playstation' in q for q in dns_lower):
-        return "Gaming Console"
-    
+    ("Gaming Console", ('xbox', 'playstation')),
     # Smart home devices
-    if any('homekit' in q for q in dns_lower) or any('_matter' in q for q in dns_lower):
-        return "Smart Home Device"
-    if any('spotify' in q for q in dns_lower):
-        return "Spotify Device"
-    
+    ("Smart Home Device", ('homekit', '_matter')),
+    ("Spotify Device", ('spotify',)),
     # Mobile devices
-    if any('companion-link' in q for q in dns_lower):
-        return "Mobile Device"
+    ("Mobile Device", ('companion-link',)),
+]
+_behavior_matcher = PatternMatcher(p for _, patterns in _BEHAVIOR_RULES for p in patterns)
+_behavior_labels = [label for label, patterns in _BEHAVIOR_RULES for _ in patterns]
+
+def identify_device_by_behavior(ip, dns_queries=None, connections=None):
+    """Identify device type based on its network behavior patterns"""
+    # One matcher pass per query; the lowest pattern index is the best rule
+    best = None
+    for query in dns_queries or ():
+        hits = _behavior_matcher.search(query)
+        if hits and (best is None or hits[0] < best):
+            best = hits[0]
+    if best is not None:
+        return _behavior_labels[best]
     
     # Routers/Gateways
     if ip in ['10.0.0.1', '192.168.1.1', '192.168.0.1']:
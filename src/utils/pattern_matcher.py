@@ -0,0 +1,122 @@
+# pattern_matcher.py
+import os
+from typing import Dict, Iterable, List, Optional
+
+# Below this many patterns, one `in` per pattern (done in C) is cheaper than
+# walking the automaton character by character in Python
+LINEAR_SCAN_MAX = 24
+
+
+class PatternMatcher:
+    """
+    Case-insensitive multi-substring matcher.
+
+    Built once from an ordered pattern list; search() reports every pattern
+    contained in a string, as indices in list order, so callers can treat
+    earlier patterns as higher priority. Large sets use an Aho-Corasick
+    automaton: one pass over the string whatever the number of patterns.
+    Each state only stores the transitions that differ from the root's, so
+    memory stays proportional to the total pattern length.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        seen = set()
+        self.patterns: List[str] = []
+        for p in patterns:
+            p = p.strip().lower()
+            if p and p not in seen:
+                seen.add(p)
+                self.patterns.append(p)
+        self._linear = len(self.patterns) <= LINEAR_SCAN_MAX
+        if not self._linear:
+            self._build()
+
+    def _build(self) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(index)
+
+        # Breadth-first over the trie: fail links, inherited outputs, and each
+        # state's transitions that do not simply fall back to the root's
+        root = goto[0]
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [{} for _ in goto]
+        queue = list(root.values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            f = fail[state]
+            if f:
+                out[state] = sorted(set(out[state]).union(out[f]))
+                trans = dict(delta[f])
+            else:
+                trans = {}
+            for ch, nxt in goto[state].items():
+                trans[ch] = nxt
+                fail[nxt] = trans_f = delta[f].get(ch) if f else None
+                if trans_f is None:
+                    fail[nxt] = root.get(ch, 0)
+                queue.append(nxt)
+            delta[state] = trans
+
+        self._root = root
+        self._delta = delta
+        self._out = [tuple(o) if o else None for o in out]
+
+    def search(self, text: str) -> List[int]:
+        """Indices of all patterns found in text, in pattern-list order."""
+        if not text:
+            return []
+        text = text.lower()
+        if self._linear:
+            return [i for i, p in enumerate(self.patterns) if p in text]
+
+        root, delta, out = self._root, self._delta, self._out
+        state = 0
+        found = None
+        for ch in text:
+            nxt = delta[state].get(ch) if state else None
+            state = root.get(ch, 0) if nxt is None else nxt
+            hits = out[state]
+            if hits is not None:
+                if found is None:
+                    found = set(hits)
+                else:
+                    found.update(hits)
+        return sorted(found) if found else []
+
+    def first(self, text: str) -> Optional[str]:
+        """The earliest-listed pattern found in text, or None."""
+        hits = self.search(text)
+        return self.patterns[hits[0]] if hits else None
+
+    def matches(self, text: str) -> List[str]:
+        """All patterns found in text, in pattern-list order."""
+        return [self.patterns[i] for i in self.search(text)]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+
+def load_patterns(path: str) -> List[str]:
+    """Read an indicator feed: one pattern per line, blank lines and # comments skipped."""
+    if not path or not os.path.exists(path):
+        if path:
+            print(f"Warning: indicator feed not found: {path}")
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f
+                if line.strip() and not line.lstrip().startswith('#')]
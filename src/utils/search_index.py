@@ -0,0 +1,158 @@
+# search_index.py
+import re
+from typing import Dict, Iterable, List, Set
+
+# Substring queries are answered from character n-grams of this length
+NGRAM = 3
+
+# When even the rarest n-gram of a query is this common (fraction of all
+# entries), walking the entries in order finds a page of hits sooner than
+# intersecting and sorting the postings
+DENSE_FRACTION = 0.125
+
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def _tokens(fields: Iterable[str]) -> Set[str]:
+    """Searchable words: IP octets, MAC bytes and OUI, hostname words, and each whole field."""
+    tokens = set()
+    for text in fields:
+        if not text:
+            continue
+        tokens.add(text)
+        tokens.update(t for t in _TOKEN_SPLIT.split(text) if t)
+        if text.count(':') == 5:  # MAC: the vendor (OUI) prefix is a token too
+            tokens.add(text[:8])
+    return tokens
+
+
+def _grams(fields: Iterable[str]) -> Set[str]:
+    grams = set()
+    for text in fields:
+        grams.update(text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1))
+    return grams
+
+
+class SearchIndex:
+    """
+    Case-insensitive device search over a few short text fields per key
+    (IP, MAC, hostname), kept up to date one entry at a time.
+
+    Queries of NGRAM characters or more return the keys whose fields
+    contain the query, the same answer as a substring scan. Candidates
+    come from the n-gram postings and are then verified. Shorter queries
+    match the start of a token (IP octet, MAC byte or OUI, hostname word).
+    Results come back in insertion order, so limit/offset pages are stable.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._fields: List[tuple] = []
+        self._tokens: List[Set[str]] = []
+        self._grams: Dict[str, Set[int]] = {}
+        self._prefixes: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _short_prefixes(tokens: Set[str]) -> Set[str]:
+        return {t[:n] for t in tokens for n in range(1, min(len(t), NGRAM - 1) + 1)}
+
+    @staticmethod
+    def _post(index: Dict[str, Set[int]], terms: Iterable[str], doc: int) -> None:
+        for term in terms:
+            postings = index.get(term)
+            if postings is None:
+                index[term] = {doc}
+            else:
+                postings.add(doc)
+
+    @staticmethod
+    def _unpost(index: Dict[str, Set[int]], terms: Iterable[str], doc: int) -> None:
+        for term in terms:
+            postings = index[term]
+            postings.discard(doc)
+            if not postings:
+                del index[term]
+
+    def add(self, key: str, *fields: str) -> None:
+        """Index `key` under `fields`, replacing what it was indexed under before."""
+        fields = tuple((f or '').lower() for f in fields)
+        tokens = _tokens(fields)
+        grams = _grams(fields)
+        prefixes = self._short_prefixes(tokens)
+
+        doc = self._ids.get(key)
+        if doc is None:
+            doc = self._ids[key] = len(self._keys)
+            self._keys.append(key)
+            self._fields.append(fields)
+            self._tokens.append(tokens)
+            self._post(self._grams, grams, doc)
+            self._post(self._prefixes, prefixes, doc)
+            return
+        if fields == self._fields[doc]:
+            return
+
+        old_grams = _grams(self._fields[doc])
+        old_prefixes = self._short_prefixes(self._tokens[doc])
+        self._unpost(self._grams, old_grams - grams, doc)
+        self._post(self._grams, grams - old_grams, doc)
+        self._unpost(self._prefixes, old_prefixes - prefixes, doc)
+        self._post(self._prefixes, prefixes - old_prefixes, doc)
+        self._fields[doc] = fields
+        self._tokens[doc] = tokens
+
+    def clear(self) -> None:
+        self._ids.clear()
+        self._keys.clear()
+        self._fields.clear()
+        self._tokens.clear()
+        self._grams.clear()
+        self._prefixes.clear()
+
+    def search(self, query: str, limit: int = 100, offset: int = 0) -> List[str]:
+        """Keys matching `query`, in insertion order, from `offset` up to `limit` of them."""
+        offset = max(offset, 0)
+        query = (query or '').strip().lower()
+        if limit <= 0:
+            return []
+        if not query:
+            return self._keys[offset:offset + limit]
+
+        if len(query) < NGRAM:
+            postings = [self._prefixes.get(query)]
+            fields = self._tokens
+            check = lambda doc: any(t.startswith(query) for t in fields[doc])
+        else:
+            postings = [self._grams.get(g) for g in _grams([query])]
+            fields = self._fields
+            check = lambda doc: any(query in f for f in fields[doc])
+        if any(p is None for p in postings):
+            return []
+        postings.sort(key=len)
+        rarest = postings[0]
+
+        if len(rarest) >= DENSE_FRACTION * len(self._keys):
+            # Common query: walking entries in order fills a page quickly
+            candidates = (doc for doc in range(len(self._keys)) if doc in rarest)
+        else:
+            # Intersecting more than the two rarest postings costs more than
+            # verifying the few extra candidates it would remove
+            candidates = sorted(rarest.intersection(postings[1]) if len(postings) > 1 else rarest)
+
+        keys = self._keys
+        out = []
+        skip = offset
+        for doc in candidates:
+            if not check(doc):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            out.append(keys[doc])
+            if len(out) >= limit:
+                break
+        return out
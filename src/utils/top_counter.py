@@ -0,0 +1,93 @@
+# top_counter.py
+from typing import Dict, Hashable, List, Tuple
+
+
+class TopCounter:
+    """
+    Exact counter with O(1) increment/decrement and O(k) top(k).
+
+    Keys are grouped into buckets by count, and the non-empty counts form a
+    doubly linked list (the Stream-Summary layout used by Space-Saving).
+    Since counts only move by one, a key always moves to a neighbouring
+    bucket, so nothing is ever sorted. Unlike Space-Saving it keeps every
+    key, which suits counts over data that is itself bounded (e.g. the
+    per-device histories) and needs decrements when entries are evicted.
+    """
+
+    def __init__(self):
+        self._counts: Dict[Hashable, int] = {}
+        self._buckets: Dict[int, Dict[Hashable, None]] = {}
+        # Neighbouring non-empty counts; 0 is the sentinel below the lowest
+        self._up: Dict[int, int] = {0: None}
+        self._down: Dict[int, int] = {}
+        self._top = 0
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __getitem__(self, key) -> int:
+        return self._counts.get(key, 0)
+
+    def _link(self, count: int, below: int) -> None:
+        up = self._up[below]
+        self._up[below] = count
+        self._down[count] = below
+        self._up[count] = up
+        if up is None:
+            self._top = count
+        else:
+            self._down[up] = count
+
+    def _unlink(self, count: int) -> None:
+        down = self._down.pop(count)
+        up = self._up.pop(count)
+        self._up[down] = up
+        if up is None:
+            self._top = down
+        else:
+            self._down[up] = down
+
+    def _move(self, key, old: int, new: int, neighbour: int) -> None:
+        if new:
+            bucket = self._buckets.get(new)
+            if bucket is None:
+                bucket = self._buckets[new] = {}
+                self._link(new, neighbour)
+            bucket[key] = None
+            self._counts[key] = new
+        else:
+            del self._counts[key]
+        if old:
+            bucket = self._buckets[old]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[old]
+                self._unlink(old)
+
+    def increment(self, key) -> None:
+        old = self._counts.get(key, 0)
+        self._move(key, old, old + 1, old)
+
+    def decrement(self, key) -> None:
+        old = self._counts.get(key, 0)
+        if old:
+            self._move(key, old, old - 1, self._down[old])
+
+    def top(self, k: int = 10) -> List[Tuple[Hashable, int]]:
+        """The k highest counts as (key, count), highest first."""
+        out = []
+        count = self._top
+        while count and len(out) < k:
+            for key in list(self._buckets.get(count, ())):
+                out.append((key, count))
+                if len(out) >= k:
+                    break
+            count = self._down.get(count, 0)
+        return out
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self._buckets.clear()
+        self._up = {0: None}
+        self._down.clear()
+        self._top = 0
@@ -0,0 +1,161 @@
+# serving.py
+import functools
+import gzip
+import logging
+import time
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Response, request
+
+try:
+    import brotli  # optional: smaller payloads for browsers that accept br
+except ImportError:
+    brotli = None
+
+# Import configuration
+try:
+    from config import WEB_SERVER, WEB_THREADS, WEB_COMPRESS_MIN_BYTES, WEB_CACHE_TTL
+except ImportError:
+    WEB_SERVER = 'auto'
+    WEB_THREADS = 16
+    WEB_COMPRESS_MIN_BYTES = 1024
+    WEB_CACHE_TTL = 1.0
+
+# Bound on distinct URLs held by ttl_cached (the cache is simply reset when full)
+TTL_CACHE_MAX_ENTRIES = 256
+
+
+def _compress(encoding: str, body: bytes) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=5)
+
+
+def _negotiate() -> Optional[str]:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+class Payload:
+    """
+    A serialized response body kept for reuse, with its compressed variants
+    built on first request and reused afterwards.
+    """
+    __slots__ = ('body', 'etag', 'mimetype', '_variants')
+
+    def __init__(self, body: bytes, etag: str = None, mimetype: str = 'application/json'):
+        self.body = body
+        self.etag = etag if etag is not None else format(zlib.crc32(body), '08x')
+        self.mimetype = mimetype
+        self._variants: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        data = self._variants.get(encoding)
+        if data is None:
+            data = self._variants[encoding] = _compress(encoding, self.body)
+        return data
+
+    def response(self) -> Response:
+        """Response for the current request: compressed if accepted, 304 if the ETag matches."""
+        encoding = _negotiate() if len(self.body) >= WEB_COMPRESS_MIN_BYTES else None
+        response = Response(self.encoded(encoding), mimetype=self.mimetype)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        # Each encoding is a different representation, so it gets its own tag
+        response.set_etag(self.etag if encoding is None else f"{self.etag}-{encoding}")
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+
+def compress_response(response: Response) -> Response:
+    """after_request hook: compress large uncached JSON responses."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype != 'application/json'):
+        return response
+    body = response.get_data()
+    if len(body) < WEB_COMPRESS_MIN_BYTES:
+        return response
+    encoding = _negotiate()
+    if encoding is not None:
+        response.set_data(_compress(encoding, body))
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+_ttl_cache: Dict[str, Tuple[float, Payload]] = {}
+
+
+def ttl_cached(view: Callable) -> Callable:
+    """
+    Serve a GET view's 200 responses from a per-URL cache for WEB_CACHE_TTL
+    seconds, so many dashboards polling the same query cost one render.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if WEB_CACHE_TTL <= 0:
+            return view(*args, **kwargs)
+        key = request.full_path
+        now = time.monotonic()
+        hit = _ttl_cache.get(key)
+        if hit is None or hit[0] <= now:
+            response = view(*args, **kwargs)
+            if not isinstance(response, Response) or response.status_code != 200:
+                return response
+            hit = (now + WEB_CACHE_TTL, Payload(response.get_data(), mimetype=response.mimetype))
+            if len(_ttl_cache) >= TTL_CACHE_MAX_ENTRIES:
+                _ttl_cache.clear()
+            _ttl_cache[key] = hit
+        return hit[1].response()
+    return wrapper
+
+
+def clear_ttl_cache() -> None:
+    """Drop cached responses, e.g. after a request that changed the data."""
+    _ttl_cache.clear()
+
+
+def serve(app, host: str = '0.0.0.0', port: int = 5000, server: str = WEB_SERVER,
+          threads: int = WEB_THREADS) -> None:
+    """
+    Run `app` until the process exits.
+
+    'waitress' is a fixed pool of `threads` workers. Each open /api/events
+    stream holds one, so size it for the expected dashboards. 'werkzeug' is
+    a thread-per-connection server without per-request logging. 'auto' uses
+    waitress when it is installed, otherwise werkzeug. 'development' is
+    Flask's app.run().
+    """
+    if server in ('auto', 'waitress'):
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            if server == 'waitress':
+                print("[!] waitress is not installed; using the threaded werkzeug server")
+            waitress_serve = None
+        if waitress_serve is not None:
+            print(f"[i] Serving with waitress ({threads} threads)")
+            waitress_serve(app, host=host, port=port, threads=threads, ident='NetSleuth')
+            return
+
+    if server == 'development':
+        app.run(host=host, port=port, debug=False, threaded=True)
+        return
+
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass  # one stderr line per request costs the capture process CPU
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    print("[i] Serving with the threaded werkzeug server")
+    make_server(host, port, app, threaded=True, request_handler=QuietHandler).serve_forever()
@@ -1,5 +1,5 @@
-from flask import Flask, render_template, jsonify, request
-from ..core.device_tracker import device_log
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
+from ..core import device_tracker
 from ..core.alert_system import alert_system
 
 from ..core.suspicious_devices import suspicious_tracker
@@ -9,14 +9,32 @@ import threading
 import time
 from datetime import datetime
 import json
+from dataclasses import asdict
 
 from src.core.anomaly_store import anomaly_store
+from src.core.sniffer import anomaly_scorer, window_scorer, window_features
+from src.core.metrics import metrics
+from src.core.flow_table import flow_table, device_flow_counts
+from src.core.event_bus import event_bus, BOOT_ID
+from src.core import persistence
+from src.core.timeseries import device_series
+from src.web.serving import Payload, compress_response, ttl_cached, clear_ttl_cache, serve
+
+# Import configuration
+try:
+    from config import EVENT_DEVICE_INTERVAL, EVENT_KEEPALIVE
+except ImportError:
+    EVENT_DEVICE_INTERVAL = 0.5
+    EVENT_KEEPALIVE = 15
 
 
 app = Flask(__name__)
+app.after_request(compress_response)
 
-# Global variable to store the latest network data
+# Global variable to store the latest network data. It is replaced as a
+# whole on each rebuild, and `version` changes only when its contents do.
 network_data = {
+    'version': 0,
     'devices': {},
     'last_update': None,
     'total_devices': 0,
@@ -25,35 +43,67 @@ network_data = {
     'alerts': []
 }
 
+# Versions of (device_log, alerts, suspicious devices) network_data was built from
+_source_versions = None
+
+# Serialized responses per route: name -> (network_data version, Payload)
+_json_cache = {}
+
+def device_view(data):
+    """JSON-ready copy of one device_log entry"""
+    return {
+        'hostname': data.get('hostname', 'Unknown'),
+        'mac': data.get('mac', 'Unknown'),
+        'dns_queries': list(data.get('dns_queries', [])),
+        'connections': list(data.get('connections', [])),
+        'services': list(data.get('services', [])),
+        'last_seen': data.get('last_seen', 'Unknown'),
+        'connection_count': len(data.get('connections', [])),
+        'dns_count': len(data.get('dns_queries', []))
+    }
+
 def update_network_data():
-    """To update the global network data from device_log"""
-    global network_data
+    """To update the global network data from a device_tracker snapshot"""
+    global network_data, _source_versions
+    
+    versions = (device_tracker.get_version(), alert_system.version, suspicious_tracker.version)
+    if versions == _source_versions:
+        return  # Nothing changed since the last rebuild
     
     devices = {}
     total_connections = 0
     total_dns_queries = 0
     
-    for ip, data in device_log.items():
-        devices[ip] = {
-            'hostname': data.get('hostname', 'Unknown'),
-            'mac': data.get('mac', 'Unknown'),
-            'dns_queries': data.get('dns_queries', []),
-            'connections': data.get('connections', []),
-            'services': data.get('services', []),
-            'last_seen': data.get('last_seen', 'Unknown'),
-            'connection_count': len(data.get('connections', [])),
-            'dns_count': len(data.get('dns_queries', []))
-        }
+    for ip, data in device_tracker.snapshot().items():
+        devices[ip] = device_view(data)
         total_connections += len(data.get('connections', []))
         total_dns_queries += len(data.get('dns_queries', []))
     
-    network_data['devices'] = devices
-    network_data['last_update'] = datetime.now().strftime("%H:%M:%S")
-    network_data['total_devices'] = len(devices)
-    network_data['total_connections'] = total_connections
-    network_data['total_dns_queries'] = total_dns_queries
-    network_data['alerts'] = alert_system.get_alerts(50)  # Get last 50 alerts
-    network_data['suspicious_devices'] = suspicious_tracker.get_top_suspicious(10)
+    network_data = {
+        'version': network_data['version'] + 1,
+        'devices': devices,
+        'last_update': datetime.now().strftime("%H:%M:%S"),
+        'total_devices': len(devices),
+        'total_connections': total_connections,
+        'total_dns_queries': total_dns_queries,
+        'alerts': alert_system.get_alerts(50),  # Get last 50 alerts
+        'suspicious_devices': suspicious_tracker.get_top_suspicious(10)
+    }
+    _source_versions = versions
+
+def cached_json(name, build):
+    """
+    JSON response derived from network_data, serialized once per version.
+    Sends an ETag and answers a matching If-None-Match with 304, so polling
+    clients only download data that changed.
+    """
+    data = network_data
+    cached = _json_cache.get(name)
+    if cached is None or cached[0] != data['version']:
+        body = app.json.dumps(build(data)).encode('utf-8')
+        cached = (data['version'], Payload(body, etag=f"{BOOT_ID}-{data['version']}-{name}"))
+        _json_cache[name] = cached
+    return cached[1].response()
 
 def data_update_loop():
     """Background thread to continuously update network data"""
@@ -61,23 +111,77 @@ def data_update_loop():
         update_network_data()
         time.sleep(5)  # Update every 5 seconds
 
+def device_events_loop():
+    """Background thread publishing changed devices to the event stream, in batches"""
+    seen = device_tracker.get_version()
+    while True:
+        time.sleep(EVENT_DEVICE_INTERVAL)
+        if device_tracker.get_version() == seen:
+            continue
+        seen, devices = device_tracker.changed_devices(seen)
+        if devices:
+            event_bus.publish('devices', {ip: device_view(data) for ip, data in devices.items()})
+
+def _event_json(data):
+    if hasattr(data, '__dataclass_fields__'):
+        data = asdict(data)
+    return app.json.dumps(data)
+
 @app.route('/api/anomalies')
+@ttl_cached
 def get_anomalies():
     #API ENDPOINT FOR ML DETECTED ANOMALIES;
     """API endpoint to get ML-detected anomalies"""
     
     limit = request.args.get('limit', 200, type=int) #subj to change
-    events = anomaly_store.list()[:limit]
+    events = anomaly_store.query(
+        limit=limit,
+        since=request.args.get('since', type=int),
+        before=request.args.get('before', type=int),
+        src_ip=request.args.get('src_ip'),
+        protocol=request.args.get('protocol'),
+        min_score=request.args.get('min_score', type=float),
+        max_score=request.args.get('max_score', type=float)
+    )
     return jsonify(events)
 
 @app.route('/api/anomalies/stream')
+@ttl_cached
 def anomalies_stream():
-    """Stream anomalies one-by-one for real-time charts."""
+    """Latest anomalies snapshot (live updates: /api/events)."""
     return jsonify({
-        "count": len(anomaly_store.list()),
-        "latest": anomaly_store.list()[:10]
+        "count": len(anomaly_store),
+        "latest": [asdict(e) for e in anomaly_store.latest(10)]
     })
 
+@app.route('/api/events')
+def event_stream():
+    """
+    Server-Sent Events stream of new alerts ('alert'), anomalies ('anomaly')
+    and batched device changes ('devices'). A 'reset' event means the client
+    missed events and should reload /api/network-data. Reconnecting clients
+    resume from the Last-Event-ID header (or ?last_id=).
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    sub = event_bus.subscribe(last_id)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                events = event_bus.wait(sub, EVENT_KEEPALIVE)
+                if not events:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield ''.join(
+                    f"id: {event_bus.event_id(seq)}\nevent: {kind}\ndata: {_event_json(data)}\n\n"
+                    for seq, kind, data in events)
+        finally:
+            event_bus.unsubscribe(sub)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/')
 def dashboard():
     """Main dashboard page"""
@@ -86,18 +190,27 @@ def dashboard():
 @app.route('/api/network-data')
 def get_network_data():
     """API endpoint to get current network data"""
-    return jsonify(network_data)
+    return cached_json('network-data', lambda data: data)
 
 @app.route('/api/devices')
 def get_devices():
     """API endpoint to get just the devices data"""
-    return jsonify(network_data['devices'])
+    return cached_json('devices', lambda data: data['devices'])
 
 @app.route('/api/alerts')
+@ttl_cached
 def get_alerts():
     """API endpoint to get alerts"""
     limit = request.args.get('limit', 50, type=int)
-    return jsonify(alert_system.get_alerts(limit))
+    severity = request.args.get('severity')
+    return jsonify(alert_system.query_alerts(
+        limit=limit,
+        since=request.args.get('since', type=int),
+        before=request.args.get('before', type=int),
+        severity=severity.split(',') if severity else None,
+        alert_type=request.args.get('type'),
+        ip=request.args.get('ip')
+    ))
 
 @app.route('/api/alerts', methods=['POST'])
 def create_alert():
@@ -108,12 +221,14 @@ def create_alert():
     message = data.get('message', 'Custom alert')
     
     alert_system.create_alert(alert_type, severity, message, data.get('data'))
+    clear_ttl_cache()
     return jsonify({'status': 'success', 'message': 'Alert created'})
 
 @app.route('/api/alerts/clear', methods=['POST'])
 def clear_alerts():
     """API endpoint to clear all alerts"""
     alert_system.clear_alerts()
+    clear_ttl_cache()
     return jsonify({'status': 'success', 'message': 'Alerts cleared'})
 
 @app.route('/api/alerts/export')
@@ -126,7 +241,14 @@ def export_alerts():
 @app.route('/api/clear-data', methods=['POST'])
 def clear_data():
     """API endpoint to clear all device data"""
-    device_log.clear()
+    device_tracker.clear_devices()
+    alert_system.forget_devices()
+    flow_table.clear()
+    device_flow_counts.clear()
+    device_series.clear()
+    window_features.clear()
+    event_bus.publish('reset', {'reason': 'data_cleared'})
+    clear_ttl_cache()
     return jsonify({'status': 'success', 'message': 'Data cleared'})
 
 @app.route('/api/stop-monitoring', methods=['POST'])
@@ -136,101 +258,139 @@ def stop_monitoring():
     return jsonify({'status': 'success', 'message': 'Monitoring stopped'})
 
 @app.route('/api/device/<ip>')
+@ttl_cached
 def get_device(ip):
     """API endpoint to get specific device data"""
-    if ip in device_log:
-        data = device_log[ip]
-        return jsonify({
-            'ip': ip,
-            'hostname': data.get('hostname', 'Unknown'),
-            'mac': data.get('mac', 'Unknown'),
-            'dns_queries': data.get('dns_queries', []),
-            'connections': data.get('connections', []),
-            'services': data.get('services', []),
-            'last_seen': data.get('last_seen', 'Unknown'),
-            'connection_count': len(data.get('connections', [])),
-            'dns_count': len(data.get('dns_queries', []))
-        })
+    data = device_tracker.snapshot().get(ip)
+    if data is not None:
+        return jsonify({'ip': ip, **device_view(data), 'flows': device_flow_counts.get(ip)})
     else:
         return jsonify({'error': 'Device not found'}), 404
 
+@app.route('/api/device/<ip>/timeseries')
+@ttl_cached
+def get_device_timeseries(ip):
+    """API endpoint for a device's packets/bytes/connections/DNS queries over time"""
+    step = request.args.get('resolution', type=int)
+    steps = [s for s, _ in device_series.tiers]
+    if step is not None and step not in steps:
+        return jsonify({'error': f'resolution must be one of {steps} (seconds)'}), 400
+    series = device_series.series(ip, step=step, points=request.args.get('points', type=int))
+    if series is None:
+        return jsonify({'error': 'No traffic recorded for this device'}), 404
+    return jsonify({'ip': ip, 'series': series})
+
 @app.route('/api/statistics')
 def get_statistics():
     """API endpoint to get detailed statistics"""
-    devices = network_data['devices']
-    
-    # Calculate statistics
-    total_devices = len(devices)
-    total_connections = sum(len(d.get('connections', [])) for d in devices.values())
-    total_dns_queries = sum(len(d.get('dns_queries', [])) for d in devices.values())
-    
-    # Device types
-    device_types = {}
-    for device in devices.values():
-        hostname = device.get('hostname', 'Unknown')
-        if 'Apple' in hostname:
-            device_types['Apple'] = device_types.get('Apple', 0) + 1
-        elif 'Smart TV' in hostname:
-            device_types['Smart TV'] = device_types.get('Smart TV', 0) + 1
-        elif 'Router' in hostname:
-            device_types['Router'] = device_types.get('Router', 0) + 1
-        elif 'DNS Server' in hostname:
-            device_types['DNS Server'] = device_types.get('DNS Server', 0) + 1
-        else:
-            device_types['Other'] = device_types.get('Other', 0) + 1
-    
-    # Top DNS queries
-    all_dns = []
-    for device in devices.values():
-        all_dns.extend(device.get('dns_queries', []))
-    
-    dns_counts = {}
-    for query in all_dns:
-        dns_counts[query] = dns_counts.get(query, 0) + 1
-    
-    top_dns = sorted(dns_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-    # Top connections
-    all_connections = []
-    for device in devices.values():
-        all_connections.extend(device.get('connections', []))
-    
-    conn_counts = {}
-    for conn in all_connections:
-        conn_counts[conn] = conn_counts.get(conn, 0) + 1
-    
-    top_connections = sorted(conn_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-    return jsonify({
+    return cached_json('statistics', build_statistics)
+
+def build_statistics(data):
+    """Detailed statistics, read from device_tracker's running aggregates in O(K)"""
+    stats = device_tracker.get_network_statistics()
+    return {
         'summary': {
-            'total_devices': total_devices,
-            'total_connections': total_connections,
-            'total_dns_queries': total_dns_queries,
-            'total_alerts': len(alert_system.get_alerts())
+            'total_devices': stats['total_devices'],
+            'total_connections': stats['total_connections'],
+            'total_dns_queries': stats['total_dns_queries'],
+            'total_alerts': stats['active_alerts']
         },
-        'device_types': device_types,
-        'top_dns_queries': top_dns,
-        'top_connections': top_connections,
-        'last_update': network_data['last_update']
-    })
+        'device_types': stats['device_types'],
+        'top_dns_queries': device_tracker.top_dns_queries(10),
+        'top_connections': device_tracker.top_connections(10),
+        'last_update': data['last_update']
+    }
 
 @app.route('/api/search')
+@ttl_cached
 def search_devices():
-    """API endpoint to search devices"""
-    query = request.args.get('q', '').lower()
-    if not query:
-        return jsonify(network_data['devices'])
+    """API endpoint to search devices by IP, MAC or hostname (paged with limit/offset)"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 100, type=int)
+    offset = request.args.get('offset', 0, type=int)
     
     results = {}
-    for ip, device in network_data['devices'].items():
-        if (query in ip.lower() or 
-            query in device.get('hostname', '').lower() or
-            query in device.get('mac', '').lower()):
-            results[ip] = device
+    devices = device_tracker.snapshot()
+    for ip in device_tracker.search_devices(query, limit, offset):
+        data = devices.get(ip)
+        if data is not None:
+            results[ip] = device_view(data)
     
     return jsonify(results)
 
+def _time_arg(name):
+    """Query argument as epoch seconds; accepts epoch seconds or ISO 8601."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def _history(query):
+    store = persistence.state_store
+    if store is None:
+        return jsonify({'error': 'Persistence is disabled (set PERSIST_PATH or run with --db)'}), 503
+    try:
+        return jsonify(query(store))
+    except ValueError:
+        return jsonify({'error': 'from/to must be epoch seconds or ISO 8601'}), 400
+
+@app.route('/api/history/devices')
+def history_devices():
+    """API endpoint for saved devices by IP and/or MAC, including ones no longer in memory"""
+    return _history(lambda store: store.find_devices(
+        ip=request.args.get('ip'),
+        mac=request.args.get('mac'),
+        limit=request.args.get('limit', 100, type=int)
+    ))
+
+@app.route('/api/history/alerts')
+def history_alerts():
+    """API endpoint for saved alerts in a time range"""
+    severity = request.args.get('severity')
+    return _history(lambda store: store.alerts_between(
+        start=_time_arg('from'),
+        end=_time_arg('to'),
+        limit=request.args.get('limit', 100, type=int),
+        ip=request.args.get('ip'),
+        severity=severity.split(',') if severity else None,
+        alert_type=request.args.get('type')
+    ))
+
+@app.route('/api/history/anomalies')
+def history_anomalies():
+    """API endpoint for saved anomalies in a time range"""
+    return _history(lambda store: store.anomalies_between(
+        start=_time_arg('from'),
+        end=_time_arg('to'),
+        limit=request.args.get('limit', 100, type=int),
+        src_ip=request.args.get('src_ip')
+    ))
+
+@app.route('/api/metrics')
+def get_metrics():
+    """API endpoint for hot-path metrics in Prometheus text format"""
+    if not metrics.enabled:
+        return Response("# metrics disabled (METRICS_ENABLED = False)\n",
+                        status=404, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/flows')
+@ttl_cached
+def get_flows():
+    """API endpoint for active flows (most bytes first), recently expired flows and top initiators"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({
+        'stats': flow_table.stats(),
+        'active': flow_table.active_flows(limit),
+        'recent': flow_table.recent_flows(limit),
+        'devices': device_flow_counts.top(limit)
+    })
+
 @app.route('/api/suspicious')
+@ttl_cached
 def get_suspicious_device():
     return jsonify(suspicious_tracker.get_top_suspicious(10))
 
@@ -241,7 +401,11 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'devices_count': network_data['total_devices'],
-        'alerts_count': len(alert_system.get_alerts())
+        'alerts_count': len(alert_system.get_alerts()),
+        'ml_scoring': anomaly_scorer.stats(),
+        'ml_window_scoring': window_scorer.stats(),
+        'alert_dispatch': alert_system.dispatcher.stats(),
+        'event_stream': event_bus.stats()
     })
 
 def start_web_interface(host='0.0.0.0', port=5000):
@@ -249,11 +413,12 @@ def start_web_interface(host='0.0.0.0', port=5000):
     # Start the background data update thread
     update_thread = threading.Thread(target=data_update_loop, daemon=True)
     update_thread.start()
+    threading.Thread(target=device_events_loop, daemon=True).start()
     
     print(f"Starting NetSleuth Web Interface at http://localhost:{port}")
     print("Dashboard will show real-time network monitoring data")
     
-    app.run(host=host, port=port, debug=False)
+    serve(app, host=host, port=port)
 
 if __name__ == '__main__':
     start_web_interface() 
\ No newline at end of file
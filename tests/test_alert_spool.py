@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from src.core.alert_system import AlertSystem
+
+
+class SpoolRestartTest(unittest.TestCase):
+    """The spool outlives the process: ids and update records must not collide across runs."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'alerts.jsonl')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _run(self):
+        system = AlertSystem(spool_path=self.path)
+        system.dispatcher.handlers.clear()  # no console output
+        return system
+
+    def _stop(self, system):
+        system.flush()
+        system.spool.close()
+
+    def test_restart_repeat_export(self):
+        first = self._run()
+        scan = first.create_alert('port_scan', 'HIGH', 'scan', {'ip': '10.0.0.5'}, ip='10.0.0.5')
+        self._stop(first)
+
+        second = self._run()
+        device = second.create_alert('new_device', 'LOW', 'new', {'ip': '10.0.0.9'}, ip='10.0.0.9')
+        second.create_alert('new_device', 'LOW', 'new again', {'ip': '10.0.0.9'}, ip='10.0.0.9')
+        self.assertGreater(device['id'], scan['id'])
+
+        out = os.path.join(self.dir.name, 'export.json')
+        with redirect_stdout(StringIO()):
+            second.export_alerts(out)
+        self._stop(second)
+        with open(out) as f:
+            exported = json.load(f)
+
+        self.assertEqual([a['type'] for a in exported], ['port_scan', 'new_device'])
+        self.assertEqual(exported[0]['count'], 1)
+        self.assertEqual(exported[1]['count'], 2)
+        self.assertEqual(exported[1]['message'], 'new again')
+
+    def test_ids_continue_after_rotated_file(self):
+        first = self._run()
+        for i in range(3):
+            first.create_alert('new_device', 'LOW', 'new', ip=f'10.0.0.{i}')
+        self._stop(first)
+        os.replace(self.path, self.path + '.1')
+
+        second = self._run()
+        self.assertEqual(second.create_alert('new_device', 'LOW', 'new', ip='10.0.1.1')['id'], 4)
+        self._stop(second)
+
+
+if __name__ == '__main__':
+    unittest.main()